@@ -3,9 +3,17 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
+import tempfile
 from file_parser import LinearSystemParser
-from gaussian_solver import GaussianEliminationSolver, BandedGaussianSolver, EfficientBandedSolver
-from banded_storage import BandedMatrix
+from gaussian_solver import BandedLUFactorization, SymmetricBandedFactorization
+from banded_storage import BandedMatrix, SymmetricBandedMatrix
+from instrumentation import Instrumentation, JsonLogSink
+from result_cache import ResultCache, content_hash
+from batch_engine import BatchEngine
+from solver_planner import SOLVER_REGISTRY, SolverPlanner, load_planned_system, create_planned_solver
+from solution_writer import SOLUTION_FORMATS, MIME_TYPES, write_solution
+from job_manager import JobManager
+from file_catalog import FileCatalog, CATALOG_FILENAME
 
 st.set_page_config(
     page_title="线性方程组求解器",
@@ -22,6 +30,280 @@ mode = st.sidebar.radio(
     ["单文件求解", "批量处理", "关于系统"]
 )
 
+st.sidebar.subheader("求解器选择")
+engine_choice = st.sidebar.selectbox("求解引擎", ["自动"] + list(SOLVER_REGISTRY))
+engine_override = None if engine_choice == "自动" else engine_choice
+
+st.sidebar.subheader("性能分析")
+track_memory = st.sidebar.checkbox("记录各阶段内存峰值 (tracemalloc)", value=False)
+log_path = st.sidebar.text_input("JSON日志文件（可选）", value="")
+
+st.sidebar.subheader("结果缓存")
+cache_limit_mb = st.sidebar.number_input("内存缓存上限(MB)", min_value=16, value=1024, step=64)
+cache_dir = st.sidebar.text_input("磁盘缓存目录（可选）", value="")
+
+
+@st.cache_resource
+def get_result_cache(max_bytes, disk_dir):
+    # One cache per process, shared by every rerun and session.
+    return ResultCache(max_bytes, disk_dir or None)
+
+
+result_cache = get_result_cache(int(cache_limit_mb) * 1024 * 1024, cache_dir)
+
+
+@st.cache_resource
+def get_job_manager():
+    # Solves run in these threads, so reruns and other sessions do not block
+    # on them or restart them.
+    return JobManager(max_workers=max(2, os.cpu_count() or 1))
+
+
+job_manager = get_job_manager()
+
+
+@st.cache_resource
+def get_catalog(path):
+    return FileCatalog(path)
+
+if st.sidebar.button("清空缓存"):
+    result_cache.clear(disk=True)
+
+CSV_DOWNLOAD_LIMIT = 1000000
+
+PHASE_NAMES = {
+    'header': '读取文件头',
+    'matrix': '读取系数矩阵',
+    'rhs': '读取右端向量',
+    'factorization': 'LU分解',
+    'forward_substitution': '前代',
+    'back_substitution': '回代',
+    'thomas': '追赶法',
+    'pentadiagonal': '五对角消去',
+    'verification': '残差验证',
+    'spill': '写出临时文件'
+}
+
+
+def create_instrumentation(filename):
+    callbacks = [JsonLogSink(log_path)] if log_path else []
+    return Instrumentation(track_memory=track_memory, callbacks=callbacks, context={'file': filename})
+
+
+def phase_table(phases):
+    rows = []
+    for name, entry in phases.items():
+        peak = entry['peak_memory_bytes']
+        rows.append({
+            '阶段': PHASE_NAMES.get(name, name),
+            '耗时(秒)': f"{entry['time']:.6f}",
+            '调用次数': entry['calls'],
+            # Numeric columns hold None when missing: a column mixing ints and
+            # strings cannot be converted to Arrow for st.dataframe.
+            '浮点运算量': entry['flops'],
+            'GFLOP/s': f"{entry['gflops']:.3f}" if entry['gflops'] is not None else 'N/A',
+            '内存峰值(MB)': f"{peak / 1024 / 1024:.2f}" if peak is not None else 'N/A'
+        })
+    return pd.DataFrame(rows)
+
+
+def plan_table(plan):
+    rows = []
+    for candidate in plan['candidates']:
+        rows.append({
+            '引擎': candidate['engine'],
+            '存储': candidate['storage'],
+            '预计时间(秒)': f"{candidate['estimated_time']:.4g}" if 'estimated_time' in candidate else 'N/A',
+            '预计内存(MB)': f"{candidate['estimated_memory'] / 1024 / 1024:.1f}" if 'estimated_memory' in candidate else 'N/A',
+            '可用': '✅' if candidate['feasible'] else f"❌ {candidate['reason']}",
+            '已选': '⭐' if candidate['engine'] == plan['engine'] else ''
+        })
+    return pd.DataFrame(rows)
+
+
+def solve_with_cache(digest, A, b, plan, instrumentation, temp_path, progress=None):
+    # Cached systems are shared between reruns, so nothing here may modify A
+    # in place.  The banded LU and symmetric engines go through a cached
+    # factorization of a copy of the band.
+    solution_key = ResultCache.make_key(digest, 'solution', plan['engine'])
+    cached = result_cache.get(solution_key)
+    if cached is not None:
+        return cached[0], cached[1], True
+    
+    if plan['engine'] in ('banded_lu', 'symmetric_band'):
+        factorization_key = ResultCache.make_key(digest, 'factorization', plan['engine'], plan['p'], plan['q'])
+        lu = result_cache.get(factorization_key)
+        factor_time = 0
+        cached_lu = lu is not None
+        if not cached_lu and plan['engine'] == 'symmetric_band':
+            lu = SymmetricBandedFactorization(SymmetricBandedMatrix(A.n, A.p, data=A.data.copy()),
+                                              instrumentation=instrumentation)
+        elif not cached_lu:
+            lu = BandedLUFactorization(BandedMatrix(A.n, A.p, A.q, data=A.data.copy()),
+                                       instrumentation=instrumentation)
+        lu.instrumentation = instrumentation
+        # The callback belongs to this job only and must not be pickled with
+        # the cached factorization.
+        lu.progress_callback = progress
+        try:
+            solution = lu.solve(b)
+        finally:
+            lu.progress_callback = None
+        if not cached_lu:
+            factor_time = lu.factor_time
+            result_cache.put(factorization_key, lu)
+        stats = lu.get_stats()
+        stats['solve_time'] = factor_time + lu.solve_time
+        stats['factorization_cached'] = factor_time == 0
+    else:
+        solver = create_planned_solver(temp_path, A, b, plan, instrumentation=instrumentation, progress=progress)
+        solution = solver.solve()
+        stats = solver.get_stats()
+    stats['plan'] = plan
+    
+    result_cache.put(solution_key, (solution, stats))
+    return solution, stats, False
+
+
+def show_solution(solution, stats, from_cache, parse_stats, filename, result_key):
+    st.success("✅ 求解成功！（结果来自缓存）" if from_cache else "✅ 求解成功！")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("解析时间", f"{parse_stats['parse_time']:.6f} 秒")
+    with col2:
+        st.metric("求解时间", f"{stats['solve_time']:.6f} 秒")
+    with col3:
+        st.metric("方程组维度", stats['dimension'])
+
+    with st.expander("⏱️ 各阶段耗时分解"):
+        st.dataframe(phase_table(stats['phases']), use_container_width=True)
+
+    st.subheader("📈 解向量")
+
+    if len(solution) <= 100:
+        df = pd.DataFrame({
+            '索引': range(len(solution)),
+            '解值': solution
+        })
+        st.dataframe(df, use_container_width=True)
+
+        fig, ax = plt.subplots(figsize=(10, 4))
+        ax.plot(solution, marker='o', linestyle='-', markersize=3)
+        ax.set_xlabel('Index')
+        ax.set_ylabel('Solution Value')
+        ax.set_title('Solution Vector Distribution')
+        ax.grid(True, alpha=0.3)
+        st.pyplot(fig)
+    else:
+        st.write(f"解向量维度: {len(solution)}")
+        st.write(f"前10个元素: {solution[:10]}")
+        st.write(f"后10个元素: {solution[-10:]}")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("最小值", f"{np.min(solution):.6f}")
+        with col2:
+            st.metric("最大值", f"{np.max(solution):.6f}")
+        with col3:
+            st.metric("平均值", f"{np.mean(solution):.6f}")
+
+        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 4))
+
+        sample_indices = np.linspace(0, len(solution)-1, min(1000, len(solution)), dtype=int)
+        ax1.plot(sample_indices, solution[sample_indices], linestyle='-', linewidth=0.5)
+        ax1.set_xlabel('Index')
+        ax1.set_ylabel('Solution Value')
+        ax1.set_title('Solution Vector Distribution (Sampled)')
+        ax1.grid(True, alpha=0.3)
+
+        ax2.hist(solution, bins=50, edgecolor='black', alpha=0.7)
+        ax2.set_xlabel('Solution Value')
+        ax2.set_ylabel('Frequency')
+        ax2.set_title('Solution Vector Histogram')
+        ax2.grid(True, alpha=0.3)
+
+        st.pyplot(fig)
+
+    with st.expander("💾 下载解向量"):
+        # Nothing is encoded until a format is asked for; it is then written
+        # once to a temp file, which later reruns serve as is.  Text is only
+        # offered for sizes where it stays reasonable in memory.
+        stem = os.path.splitext(filename)[0]
+        solution_download(solution, result_key, 'npy', f"solution_{stem}.npy", "下载NPY文件（二进制）")
+        if len(solution) <= CSV_DOWNLOAD_LIMIT:
+            solution_download(solution, result_key, 'csv', f"solution_{stem}.csv", "下载CSV文件")
+        else:
+            st.caption(f"解向量超过 {CSV_DOWNLOAD_LIMIT} 个元素，请下载二进制文件或使用 main.py --solution-format csv 导出文本")
+
+
+def solution_download(solution, result_key, fmt, file_name, label):
+    downloads = st.session_state.setdefault('solution_downloads', {})
+    path = downloads.get((result_key, fmt))
+    if path is None or not os.path.exists(path):
+        if not st.button(f"生成{fmt.upper()}文件", key=f"prepare_{result_key}_{fmt}"):
+            return
+        path = os.path.join(tempfile.gettempdir(), f"solution_{result_key}.{fmt}")
+        write_solution(solution, path, fmt)
+        downloads[(result_key, fmt)] = path
+    with open(path, 'rb') as f:
+        st.download_button(label=label, data=f, file_name=file_name, mime=MIME_TYPES[fmt],
+                           key=f"download_{result_key}_{fmt}")
+
+
+def solve_job(digest, A, b, plan, instrumentation, path, owned_path=False, progress=None):
+    # Runs in a job-manager thread.  The upload's temp file is removed when
+    # the script run ends, so file-storage engines get their own copy, which
+    # the job deletes once it is done.
+    try:
+        return solve_with_cache(digest, A, b, plan, instrumentation, path, progress)
+    finally:
+        if owned_path and os.path.exists(path):
+            os.remove(path)
+
+
+JOB_STATUS_NAMES = {
+    'pending': '排队中',
+    'running': '运行中',
+    'done': '已完成',
+    'failed': '失败',
+    'cancelled': '已取消'
+}
+
+
+@st.fragment(run_every=1.0)
+def job_panel():
+    # Polls the job table once a second without rerunning the whole page;
+    # when a job started from this session finishes, the page reruns so its
+    # result is shown.
+    jobs = job_manager.snapshot()
+    if not jobs:
+        return
+    st.subheader("🧵 后台任务")
+    for job in jobs:
+        col1, col2, col3, col4, col5 = st.columns([3, 4, 2, 2, 1])
+        with col1:
+            st.write(f"#{job['id']} {job['name']}")
+        with col2:
+            st.progress(min(job['percent'], 100.0) / 100,
+                        text=f"{JOB_STATUS_NAMES[job['status']]} {job['percent']:.1f}%")
+        with col3:
+            st.write(f"{job['rows_per_second']:,.0f} 行/秒")
+        with col4:
+            st.write(f"剩余 {job['eta']:.1f} 秒" if job['eta'] is not None else f"用时 {job['elapsed']:.1f} 秒")
+        with col5:
+            if job['status'] in ('pending', 'running') and st.button("取消", key=f"cancel_job_{job['id']}"):
+                job_manager.cancel(job['id'])
+    if st.button("清除已结束的任务"):
+        job_manager.clear_finished()
+
+    watched = st.session_state.setdefault('watched_jobs', set())
+    finished = {job['id'] for job in jobs if job['id'] in watched and job['status'] not in ('pending', 'running')}
+    if finished:
+        watched -= finished
+        st.rerun()
+
+
 if mode == "关于系统":
     st.header("系统说明")
     st.markdown("""
@@ -55,16 +337,23 @@ elif mode == "单文件求解":
     
     if uploaded_file is not None:
         temp_path = f"temp_{uploaded_file.name}"
-        with open(temp_path, 'wb') as f:
-            f.write(uploaded_file.getbuffer())
+        digest = content_hash(uploaded_file.getbuffer())
         
         try:
             with st.spinner("正在解析文件..."):
-                info = LinearSystemParser.read_header_only(temp_path)
-                use_efficient = info['version'] == '0x202' and info['n'] > 5000
-                
-                parser = LinearSystemParser(temp_path, use_banded_storage=use_efficient)
-                A, b = parser.parse_file()
+                instrumentation = create_instrumentation(uploaded_file.name)
+                system_key = ResultCache.make_key(digest, 'system', engine_override)
+                system = result_cache.get(system_key)
+                if system is None:
+                    with open(temp_path, 'wb') as f:
+                        f.write(uploaded_file.getbuffer())
+                    info = LinearSystemParser.read_header_only(temp_path)
+                    plan = SolverPlanner().plan_file(temp_path, engine_override)
+                    A, b, parser = load_planned_system(temp_path, plan, instrumentation)
+                    parse_stats = parser.get_stats() if parser is not None else {'parse_time': 0.0}
+                    system = result_cache.put(system_key, (info, plan, A, b, parse_stats))
+                info, plan, A, b, parse_stats = system
+                use_efficient = plan['storage'] != 'dense'
             
             col1, col2, col3 = st.columns(3)
             with col1:
@@ -77,90 +366,45 @@ elif mode == "单文件求解":
                 else:
                     st.metric("带宽", "完整矩阵")
             
-            if use_efficient:
+            if plan['storage'] == 'symmetric':
+                st.info(f"ℹ️ 检测到对称矩阵，仅存储下三角带（内存使用：~{info['n'] * (plan['p'] + 1) * 8 / 1024 / 1024:.1f} MB），"
+                        f"采用 Cholesky / LDLᵀ 分解")
+            elif use_efficient:
                 st.info(f"ℹ️ 使用优化的带状矩阵存储格式（内存使用：~{info['n'] * info['bandwidth'] * 4 / 1024 / 1024:.1f} MB，而非 ~{info['n'] * info['n'] * 4 / 1024 / 1024:.1f} MB）")
             
+            st.info(f"🧭 求解引擎: **{plan['engine']}**（检测带宽 p={plan['p']}, q={plan['q']}）— {plan['explanation']}")
+            with st.expander("🧭 查看求解器选择依据"):
+                st.dataframe(plan_table(plan), use_container_width=True)
+            
             with st.expander("📊 查看文件详细信息"):
                 st.json(info)
             
+            job_key = ResultCache.make_key(digest, 'job', plan['engine'])
             if st.button("🚀 开始求解", type="primary"):
-                with st.spinner("正在求解方程组..."):
-                    try:
-                        if isinstance(A, BandedMatrix):
-                            solver = EfficientBandedSolver(A, b)
-                        elif info['version'] == '0x202' and info['p'] > 0:
-                            solver = BandedGaussianSolver(A, b, info['p'], info['q'])
-                        else:
-                            solver = GaussianEliminationSolver(A, b)
-                        
-                        solution = solver.solve()
-                        stats = solver.get_stats()
-                        
-                        st.success("✅ 求解成功！")
-                        
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.metric("求解时间", f"{stats['solve_time']:.6f} 秒")
-                        with col2:
-                            st.metric("方程组维度", stats['dimension'])
-                        
-                        st.subheader("📈 解向量")
-                        
-                        if len(solution) <= 100:
-                            df = pd.DataFrame({
-                                '索引': range(len(solution)),
-                                '解值': solution
-                            })
-                            st.dataframe(df, use_container_width=True)
-                            
-                            fig, ax = plt.subplots(figsize=(10, 4))
-                            ax.plot(solution, marker='o', linestyle='-', markersize=3)
-                            ax.set_xlabel('Index')
-                            ax.set_ylabel('Solution Value')
-                            ax.set_title('Solution Vector Distribution')
-                            ax.grid(True, alpha=0.3)
-                            st.pyplot(fig)
-                        else:
-                            st.write(f"解向量维度: {len(solution)}")
-                            st.write(f"前10个元素: {solution[:10]}")
-                            st.write(f"后10个元素: {solution[-10:]}")
-                            
-                            col1, col2, col3 = st.columns(3)
-                            with col1:
-                                st.metric("最小值", f"{np.min(solution):.6f}")
-                            with col2:
-                                st.metric("最大值", f"{np.max(solution):.6f}")
-                            with col3:
-                                st.metric("平均值", f"{np.mean(solution):.6f}")
-                            
-                            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 4))
-                            
-                            sample_indices = np.linspace(0, len(solution)-1, min(1000, len(solution)), dtype=int)
-                            ax1.plot(sample_indices, solution[sample_indices], linestyle='-', linewidth=0.5)
-                            ax1.set_xlabel('Index')
-                            ax1.set_ylabel('Solution Value')
-                            ax1.set_title('Solution Vector Distribution (Sampled)')
-                            ax1.grid(True, alpha=0.3)
-                            
-                            ax2.hist(solution, bins=50, edgecolor='black', alpha=0.7)
-                            ax2.set_xlabel('Solution Value')
-                            ax2.set_ylabel('Frequency')
-                            ax2.set_title('Solution Vector Histogram')
-                            ax2.grid(True, alpha=0.3)
-                            
-                            st.pyplot(fig)
-                        
-                        with st.expander("💾 下载解向量"):
-                            csv = pd.DataFrame({'solution': solution}).to_csv(index=False)
-                            st.download_button(
-                                label="下载CSV文件",
-                                data=csv,
-                                file_name=f"solution_{uploaded_file.name}.csv",
-                                mime="text/csv"
-                            )
-                        
-                    except Exception as e:
-                        st.error(f"❌ 求解失败: {str(e)}")
+                job_path, owned_path = temp_path, False
+                if plan['storage'] == 'file':
+                    job_path = os.path.join(tempfile.gettempdir(),
+                                            f"solve_{digest[:16]}_{plan['engine']}_{uploaded_file.name}")
+                    owned_path = True
+                    with open(job_path, 'wb') as f:
+                        f.write(uploaded_file.getbuffer())
+                job_id = job_manager.submit(uploaded_file.name, solve_job, digest, A, b, plan, instrumentation,
+                                            job_path, owned_path, key=job_key)
+                st.session_state.setdefault('watched_jobs', set()).add(job_id)
+            
+            job = job_manager.find(job_key)
+            if job is not None:
+                if job.status in ('pending', 'running'):
+                    st.info("⏳ 正在后台求解，可在下方任务列表查看进度或取消；期间可以继续上传其他文件求解")
+                elif job.status == 'done':
+                    solution, stats, from_cache = job.result
+                    show_solution(solution, stats, from_cache, parse_stats, uploaded_file.name, job_key)
+                elif job.status == 'cancelled':
+                    st.warning("⚠️ 求解已取消")
+                else:
+                    st.error(f"❌ 求解失败: {job.error}")
+            
+            job_panel()
         
         except Exception as e:
             st.error(f"❌ 文件解析失败: {str(e)}")
@@ -171,84 +415,153 @@ elif mode == "单文件求解":
 elif mode == "批量处理":
     st.header("批量处理")
     
-    data_dir = st.text_input("数据文件目录", value="attached_assets")
+    col1, col2 = st.columns(2)
+    with col1:
+        data_dir = st.text_input("数据文件目录", value="attached_assets")
+    with col2:
+        catalog_path = st.text_input("文件索引数据库", value=CATALOG_FILENAME)
     
-    if os.path.exists(data_dir):
-        dat_files = [f for f in os.listdir(data_dir) if f.endswith('.dat')]
+    if os.path.isdir(data_dir):
+        # Only files whose size or mtime changed since the last rerun are
+        # opened; everything below reads the index.
+        catalog = get_catalog(catalog_path)
+        summary = catalog.refresh(data_dir)
         
-        if dat_files:
-            st.write(f"发现 {len(dat_files)} 个数据文件")
+        if summary['files']:
+            st.write(f"发现 {summary['files']} 个数据文件（新增 {summary['added']}，更新 {summary['updated']}，"
+                     f"移除 {summary['removed']}，索引耗时 {summary['refresh_time']:.3f} 秒）")
+            
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                name_filter = st.text_input("文件名包含", value="")
+            with col2:
+                version_filter = st.selectbox("格式", ["全部", "0x102", "0x202"])
+            with col3:
+                min_n = st.number_input("最小阶数", min_value=0, value=0)
+            with col4:
+                max_n = st.number_input("最大阶数（0 表示不限）", min_value=0, value=0)
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                solved_filter = st.selectbox("求解状态", ["全部", "未求解", "已求解"])
+            with col2:
+                sort_names = {'文件名': 'name', '阶数': 'n', '带宽': 'bandwidth', '文件大小': 'size',
+                              '修改时间': 'mtime', '上次求解耗时': 'last_solve_time'}
+                sort_label = st.selectbox("排序", list(sort_names))
+            with col3:
+                descending = st.checkbox("降序", value=False)
+            
+            entries = catalog.files(data_dir, name=name_filter or None,
+                                    version=None if version_filter == "全部" else version_filter,
+                                    min_n=min_n or None, max_n=max_n or None,
+                                    solved={"全部": None, "未求解": False, "已求解": True}[solved_filter],
+                                    sort=sort_names[sort_label], descending=descending)
+            st.dataframe(pd.DataFrame([{
+                '文件名': entry['name'],
+                '格式': entry['version'] or 'N/A',
+                '阶数': entry['n'],
+                '带宽': entry['p'] + entry['q'] + 1 if entry['p'] is not None else None,
+                '大小(MB)': f"{entry['size'] / 1024 / 1024:.1f}",
+                '上次求解引擎': entry['last_engine'] or '',
+                '上次求解耗时(秒)': f"{entry['last_solve_time']:.4f}" if entry['last_solve_time'] is not None else '',
+                '状态': '✅ 已求解' if entry['last_status'] == 'ok' else (f"❌ {entry['error'][:50]}" if entry['error'] else '')
+            } for entry in entries]), use_container_width=True)
             
+            dat_files = [entry['name'] for entry in entries]
             selected_files = st.multiselect(
                 "选择要处理的文件",
                 dat_files,
                 default=dat_files[:4] if len(dat_files) >= 4 else dat_files
             )
             
+            workers = st.number_input("并行进程数", min_value=1, max_value=os.cpu_count() or 1,
+                                      value=os.cpu_count() or 1)
+            col1, col2 = st.columns(2)
+            with col1:
+                solution_dir = st.text_input("解向量输出目录（留空则不保存）", value="")
+            with col2:
+                solution_format = st.selectbox("解向量格式", SOLUTION_FORMATS)
+            skip_solved = st.checkbox("跳过已求解的文件（内容未变且已有成功记录）", value=True)
+            
             if st.button("🚀 批量求解", type="primary"):
                 results = []
+                phase_rows = []
                 progress_bar = st.progress(0)
                 status_text = st.empty()
+                st.subheader("📊 批量处理结果")
+                results_table = st.empty()
                 
-                for idx, filename in enumerate(selected_files):
-                    status_text.text(f"正在处理: {filename}")
-                    filepath = os.path.join(data_dir, filename)
-                    
-                    try:
-                        info = LinearSystemParser.read_header_only(filepath)
-                        use_efficient = info['version'] == '0x202' and info['n'] > 5000
-                        
-                        parser = LinearSystemParser(filepath, use_banded_storage=use_efficient)
-                        A, b = parser.parse_file()
+                engine = BatchEngine(int(workers), track_memory=track_memory, log_path=log_path or None,
+                                     engine=engine_override, output_dir=solution_dir or None,
+                                     output_format=solution_format, catalog=catalog, skip_solved=skip_solved)
+                status_text.text(f"正在处理 {len(selected_files)} 个文件（按计算量从大到小调度）...")
+                for result in engine.run([os.path.join(data_dir, filename) for filename in selected_files]):
+                    filename = result['filename']
+                    if result['status'] == 'ok':
+                        info = result['info']
+                        stats = result['stats']
+                        for row in phase_table(stats['phases']).to_dict('records'):
+                            phase_rows.append({'文件名': filename, **row})
                         
-                        if isinstance(A, BandedMatrix):
-                            solver = EfficientBandedSolver(A, b)
-                        elif info['version'] == '0x202' and info['p'] > 0:
-                            solver = BandedGaussianSolver(A, b, info['p'], info['q'])
-                        else:
-                            solver = GaussianEliminationSolver(A, b)
-                        
-                        solution = solver.solve()
-                        stats = solver.get_stats()
-                        
-                        storage_info = " (优化存储)" if use_efficient else ""
+                        storage_info = " (优化存储)" if result['banded_storage'] else ""
                         
                         results.append({
                             '文件名': filename,
                             '阶数': info['n'],
                             '格式': info['version_name'] + storage_info,
-                            '带宽': info['bandwidth'] if info['bandwidth'] else 'N/A',
-                            '求解时间(秒)': f"{stats['solve_time']:.6f}",
-                            '解的范围': f"[{np.min(solution):.4f}, {np.max(solution):.4f}]",
+                            '求解引擎': result['engine'],
+                            '带宽': info['bandwidth'] or None,
+                            '解析时间(秒)': f"{result['parse_time']:.6f}",
+                            '求解时间(秒)': f"{result['solve_time']:.6f}",
+                            '解的范围': f"[{result['solution_min']:.4f}, {result['solution_max']:.4f}]",
+                            '解向量文件': result.get('output', ''),
                             '状态': '✅ 成功'
                         })
-                        
-                    except Exception as e:
+                    else:
                         results.append({
                             '文件名': filename,
-                            '阶数': 'N/A',
+                            '阶数': None,
                             '格式': 'N/A',
-                            '带宽': 'N/A',
+                            '求解引擎': 'N/A',
+                            '带宽': None,
+                            '解析时间(秒)': 'N/A',
                             '求解时间(秒)': 'N/A',
                             '解的范围': 'N/A',
-                            '状态': f'❌ {str(e)[:50]}'
+                            '解向量文件': '',
+                            '状态': f"❌ {result['error'][:50]}"
                         })
                     
-                    progress_bar.progress((idx + 1) / len(selected_files))
+                    progress_bar.progress(engine.completed / engine.jobs)
+                    status_text.text(f"已完成: {filename} ({engine.completed}/{engine.jobs})")
+                    results_table.dataframe(pd.DataFrame(results), use_container_width=True)
                 
-                status_text.text("处理完成！")
-                
-                st.subheader("📊 批量处理结果")
-                df_results = pd.DataFrame(results)
-                st.dataframe(df_results, use_container_width=True)
+                status_text.text(f"处理完成！总耗时 {engine.get_stats()['total_time']:.4f} 秒")
+                if engine.skipped:
+                    st.info(f"⏭️ 跳过 {len(engine.skipped)} 个已求解文件: "
+                            + ", ".join(os.path.basename(path) for path in engine.skipped))
                 
                 success_count = sum(1 for r in results if '✅' in r['状态'])
                 st.metric("成功率", f"{success_count}/{len(results)}")
+                
+                if phase_rows:
+                    with st.expander("⏱️ 各阶段耗时分解"):
+                        st.dataframe(pd.DataFrame(phase_rows), use_container_width=True)
         else:
             st.warning("⚠️ 未找到.dat文件")
     else:
         st.error(f"❌ 目录不存在: {data_dir}")
 
+cache_stats = result_cache.get_stats()
+st.sidebar.markdown("---")
+st.sidebar.subheader("缓存统计")
+col1, col2 = st.sidebar.columns(2)
+with col1:
+    st.metric("命中", cache_stats['hits'] + cache_stats['disk_hits'])
+with col2:
+    st.metric("未命中", cache_stats['misses'])
+st.sidebar.caption(f"条目 {cache_stats['entries']} · 内存 {cache_stats['memory_bytes'] / 1024 / 1024:.1f} MB"
+                   f" / {cache_stats['max_bytes'] / 1024 / 1024:.0f} MB · 磁盘命中 {cache_stats['disk_hits']}"
+                   f" · 淘汰 {cache_stats['evictions']}")
+
 st.sidebar.markdown("---")
 st.sidebar.markdown("""
 ### 测试数据说明
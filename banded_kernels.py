@@ -0,0 +1,527 @@
+import numpy as np
+import time
+from numpy.lib.stride_tricks import as_strided
+
+PIVOT_TOLERANCE = 1e-10
+# Panel width of the blocked band LU, and the min(p, q) above which it
+# beats the per-pivot kernel (see benchmark.py).
+DEFAULT_BLOCK_SIZE = 16
+BLOCKED_MIN_BANDWIDTH = 64
+# Bands with max(p, q) up to this width are solved as block tridiagonal
+# systems of dense row blocks (see eliminate_narrow_band).
+NARROW_BAND_MAX_BANDWIDTH = 32
+NARROW_BAND_BLOCK_ROWS = 64
+
+
+def _check_pivot(pivot, k):
+    if abs(pivot) < PIVOT_TOLERANCE:
+        raise ValueError(f"Zero pivot encountered at position {k}")
+
+
+def trailing_blocks(data, p, q):
+    # blocks[k, r, c] aliases A[k + 1 + r, k + c] inside the band storage, so
+    # blocks[k] is the p x (q+1) block updated by pivot k.  Only pivots whose
+    # block lies fully inside the matrix are covered.
+    n = data.shape[0]
+    count = max(0, n - max(p, q))
+    if p == 0 or count == 0:
+        return np.empty((0, p, q + 1), dtype=data.dtype)
+    row_stride, col_stride = data.strides
+    return as_strided(data[1:, p - 1:], shape=(count, p, q + 1),
+                      strides=(row_stride, row_stride - col_stride, col_stride))
+
+
+def trailing_block(data, k, p, rows, cols):
+    row_stride, col_stride = data.strides
+    return as_strided(data[k + 1:, p - 1:], shape=(rows, cols),
+                      strides=(row_stride - col_stride, col_stride))
+
+
+def band_matvec(data, p, q, x):
+    # y = A x for band storage; x may be a vector or an (n, k) block.  Each
+    # stored diagonal contributes one shifted, vectorized product, and the
+    # padding outside the matrix is never read.
+    n = data.shape[0]
+    y = np.zeros(x.shape, dtype=np.result_type(data.dtype, x.dtype))
+    for k in range(p + q + 1):
+        offset = k - p
+        lo, hi = max(0, -offset), min(n, n - offset)
+        if lo >= hi:
+            continue
+        column = data[lo:hi, k]
+        if x.ndim > 1:
+            column = column[:, None]
+        y[lo:hi] += column * x[lo + offset:hi + offset]
+    return y
+
+
+def band_rmatvec(data, p, q, x):
+    # y = A^T x for band storage, the transpose counterpart of band_matvec.
+    n = data.shape[0]
+    y = np.zeros(x.shape, dtype=np.result_type(data.dtype, x.dtype))
+    for k in range(p + q + 1):
+        offset = k - p
+        lo, hi = max(0, -offset), min(n, n - offset)
+        if lo >= hi:
+            continue
+        column = data[lo:hi, k]
+        if x.ndim > 1:
+            column = column[:, None]
+        y[lo + offset:hi + offset] += column * x[lo:hi]
+    return y
+
+
+def residual_stats(Ax, b):
+    residual_norm = float(np.linalg.norm(b - Ax))
+    b_norm = float(np.linalg.norm(b))
+    return {
+        'residual_norm': residual_norm,
+        'relative_residual': residual_norm / b_norm if b_norm else residual_norm
+    }
+
+
+def verify_solution(matvec, x, b):
+    # Post-solve check: one matrix-vector product, O(n * bandwidth) for band
+    # storage, reported next to the solver's own timings.
+    start_time = time.time()
+    stats = residual_stats(matvec(x), b)
+    stats['verify_time'] = time.time() - start_time
+    return stats
+
+
+def factor_band(data, p, q, start=0, stop=None, row_offset=0):
+    # In-place LU without pivoting: U overwrites the diagonal and upper band,
+    # the multipliers of L overwrite the lower band (unit diagonal implied).
+    # Only pivots in [start, stop) are processed, so callers working on a
+    # window of a larger matrix can factor it piece by piece; row_offset is
+    # the global index of data[0] and is only used in error messages.
+    n = data.shape[0]
+    stop = n if stop is None else stop
+    blocks = trailing_blocks(data, p, q)
+    full_blocks = blocks.shape[0]
+    multipliers = blocks[:, :, 0]
+    updates = blocks[:, :, 1:]
+    pivot_rows = data[:, p + 1:p + q + 1]
+    diagonal = data[:, p]
+    outer = np.multiply.outer
+
+    for k in range(start, min(stop, full_blocks)):
+        pivot = diagonal[k]
+        _check_pivot(pivot, k + row_offset)
+
+        column = multipliers[k]
+        column /= pivot
+        updates[k] -= outer(column, pivot_rows[k])
+
+    for k in range(max(start, full_blocks), stop):
+        pivot = diagonal[k]
+        _check_pivot(pivot, k + row_offset)
+
+        rows = min(p, n - 1 - k)
+        if rows == 0:
+            continue
+        cols = min(q, n - 1 - k)
+        block = trailing_block(data, k, p, rows, cols + 1)
+        column = block[:, 0]
+        column /= pivot
+        block[:, 1:] -= outer(column, pivot_rows[k, :cols])
+
+
+def band_block_size(p, q, block_size=None):
+    # Effective panel width for factor_band_blocked: None picks
+    # DEFAULT_BLOCK_SIZE once both bandwidths exceed BLOCKED_MIN_BANDWIDTH, and
+    # a panel never exceeds min(p, q).  1 means the unblocked kernel.
+    if block_size is None:
+        block_size = DEFAULT_BLOCK_SIZE if min(p, q) > BLOCKED_MIN_BANDWIDTH else 1
+    if block_size < 1:
+        raise ValueError(f"Block size must be at least 1, got {block_size}")
+    return max(1, min(block_size, p, q))
+
+
+def band_tile(data, p, row, col, rows, cols):
+    # Dense rows x cols view of A[row:row + rows, col:col + cols] inside the
+    # band storage.  Entries outside the band alias neighbouring band slots;
+    # in a C-contiguous band of width p + q + 1 they stay inside the buffer
+    # and no two tile entries alias each other while cols <= p + q.
+    row_stride, col_stride = data.strides
+    return as_strided(data[row:, col - row + p:], shape=(rows, cols),
+                      strides=(row_stride - col_stride, col_stride))
+
+
+def factor_band_blocked(data, p, q, block_size=DEFAULT_BLOCK_SIZE, start=0, stop=None, row_offset=0):
+    # Blocked form of factor_band with the same result.  The pivots are
+    # grouped into panels of nb columns.  Each panel is copied out of the band
+    # as a dense (nb + p) x nb tile and factored there. Its U rows come
+    # from one triangular solve, and the p x q trailing block is updated by
+    # one matrix product, L21 @ U12.  The band only changes once per
+    # panel instead of once per pivot.  Without pivoting there is no fill, so
+    # the tiles fit in the existing p + q + 1 columns.  The tile views read
+    # past the band for their outer triangles, which is only safe on
+    # contiguous storage; other layouts use factor_band.
+    n = data.shape[0]
+    stop = n if stop is None else stop
+    nb = band_block_size(p, q, block_size)
+    if nb == 1 or not data.flags.c_contiguous:
+        return factor_band(data, p, q, start, stop, row_offset)
+
+    # keep[i, t]: entry t of panel row p + i (and, transposed, of the U12
+    # columns from q on) is inside the band.
+    keep = np.triu(np.ones((nb, nb), dtype=bool))
+    outer = np.multiply.outer
+
+    for k0 in range(start, stop, nb):
+        kb = min(nb, stop - k0)
+        rows = min(kb + p, n - k0)
+        cols = min(kb + q, n - k0)
+        tile = band_tile(data, p, k0, k0, rows, cols)
+
+        panel = tile[:, :kb].copy()
+        if rows > p:
+            np.copyto(panel[p:], 0.0, where=~keep[:rows - p, :kb])
+        for t in range(kb):
+            pivot = panel[t, t]
+            _check_pivot(pivot, k0 + t + row_offset)
+            column = panel[t + 1:, t]
+            column /= pivot
+            panel[t + 1:, t + 1:] -= outer(column, panel[t, t + 1:])
+
+        if cols > kb:
+            upper = tile[:kb, kb:].copy()
+            if cols > q:
+                np.copyto(upper[:, q - kb:], 0.0, where=~keep.T[:kb, :cols - q])
+            unit_lower = np.tril(panel[:kb], -1)
+            unit_lower[np.diag_indices(kb)] = 1.0
+            upper = np.linalg.solve(unit_lower, upper)
+            if rows > kb:
+                tile[kb:, kb:] -= panel[kb:] @ upper
+            split = min(q, cols)
+            tile[:kb, kb:split] = upper[:, :split - kb]
+            if cols > q:
+                np.copyto(tile[:kb, q:], upper[:, q - kb:], where=keep.T[:kb, :cols - q])
+
+        split = min(p, rows)
+        tile[:split, :kb] = panel[:split]
+        if rows > p:
+            np.copyto(tile[p:, :kb], panel[p:], where=keep[:rows - p, :kb])
+
+
+def forward_substitute_band(data, b, p, start=0, stop=None):
+    # Solves L y = b in place for rows [start, stop); b is a vector or an
+    # (n, k) block of columns.  Rows before start must already hold y.
+    n = data.shape[0]
+    stop = n if stop is None else stop
+    lower = data[:, :p]
+
+    for i in range(max(start, 1), min(p, stop)):
+        b[i] -= lower[i, p - i:] @ b[:i]
+    for i in range(max(start, p), stop):
+        b[i] -= lower[i] @ b[i - p:i]
+    return b
+
+
+def back_substitute_band(data, b, p, q, start=0, stop=None):
+    # Solves U x = y in place for rows [start, stop), overwriting b with the
+    # solution.  Rows from stop onwards must already hold x.
+    n = data.shape[0]
+    stop = n if stop is None else stop
+    upper = data[:, p + 1:]
+    diagonal = data[:, p]
+
+    for i in range(stop - 1, max(n - 1 - q, start - 1), -1):
+        cols = n - 1 - i
+        b[i] = (b[i] - upper[i, :cols] @ b[i + 1:]) / diagonal[i]
+    for i in range(min(stop - 1, n - 1 - q), start - 1, -1):
+        b[i] = (b[i] - upper[i] @ b[i + 1:i + 1 + q]) / diagonal[i]
+    return b
+
+
+def narrow_band_blocks(n, p, q, block_rows=NARROW_BAND_BLOCK_ROWS):
+    # Row bounds of the dense diagonal blocks.  Every block has at least
+    # max(p, q) rows, so the band only couples neighbouring blocks; the last
+    # block takes the remainder.
+    rows = max(block_rows, p, q, 1)
+    starts = list(range(0, n - rows + 1, rows)) or [0]
+    return list(zip(starts, starts[1:] + [n])) if n else []
+
+
+def _dense_block(data, p, start, stop, cache):
+    rows = stop - start
+    if rows not in cache:
+        r = np.arange(rows)[:, None]
+        c = r + np.arange(data.shape[1]) - p
+        inside = (c >= 0) & (c < rows)
+        cache[rows] = (r * rows + c)[inside], inside
+    flat, inside = cache[rows]
+    block = np.zeros((rows, rows))
+    block.flat[flat] = data[start:stop][inside]
+    return block
+
+
+def eliminate_narrow_band(data, b, p, q, bounds, progress=None):
+    # Block forward sweep of A x = b.  Block k solves its Schur complement
+    # S_k against [U_k | y_k], where U_k couples its last q rows to the first
+    # q unknowns of block k+1, giving (X_k, z_k) with
+    # x_k = z_k - X_k x_{k+1}[:q].  One LAPACK solve per block replaces the
+    # per-pivot NumPy calls of factor_band, which dominate for small p + q.
+    # A and b are only read.  progress counts n rows.
+    couplings = []
+    cache = {}
+    previous = None
+    k = 0
+    for lo, hi in _row_ranges(progress, data.shape[0]):
+        while k < len(bounds) and bounds[k][0] < hi:
+            start, stop = bounds[k]
+            rows = stop - start
+            block = _dense_block(data, p, start, stop, cache)
+            rhs = np.zeros((rows, q + 1))
+            rhs[:, q] = b[start:stop]
+            if previous is not None and p:
+                # A[start + r, start - p + c] for the lower triangle r <= c.
+                lower = np.zeros((p, p))
+                for r in range(p):
+                    lower[r, r:] = data[start + r, :p - r]
+                update = lower @ previous[-p:]
+                block[:p, :q] -= update[:, :q]
+                rhs[:p, q] -= update[:, q]
+            if stop < data.shape[0]:
+                # A[stop - q + t, stop + c] for the upper triangle c <= t.
+                for t in range(q):
+                    rhs[rows - q + t, :t + 1] = data[stop - q + t, p + q - t:]
+            try:
+                previous = np.linalg.solve(block, rhs)
+            except np.linalg.LinAlgError:
+                raise ValueError(f"Zero pivot encountered in rows {start} to {stop - 1}") from None
+            couplings.append(previous)
+            k += 1
+    return couplings
+
+
+def back_substitute_narrow_band(couplings, q, bounds, progress=None):
+    # Block back substitution x_k = z_k - X_k x_{k+1}[:q] over the output of
+    # eliminate_narrow_band.  progress counts n rows.
+    n = bounds[-1][1] if bounds else 0
+    x = np.empty(n)
+    k = len(bounds) - 1
+    for lo, hi in _row_ranges(progress, n, reverse=True):
+        while k >= 0 and bounds[k][1] > lo:
+            start, stop = bounds[k]
+            x[start:stop] = couplings[k][:, q]
+            if stop < n:
+                x[start:stop] -= couplings[k][:, :q] @ x[stop:stop + q]
+            k -= 1
+    return x
+
+
+def is_symmetric_band(data, p, q):
+    # Exact check, one vectorized comparison per off-diagonal:
+    # A[i, i + c] (data[i, p + c]) against A[i + c, i] (data[i + c, p - c]).
+    if p != q:
+        return False
+    n = data.shape[0]
+    return all(np.array_equal(data[:n - c, p + c], data[c:, p - c]) for c in range(1, min(p, n - 1) + 1))
+
+
+def symmetric_band_matvec(data, p, x):
+    # y = A x for symmetric band storage: data[i, c] = A[i, i + c], so each
+    # stored diagonal is applied once above and once below the diagonal.
+    n = data.shape[0]
+    y = np.zeros(x.shape, dtype=np.result_type(data.dtype, x.dtype))
+    for c in range(min(p, n - 1) + 1):
+        column = data[:n - c, c]
+        if x.ndim > 1:
+            column = column[:, None]
+        y[:n - c] += column * x[c:]
+        if c:
+            y[c:] += column * x[:n - c]
+    return y
+
+
+def factor_symmetric_band(data, p, start=0, stop=None, cholesky=False, row_offset=0):
+    # In-place factorization of symmetric band storage (data[k, c] = A[k, k+c],
+    # zero past the last row).  LDL^T leaves d_k in data[k, 0] and the column
+    # l_{k+c, k} in data[k, c]; Cholesky leaves row k of R (A = R^T R).  Only
+    # the lower triangle of each p x p trailing block is meaningful, but the
+    # update runs on whole rows, with the pivot row laid out as a Hankel
+    # matrix so that row i of the block is shifted by i.  Cholesky stops at
+    # the first pivot that is not positive and returns its index (stop when
+    # every pivot was fine); the trailing rows are then the same Schur
+    # complement LDL^T would have produced.
+    n = data.shape[0]
+    stop = n if stop is None else stop
+    padded = np.zeros(2 * p + 1, dtype=data.dtype)
+    hankel = as_strided(padded, shape=(p, p + 1), strides=(padded.strides[0],) * 2)
+    diagonal = data[:, 0]
+    pivot_rows = data[:, 1:]
+    columns = pivot_rows[:, :, None]
+    full_blocks = max(0, n - p)
+    row_stride, col_stride = data.strides
+    blocks = as_strided(data[1:], shape=(full_blocks, p, p + 1), strides=(row_stride, row_stride, col_stride))
+
+    for k in range(start, stop):
+        pivot = diagonal[k]
+        if cholesky:
+            if not pivot >= PIVOT_TOLERANCE:
+                return k
+            pivot = np.sqrt(pivot)
+            diagonal[k] = pivot
+        else:
+            _check_pivot(pivot, k + row_offset)
+
+        row = pivot_rows[k]
+        if cholesky:
+            np.divide(row, pivot, out=padded[:p])
+            row[:] = padded[:p]
+        else:
+            padded[:p] = row
+            row /= pivot
+        if k < full_blocks:
+            blocks[k] -= columns[k] * hankel
+        else:
+            rows = n - 1 - k
+            data[k + 1:] -= columns[k, :rows] * hankel[:rows]
+    return stop
+
+
+def cholesky_to_ldlt(data, stop):
+    # Rewrites rows [0, stop) of a Cholesky factor in LDL^T form, so that a
+    # factorization can switch to LDL^T after Cholesky found a bad pivot.
+    rows = data[:stop]
+    rows[:, 1:] /= rows[:, :1]
+    rows[:, 0] **= 2
+
+
+def forward_substitute_symmetric(data, b, p, start=0, stop=None, cholesky=False):
+    # Solves L y = b (or R^T y = b) in place for rows [start, stop); rows
+    # before start must already hold y.  Row i of L is a diagonal of the
+    # storage, l_{i, i-p+m} = data[i-p+m, p-m], which a strided view turns
+    # into a plain row.  The D of LDL^T is applied in back substitution.
+    n = data.shape[0]
+    stop = n if stop is None else stop
+    diagonal = data[:, 0]
+    row_stride, col_stride = data.strides
+    lower = as_strided(data[:, p], shape=(max(n - p, 0), p), strides=(row_stride, row_stride - col_stride))
+
+    for i in range(start, min(p, stop)):
+        k = np.arange(i)
+        b[i] -= data[k, i - k] @ b[:i]
+        if cholesky:
+            b[i] /= diagonal[i]
+    if cholesky:
+        for i in range(max(start, p), stop):
+            b[i] = (b[i] - lower[i - p] @ b[i - p:i]) / diagonal[i]
+    else:
+        for i in range(max(start, p), stop):
+            b[i] -= lower[i - p] @ b[i - p:i]
+    return b
+
+
+def back_substitute_symmetric(data, b, p, start=0, stop=None, cholesky=False):
+    # Solves D L^T x = y (or R x = y) in place for rows [start, stop); rows
+    # from stop onwards must already hold x.
+    n = data.shape[0]
+    stop = n if stop is None else stop
+    diagonal = data[:, 0]
+    upper = data[:, 1:]
+
+    for i in range(stop - 1, max(n - 1 - p, start - 1), -1):
+        cols = n - 1 - i
+        if cholesky:
+            b[i] = (b[i] - upper[i, :cols] @ b[i + 1:]) / diagonal[i]
+        else:
+            b[i] = b[i] / diagonal[i] - upper[i, :cols] @ b[i + 1:]
+    if cholesky:
+        for i in range(min(stop - 1, n - 1 - p), start - 1, -1):
+            b[i] = (b[i] - upper[i] @ b[i + 1:i + 1 + p]) / diagonal[i]
+    else:
+        for i in range(min(stop - 1, n - 1 - p), start - 1, -1):
+            b[i] = b[i] / diagonal[i] - upper[i] @ b[i + 1:i + 1 + p]
+    return b
+
+
+def _check_batch_pivots(pivots, k):
+    failed = np.flatnonzero(np.abs(pivots) < PIVOT_TOLERANCE)
+    if failed.size:
+        raise ValueError(f"Zero pivot encountered at position {k} in systems {failed.tolist()}")
+
+
+def _band_columns(data, b):
+    # Splits (n, w) band storage, or a stacked (batch, n, w) array, into
+    # per-diagonal sequences indexed by row.  A single system becomes Python
+    # float lists, which are much cheaper to walk than NumPy scalars; a batch
+    # becomes (n, batch) arrays so each row step is vectorized over systems.
+    if data.ndim == 2:
+        return [data[:, k].tolist() for k in range(data.shape[1])], b.tolist(), _check_pivot
+    columns = [np.ascontiguousarray(data[:, :, k].T) for k in range(data.shape[2])]
+    return columns, np.ascontiguousarray(b.T), _check_batch_pivots
+
+
+def _row_ranges(progress, n, reverse=False):
+    # Rows [0, n) in the chunks a ProgressTracker reports after (so a
+    # cancelled solve stops between chunks), or in one piece without one.
+    if progress is None:
+        return [(0, n)] if n else []
+    return progress.steps(0, n, reverse)
+
+
+def solve_tridiagonal_band(data, b, progress=None):
+    # Thomas algorithm on p = q = 1 band storage: columns are A[i, i-1],
+    # A[i, i], A[i, i+1].  data may also be a (batch, n, 3) stack with b of
+    # shape (batch, n).  progress counts 2n rows, one per row and sweep.
+    (sub, diag, sup), rhs, check = _band_columns(data, b)
+    n = len(diag)
+    c = [0.0] * (n + 1)
+    d = [0.0] * (n + 1)
+
+    for start, stop in _row_ranges(progress, n):
+        for i in range(start, stop):
+            lower = sub[i] if i > 0 else 0.0
+            upper = sup[i] if i < n - 1 else 0.0
+            pivot = diag[i] - lower * c[i]
+            check(pivot, i)
+            c[i + 1] = upper / pivot
+            d[i + 1] = (rhs[i] - lower * d[i]) / pivot
+
+    x = [0.0] * (n + 1)
+    for start, stop in _row_ranges(progress, n, reverse=True):
+        for i in range(stop - 1, start - 1, -1):
+            x[i] = d[i + 1] - c[i + 1] * x[i + 1]
+
+    return np.array(x[:n]).T if n else np.zeros(b.shape)
+
+
+def solve_pentadiagonal_band(data, b, progress=None):
+    # Banded elimination specialised to p = q = 2: columns are A[i, i-2],
+    # A[i, i-1], A[i, i], A[i, i+1], A[i, i+2].  Accepts a (batch, n, 5)
+    # stack and a progress tracker like solve_tridiagonal_band.
+    (far_sub, sub, diag, sup, far_sup), rhs, check = _band_columns(data, b)
+    n = len(diag)
+    # U rows are kept with two leading dummy rows so every step can refer to
+    # rows i-1 and i-2 without boundary branches.
+    u_diag = [1.0, 1.0] + [0.0] * n
+    u_sup = [0.0] * (n + 2)
+    u_far = [0.0] * (n + 2)
+    y = [0.0] * (n + 2)
+
+    for start, stop in _row_ranges(progress, n):
+        for i in range(start, stop):
+            j = i + 2
+            a = far_sub[i] if i > 1 else 0.0
+            l2 = a / u_diag[j - 2]
+            beta = (sub[i] if i > 0 else 0.0) - l2 * u_sup[j - 2]
+            alpha = diag[i] - l2 * u_far[j - 2]
+            y[j] = rhs[i] - l2 * y[j - 2]
+
+            l1 = beta / u_diag[j - 1]
+            u_diag[j] = alpha - l1 * u_sup[j - 1]
+            check(u_diag[j], i)
+            u_sup[j] = (sup[i] if i < n - 1 else 0.0) - l1 * u_far[j - 1]
+            u_far[j] = far_sup[i] if i < n - 2 else 0.0
+            y[j] = y[j] - l1 * y[j - 1]
+
+    x = [0.0] * (n + 2)
+    for start, stop in _row_ranges(progress, n, reverse=True):
+        for i in range(stop - 1, start - 1, -1):
+            j = i + 2
+            x[i] = (y[j] - u_sup[j] * x[i + 1] - u_far[j] * x[i + 2]) / u_diag[j]
+
+    return np.array(x[:n]).T if n else np.zeros(b.shape)
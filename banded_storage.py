@@ -1,12 +1,18 @@
 import numpy as np
+from banded_kernels import band_matvec, band_rmatvec, is_symmetric_band, symmetric_band_matvec
 
 class BandedMatrix:
-    def __init__(self, n, p, q):
+    def __init__(self, n, p, q, data=None, dtype=np.float64):
         self.n = n
         self.p = p
         self.q = q
         self.bandwidth = p + q + 1
-        self.data = np.zeros((n, self.bandwidth))
+        if data is None:
+            self.data = np.zeros((n, self.bandwidth), dtype=dtype)
+        elif data.shape != (n, self.bandwidth):
+            raise ValueError(f"Band data must have shape {(n, self.bandwidth)}, got {data.shape}")
+        else:
+            self.data = data
         
     def set(self, i, j, value):
         if i < 0 or i >= self.n or j < 0 or j >= self.n:
@@ -43,14 +49,94 @@ class BandedMatrix:
             values.append(self.get(i, j))
         return np.array(values), start_col, end_col
     
+    def _band_indices(self):
+        rows = np.broadcast_to(np.arange(self.n)[:, None], (self.n, self.bandwidth))
+        cols = rows - self.p + np.arange(self.bandwidth)
+        inside = (cols >= 0) & (cols < self.n)
+        return rows[inside], cols[inside], inside
+    
     def to_dense(self):
-        dense = np.zeros((self.n, self.n))
-        for i in range(self.n):
-            for k in range(self.bandwidth):
-                j = i - self.p + k
-                if 0 <= j < self.n:
-                    dense[i, j] = self.data[i, k]
+        dense = np.zeros((self.n, self.n), dtype=self.data.dtype)
+        rows, cols, inside = self._band_indices()
+        dense[rows, cols] = self.data[inside]
         return dense
     
+    @classmethod
+    def from_dense(cls, dense, p, q):
+        n = dense.shape[0]
+        matrix = cls(n, p, q, dtype=np.result_type(dense.dtype, np.float32))
+        rows, cols, inside = matrix._band_indices()
+        matrix.data[inside] = dense[rows, cols]
+        return matrix
+    
+    def matvec(self, x):
+        return band_matvec(self.data, self.p, self.q, np.asarray(x))
+    
+    def rmatvec(self, x):
+        return band_rmatvec(self.data, self.p, self.q, np.asarray(x))
+    
     def __repr__(self):
         return f"BandedMatrix(n={self.n}, p={self.p}, q={self.q}, storage={self.data.shape})"
+
+
+class SymmetricBandedMatrix:
+    # Symmetric band with p = q, stored once: data[i, c] = A[i, i + c] for
+    # c = 0..p, i.e. the upper half of each band row, which is also the
+    # lower band read by columns.  Entries past the last row are zero.
+    def __init__(self, n, p, data=None, dtype=np.float64):
+        self.n = n
+        self.p = p
+        self.q = p
+        self.bandwidth = 2 * p + 1
+        if data is None:
+            self.data = np.zeros((n, p + 1), dtype=dtype)
+        elif data.shape != (n, p + 1):
+            raise ValueError(f"Symmetric band data must have shape {(n, p + 1)}, got {data.shape}")
+        else:
+            self.data = data
+
+    def set(self, i, j, value):
+        i, j = min(i, j), max(i, j)
+        if 0 <= i and j < self.n and j - i <= self.p:
+            self.data[i, j - i] = value
+
+    def get(self, i, j):
+        i, j = min(i, j), max(i, j)
+        if 0 <= i and j < self.n and j - i <= self.p:
+            return self.data[i, j - i]
+        return 0.0
+
+    def to_banded(self):
+        # Full band storage (both triangles), as the LU solvers expect it.
+        n, p = self.n, self.p
+        band = np.zeros((n, 2 * p + 1), dtype=self.data.dtype)
+        band[:, p:] = self.data
+        for c in range(1, min(p, n - 1) + 1):
+            band[c:, p - c] = self.data[:n - c, c]
+        return BandedMatrix(n, p, p, data=band)
+
+    def to_dense(self):
+        return self.to_banded().to_dense()
+
+    @classmethod
+    def from_banded(cls, A, check=True, dtype=None):
+        if check and not is_symmetric_band(A.data, A.p, A.q):
+            raise ValueError("Matrix is not symmetric")
+        matrix = cls(A.n, A.p, data=np.array(A.data[:, A.p:], dtype=dtype))
+        # Band rows near the end may carry junk past the matrix edge.
+        for c in range(1, min(A.p, A.n) + 1):
+            matrix.data[A.n - c:, c] = 0.0
+        return matrix
+
+    @classmethod
+    def from_dense(cls, dense, p):
+        return cls.from_banded(BandedMatrix.from_dense(dense, p, p))
+
+    def matvec(self, x):
+        return symmetric_band_matvec(self.data, self.p, np.asarray(x))
+
+    def rmatvec(self, x):
+        return self.matvec(x)
+
+    def __repr__(self):
+        return f"SymmetricBandedMatrix(n={self.n}, p={self.p}, storage={self.data.shape})"
@@ -0,0 +1,150 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from file_parser import LinearSystemParser
+from instrumentation import Instrumentation, JsonLogSink
+from solver_planner import SolverPlanner, load_planned_system, create_planned_solver
+from solution_writer import write_solution, solution_path
+
+
+def estimate_cost(info):
+    # Header-only estimate of the planner's chosen engine, in seconds.
+    return SolverPlanner(detect=False).plan(info)['estimated_time']
+
+
+def solve_file(filepath, verify=False, track_memory=False, log_path=None, return_solution=False, engine=None,
+               memory_limit=None, output_dir=None, output_format='npy'):
+    result = {'filename': os.path.basename(filepath), 'path': filepath}
+    start_time = time.time()
+    try:
+        info = LinearSystemParser.read_header_only(filepath)
+        result['info'] = info
+        plan = SolverPlanner(memory_limit).plan_file(filepath, engine)
+
+        callbacks = [JsonLogSink(log_path)] if log_path else []
+        instrumentation = Instrumentation(track_memory, callbacks, context={'file': result['filename']})
+        A, b, parser = load_planned_system(filepath, plan, instrumentation)
+
+        # The parsed system belongs to this job alone, so solvers may
+        # eliminate in it directly.
+        solver = create_planned_solver(filepath, A, b, plan, verify=verify, instrumentation=instrumentation,
+                                       overwrite=True)
+        solution = solver.solve()
+        stats = solver.get_stats()
+        stats['plan'] = plan
+
+        result.update({
+            'status': 'ok',
+            'engine': plan['engine'],
+            'banded_storage': plan['storage'] != 'dense',
+            'parse_time': parser.get_stats()['parse_time'] if parser is not None else 0.0,
+            'solve_time': stats['solve_time'],
+            'solution_min': float(np.min(solution)),
+            'solution_max': float(np.max(solution)),
+            'stats': stats
+        })
+        if output_dir is not None:
+            result['output'] = solution_path(output_dir, filepath, output_format)
+            write_solution(solution, result['output'], output_format)
+        if return_solution:
+            result['solution'] = np.asarray(solution)
+    except Exception as e:
+        result.update({'status': 'error', 'error': str(e)})
+    result['wall_time'] = time.time() - start_time
+    return result
+
+
+class BatchEngine:
+    def __init__(self, max_workers=None, verify=False, track_memory=False, log_path=None, return_solution=False,
+                 engine=None, memory_limit=None, output_dir=None, output_format='npy', catalog=None,
+                 skip_solved=False):
+        # With a FileCatalog, results are recorded in it, measured timings
+        # drive the schedule, and skip_solved leaves out files whose current
+        # content already has a successful solve.
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.options = {
+            'verify': verify,
+            'track_memory': track_memory,
+            'log_path': log_path,
+            'return_solution': return_solution,
+            'engine': engine,
+            'memory_limit': memory_limit,
+            'output_dir': output_dir,
+            'output_format': output_format
+        }
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+        self.catalog = catalog
+        self.skip_solved = skip_solved
+        self.total_time = 0
+        self.completed = 0
+        self.failed = 0
+        self.jobs = 0
+        self.skipped = []
+
+    def schedule(self, paths):
+        # Most expensive first, so the longest job does not start last and
+        # leave the other workers idle.  A timing measured in an earlier run
+        # beats the planner's estimate.  Unreadable headers sort last and
+        # fail in their worker with a proper error.
+        def cost(path):
+            try:
+                measured = self.catalog.estimate_cost(path) if self.catalog is not None else None
+                return measured if measured is not None else estimate_cost(LinearSystemParser.read_header_only(path))
+            except Exception:
+                return -1
+        return sorted(paths, key=cost, reverse=True)
+
+    def run(self, paths):
+        start_time = time.time()
+        self.skipped = []
+        if self.catalog is not None and self.skip_solved:
+            require_output = self.options['output_dir'] is not None
+            solved = [self.catalog.is_solved(path, require_output) for path in paths]
+            self.skipped = [path for path, done in zip(paths, solved) if done]
+            paths = [path for path, done in zip(paths, solved) if not done]
+        jobs = self.schedule(paths)
+        self.jobs = len(jobs)
+        self.completed = 0
+        self.failed = 0
+
+        try:
+            if self.max_workers == 1 or len(jobs) <= 1:
+                for path in jobs:
+                    yield self._count(solve_file(path, **self.options))
+            else:
+                with ProcessPoolExecutor(max_workers=min(self.max_workers, len(jobs))) as executor:
+                    futures = [executor.submit(solve_file, path, **self.options) for path in jobs]
+                    for future in as_completed(futures):
+                        yield self._count(future.result())
+        finally:
+            self.total_time = time.time() - start_time
+
+    def _count(self, result):
+        self.completed += 1
+        if result['status'] != 'ok':
+            self.failed += 1
+        if self.catalog is not None:
+            self.catalog.record_solve(result)
+        return result
+
+    def get_stats(self):
+        return {
+            'total_time': self.total_time,
+            'jobs': self.jobs,
+            'completed': self.completed,
+            'failed': self.failed,
+            'skipped': len(self.skipped),
+            'workers': min(self.max_workers, max(self.jobs, 1))
+        }
+
+
+def collect_dat_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith('.dat'))
+        else:
+            files.append(path)
+    return files
@@ -0,0 +1,233 @@
+import time
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+from banded_kernels import PIVOT_TOLERANCE, residual_stats
+from file_parser import LinearSystemParser
+from instrumentation import (Instrumentation, band_lu_flops, band_forward_flops, band_back_flops, band_matvec_flops,
+                             dense_lu_flops, dense_substitution_flops)
+
+
+def _mark_failures(pivots, k, failed_at):
+    # A system whose pivot vanishes is recorded and given a unit pivot, so
+    # the rest of the batch keeps going on finite numbers; its solution is
+    # discarded at the end.
+    bad = np.abs(pivots) < PIVOT_TOLERANCE
+    if bad.any():
+        failed_at[bad & (failed_at < 0)] = k
+        pivots[bad] = 1.0
+
+
+def solve_dense_batch(A, b, pivoting=False):
+    # Gaussian elimination on a (batch, n, n) stack, every step vectorized
+    # over the batch axis.  A and b are overwritten.  Returns the solutions
+    # (NaN rows for failed systems), the pivot index each system failed at
+    # (-1 if none) and the number of row swaps per system.
+    batch, n = b.shape
+    systems = np.arange(batch)
+    failed_at = np.full(batch, -1)
+    swaps = np.zeros(batch, dtype=int)
+
+    with np.errstate(all='ignore'):
+        for k in range(n):
+            if pivoting:
+                r = k + np.argmax(np.abs(A[:, k:, k]), axis=1)
+                moved = r != k
+                if moved.any():
+                    rows = A[systems, k].copy()
+                    A[systems, k] = A[systems, r]
+                    A[systems, r] = rows
+                    rhs = b[systems, k].copy()
+                    b[systems, k] = b[systems, r]
+                    b[systems, r] = rhs
+                    swaps += moved
+
+            pivots = A[:, k, k]
+            _mark_failures(pivots, k, failed_at)
+            A[:, k, k] = pivots
+            if k == n - 1:
+                break
+            column = A[:, k + 1:, k] / pivots[:, None]
+            A[:, k + 1:, k + 1:] -= column[:, :, None] * A[:, k, None, k + 1:]
+            b[:, k + 1:] -= column * b[:, k, None]
+
+        for i in range(n - 1, -1, -1):
+            b[:, i] = (b[:, i] - np.einsum('ij,ij->i', A[:, i, i + 1:], b[:, i + 1:])) / A[:, i, i]
+
+    b[failed_at >= 0] = np.nan
+    return b, failed_at, swaps
+
+
+def _trailing_block_batch(data, k, p, rows, cols):
+    # Stacked counterpart of banded_kernels.trailing_block:
+    # block[s, r, c] aliases A_s[k + 1 + r, k + c].
+    batch_stride, row_stride, col_stride = data.strides
+    return as_strided(data[:, k + 1:, p - 1:], shape=(data.shape[0], rows, cols),
+                      strides=(batch_stride, row_stride - col_stride, col_stride))
+
+
+def solve_band_batch(data, b, p, q):
+    # LU without pivoting on a (batch, n, p+q+1) stack of band storage,
+    # vectorized over the batch axis.  data and b are overwritten; the return
+    # value matches solve_dense_batch without the swap counts.
+    batch, n = b.shape
+    failed_at = np.full(batch, -1)
+
+    with np.errstate(all='ignore'):
+        for k in range(n):
+            pivots = data[:, k, p]
+            _mark_failures(pivots, k, failed_at)
+            data[:, k, p] = pivots
+            rows = min(p, n - 1 - k)
+            if rows == 0:
+                continue
+            cols = min(q, n - 1 - k)
+            block = _trailing_block_batch(data, k, p, rows, cols + 1)
+            column = block[:, :, 0]
+            column /= pivots[:, None]
+            block[:, :, 1:] -= column[:, :, None] * data[:, k, None, p + 1:p + 1 + cols]
+
+        # The multipliers of row i sit in data[:, i, p - m] for m = 1..p.
+        for i in range(1, n):
+            m = min(p, i)
+            b[:, i] -= np.einsum('ij,ij->i', data[:, i, p - m:p], b[:, i - m:i])
+        for i in range(n - 1, -1, -1):
+            cols = min(q, n - 1 - i)
+            b[:, i] = (b[:, i] - np.einsum('ij,ij->i', data[:, i, p + 1:p + 1 + cols], b[:, i + 1:i + 1 + cols])) \
+                / data[:, i, p]
+
+    b[failed_at >= 0] = np.nan
+    return b, failed_at
+
+
+def band_matvec_batch(data, p, q, x):
+    # y_s = A_s x_s for a (batch, n, w) stack, one shifted product per diagonal.
+    n = data.shape[1]
+    y = np.zeros(x.shape, dtype=np.result_type(data.dtype, x.dtype))
+    for k in range(p + q + 1):
+        offset = k - p
+        lo, hi = max(0, -offset), min(n, n - offset)
+        if lo < hi:
+            y[:, lo:hi] += data[:, lo:hi, k] * x[:, lo + offset:hi + offset]
+    return y
+
+
+def load_stacked_systems(filenames, use_banded_storage=False):
+    # Parses same-shape .dat files into the (batch, n, n) or (batch, n, w)
+    # stack BatchedSolver takes.  Returns (A, b, p, q); p and q are None for
+    # dense stacks.
+    matrices, rhs, shape = [], [], None
+    for filename in filenames:
+        A, b = LinearSystemParser(filename, use_banded_storage=use_banded_storage).parse_file()
+        current = (A.n, A.p, A.q) if use_banded_storage else A.shape
+        if shape is not None and current != shape:
+            raise ValueError(f"{filename} has shape {current}, expected {shape} like the rest of the batch")
+        shape = current
+        matrices.append(A.data if use_banded_storage else A)
+        rhs.append(b)
+    if not matrices:
+        raise ValueError("No systems to stack")
+    p, q = (shape[1], shape[2]) if use_banded_storage else (None, None)
+    return np.stack(matrices), np.stack(rhs), p, q
+
+
+class BatchedSolver:
+    def __init__(self, A, b, p=None, q=None, pivoting=False, verify=False, instrumentation=None):
+        # A is a (batch, n, n) dense stack, or a (batch, n, p+q+1) band stack
+        # when p and q are given; b is (batch, n).
+        A = np.asarray(A)
+        b = np.asarray(b)
+        self.banded = p is not None or q is not None
+        if self.banded:
+            p = p or 0
+            q = q or 0
+        width = p + q + 1 if self.banded else (b.shape[-1] if b.ndim else None)
+        if A.ndim != 3 or b.ndim != 2 or A.shape[:2] != b.shape or A.shape[2] != width:
+            expected = f"(batch, n, {width})" if self.banded else "(batch, n, n)"
+            raise ValueError(f"Expected A of shape {expected} and b of shape (batch, n), got {A.shape} and {b.shape}")
+        if self.banded and pivoting:
+            raise ValueError("Pivoting is not supported for band storage")
+
+        self.A = A.astype(np.float64)
+        self.b = b.astype(np.float64)
+        self.A_original = A if verify else None
+        self.b_original = b if verify else None
+        self.batch_size, self.n = b.shape
+        self.p = p
+        self.q = q
+        self.pivoting = pivoting
+        self.verify = verify
+        self.verification = {}
+        self.instrumentation = instrumentation or Instrumentation()
+        self.solution = None
+        self.failed_at = None
+        self.row_swaps = None
+        self.solve_time = 0
+
+    def solve(self):
+        start_time = time.time()
+        batch, n = self.batch_size, self.n
+        if self.banded:
+            p, q = self.p, self.q
+            flops = batch * (band_lu_flops(n, p, q) + band_forward_flops(n, p) + band_back_flops(n, q))
+            with self.instrumentation.phase('factorization', flops):
+                self.solution, self.failed_at = solve_band_batch(self.A, self.b, p, q)
+            self.row_swaps = np.zeros(batch, dtype=int)
+        else:
+            flops = batch * (dense_lu_flops(n) + 2 * dense_substitution_flops(n))
+            with self.instrumentation.phase('factorization', flops):
+                self.solution, self.failed_at, self.row_swaps = solve_dense_batch(self.A, self.b, self.pivoting)
+        self.solve_time = time.time() - start_time
+
+        if self.verify:
+            self._verify()
+        return self.solution
+
+    def _verify(self):
+        # Per-system residuals; failed systems report NaN.
+        batch, n = self.batch_size, self.n
+        verify_start = time.time()
+        if self.banded:
+            flops = batch * band_matvec_flops(n, self.p, self.q)
+            with self.instrumentation.phase('verification', flops):
+                Ax = band_matvec_batch(self.A_original, self.p, self.q, self.solution)
+        else:
+            with self.instrumentation.phase('verification', batch * 2 * n * n):
+                Ax = np.einsum('sij,sj->si', self.A_original, self.solution)
+        residuals = np.linalg.norm(self.b_original - Ax, axis=1)
+        b_norms = np.linalg.norm(self.b_original, axis=1)
+        relative = np.divide(residuals, b_norms, out=residuals.copy(), where=b_norms > 0)
+        ok = self.failed_at < 0
+        overall = residual_stats(Ax[ok], self.b_original[ok]) if ok.any() else {}
+        self.verification = {
+            **overall,
+            'relative_residuals': relative.tolist(),
+            'max_relative_residual': float(np.max(relative[ok])) if ok.any() else float('nan'),
+            'verify_time': time.time() - verify_start
+        }
+
+    def failures(self):
+        # {system index: pivot position} for every system that hit a zero pivot.
+        if self.failed_at is None:
+            return {}
+        return {int(s): int(self.failed_at[s]) for s in np.flatnonzero(self.failed_at >= 0)}
+
+    def get_stats(self):
+        failures = self.failures()
+        stats = {
+            'solve_time': self.solve_time,
+            'batch_size': self.batch_size,
+            'dimension': self.n,
+            'storage_format': 'batched_banded' if self.banded else 'batched_dense',
+            'pivoting': self.pivoting,
+            'row_swaps': int(self.row_swaps.sum()) if self.row_swaps is not None else 0,
+            'solved': self.batch_size - len(failures) if self.failed_at is not None else 0,
+            'failed': len(failures),
+            'failures': failures,
+            'time_per_system': self.solve_time / self.batch_size if self.batch_size else 0.0,
+            'phases': self.instrumentation.summary(),
+            **self.verification
+        }
+        if self.banded:
+            stats['upper_bandwidth'] = self.q
+            stats['lower_bandwidth'] = self.p
+        return stats
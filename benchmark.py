@@ -0,0 +1,346 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from file_parser import LinearSystemParser
+from data_generator import generate_dat_file
+from gaussian_solver import (BandedGaussianSolver, EfficientBandedSolver, BandedLUFactorization,
+                             SymmetricBandedSolver)
+from sparse_solver import SparseBandedSolver
+from solver_planner import SOLVER_REGISTRY
+from banded_kernels import DEFAULT_BLOCK_SIZE
+from instrumentation import band_lu_flops, band_symmetric_flops
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+DEFAULT_BANDWIDTHS = [5]
+DENSE_LIMIT = 2000
+COMPARED_METRICS = ('parse_time', 'solve_time', 'peak_memory_bytes')
+
+def _run_solver(solver):
+    solution = solver.solve()
+    return solution, solver.get_stats()
+
+
+def _run_factorization(A, b):
+    lu = BandedLUFactorization(A)
+    lu.factor()
+    solution = lu.solve(b)
+    return solution, lu.get_stats()
+
+
+def _run_sparse(A, b, seed=0):
+    # The band as COO triplets under a fixed random relabelling, so the
+    # reverse Cuthill-McKee step has a real bandwidth to recover.
+    n = A.n
+    offsets = np.arange(A.p + A.q + 1) - A.p
+    rows = np.repeat(np.arange(n), len(offsets))
+    cols = rows + np.tile(offsets, n)
+    values = A.data.reshape(-1)
+    keep = (cols >= 0) & (cols < n) & (values != 0)
+    perm = np.random.default_rng(seed).permutation(n)
+    b_relabelled = np.empty(n)
+    b_relabelled[perm] = b
+    solver = SparseBandedSolver(perm[rows[keep]], perm[cols[keep]], values[keep], b_relabelled)
+    return solver.solve()[perm], solver.get_stats()
+
+
+def _engine_case(spec):
+    # One case per planner engine, run through the same factory the planner
+    # uses.  Dense storage stops at the dense limit, symmetric storage needs
+    # p == q, and the benchmark only writes 0x202 files.
+    def applies(n, p, q, limit):
+        return ('0x202' in spec.versions and spec.applies(n, p, q) and (spec.storage != 'dense' or n <= limit)
+                and (spec.storage != 'symmetric' or p == q))
+
+    def run(filename, A, b, p, q):
+        return _run_solver(spec.factory(filename, A, b, p, q))
+
+    return spec.storage, applies, run
+
+
+# name -> (storage, applies(n, p, q, dense_limit), run(filename, A, b, p, q)).
+# Storage is a planner storage kind ('banded', 'symmetric', 'dense', 'file')
+# or 'banded_float32', which parses the band in the file's float32.
+# Symmetric cases run on a symmetric system of the same size.  Every engine
+# in the planner's registry is a case under its engine name; the variants
+# below cover options and engines the planner does not choose between.
+BENCHMARK_CASES = {name: _engine_case(spec) for name, spec in SOLVER_REGISTRY.items()}
+BENCHMARK_CASES.update({
+    'EfficientBandedSolver[overwrite]': (
+        'banded', lambda n, p, q, limit: True,
+        lambda filename, A, b, p, q: _run_solver(EfficientBandedSolver(A, b, overwrite=True))),
+    'BandedGaussianSolver[banded]': (
+        'banded', lambda n, p, q, limit: True,
+        lambda filename, A, b, p, q: _run_solver(BandedGaussianSolver(A, b, overwrite=True))),
+    'EfficientBandedSolver[unblocked]': (
+        'banded', lambda n, p, q, limit: True,
+        lambda filename, A, b, p, q: _run_solver(EfficientBandedSolver(A, b, block_size=1))),
+    'EfficientBandedSolver[blocked]': (
+        'banded', lambda n, p, q, limit: min(p, q) > 1,
+        lambda filename, A, b, p, q: _run_solver(EfficientBandedSolver(A, b, block_size=DEFAULT_BLOCK_SIZE))),
+    'EfficientBandedSolver[mixed]': (
+        'banded_float32', lambda n, p, q, limit: True,
+        lambda filename, A, b, p, q: _run_solver(EfficientBandedSolver(A, b, precision='mixed'))),
+    'BandedLUFactorization': (
+        'banded', lambda n, p, q, limit: True,
+        lambda filename, A, b, p, q: _run_factorization(A, b)),
+    'SymmetricBandedSolver[ldlt]': (
+        'symmetric', lambda n, p, q, limit: p == q,
+        lambda filename, A, b, p, q: _run_solver(SymmetricBandedSolver(A, b, method='ldlt'))),
+    'SparseBandedSolver[rcm]': (
+        'banded', lambda n, p, q, limit: True,
+        lambda filename, A, b, p, q: _run_sparse(A, b)),
+})
+
+
+def _measure_case(filename, storage, run, p, q, track_memory):
+    if track_memory:
+        tracemalloc.start()
+
+    # File-storage engines read the file themselves, so there is no parse.
+    start_time = time.perf_counter()
+    A = b = None
+    if storage != 'file':
+        parser = LinearSystemParser(filename, use_banded_storage=(storage != 'dense'),
+                                    dtype=np.float32 if storage == 'banded_float32' else np.float64,
+                                    symmetric=storage == 'symmetric')
+        A, b = parser.parse_file()
+    parse_time = time.perf_counter() - start_time
+    parse_peak = tracemalloc.get_traced_memory()[1] if track_memory else None
+
+    if track_memory:
+        tracemalloc.reset_peak()
+    start_time = time.perf_counter()
+    solution, stats = run(filename, A, b, p, q)
+    solve_time = time.perf_counter() - start_time
+    solve_peak = tracemalloc.get_traced_memory()[1] if track_memory else None
+
+    if track_memory:
+        tracemalloc.stop()
+    if storage == 'file':
+        # What the band and b would take in float64 band storage.
+        n = len(solution)
+        stats['system_bytes'] = 8 * n * (p + q + 1) + 8 * n
+    else:
+        stats['system_bytes'] = (A if storage == 'dense' else A.data).nbytes + b.nbytes
+    return parse_time, parse_peak, solve_time, solve_peak, solution, stats
+
+
+def _relative_residual(filename, solution):
+    A, b = LinearSystemParser(filename, use_banded_storage=True).parse_file()
+    return float(np.linalg.norm(A.matvec(solution) - b) / (np.linalg.norm(b) or 1.0))
+
+
+def run_benchmarks(sizes=None, bandwidths=None, solvers=None, margin=1.0, seed=0, repeat=1,
+                   dense_limit=DENSE_LIMIT, track_memory=True, data_dir=None, log=print):
+    sizes = sizes or DEFAULT_SIZES
+    bandwidths = bandwidths or DEFAULT_BANDWIDTHS
+    solvers = solvers or list(BENCHMARK_CASES)
+    results = []
+
+    with tempfile.TemporaryDirectory(dir=data_dir) as work_dir:
+        for bandwidth in bandwidths:
+            p = q = bandwidth
+            for n in sizes:
+                files = {}
+
+                for name in solvers:
+                    storage, applies, run = BENCHMARK_CASES[name]
+                    record = {'solver': name, 'n': n, 'p': p, 'q': q, 'storage': storage}
+                    if not applies(n, p, q, dense_limit):
+                        record['status'] = 'skipped'
+                        results.append(record)
+                        continue
+
+                    symmetric = storage == 'symmetric'
+                    filename = files.get(symmetric)
+                    if filename is None:
+                        kind = '_sym' if symmetric else ''
+                        filename = files[symmetric] = os.path.join(work_dir, f"bench_n{n}_p{p}_q{q}{kind}.dat")
+                        generate_dat_file(filename, n, p, q, margin=margin, seed=seed, symmetric=symmetric)
+
+                    try:
+                        # Timings are the best of `repeat` untraced runs; the
+                        # memory peak comes from one extra run under tracemalloc,
+                        # which would otherwise distort the timings.
+                        timings = [_measure_case(filename, storage, run, p, q, False) for _ in range(repeat)]
+                        parse_time = min(t[0] for t in timings)
+                        solve_time = min(t[2] for t in timings)
+                        solution, stats = timings[-1][4], timings[-1][5]
+
+                        parse_peak = solve_peak = None
+                        if track_memory:
+                            _, parse_peak, _, solve_peak, _, _ = _measure_case(filename, storage, run, p, q, True)
+
+                        factor_time = stats.get('factor_time')
+                        factor_flops = None
+                        if storage in ('banded', 'banded_float32', 'file'):
+                            factor_flops = band_lu_flops(n, p, q)
+                        elif symmetric:
+                            factor_flops = band_symmetric_flops(n, p)
+                        record.update({
+                            'status': 'ok',
+                            'parse_time': parse_time,
+                            'factor_time': factor_time,
+                            'substitution_time': solve_time - factor_time if factor_time is not None else None,
+                            'factor_gflops': (factor_flops / factor_time / 1e9
+                                              if factor_time and factor_flops is not None else None),
+                            'solve_time': solve_time,
+                            'total_time': parse_time + solve_time,
+                            'parse_peak_bytes': parse_peak,
+                            'peak_memory_bytes': solve_peak,
+                            'system_bytes': stats['system_bytes'],
+                            'relative_residual': _relative_residual(filename, solution)
+                        })
+                    except Exception as e:
+                        record['status'] = f"error: {e}"
+
+                    results.append(record)
+                    log(_format_record(record))
+
+    return {
+        'metadata': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'sizes': sizes,
+            'bandwidths': bandwidths,
+            'margin': margin,
+            'seed': seed,
+            'repeat': repeat
+        },
+        'results': results
+    }
+
+
+def _format_record(record):
+    head = f"{record['solver']:<34} n={record['n']:<8} p={record['p']} q={record['q']}"
+    if record['status'] != 'ok':
+        return f"{head}  {record['status']}"
+    peak = record['peak_memory_bytes']
+    # The peak includes the parsed system itself, so a ratio of 1.0 means the
+    # solve allocated nothing beyond one copy of A and b.
+    peak_text = (f"{peak / 1024 / 1024:8.1f} MB ({peak / record['system_bytes']:.2f}x)"
+                 if peak is not None else "       - ")
+    gflops = record.get('factor_gflops')
+    gflops_text = f"  分解 {gflops:.2f} GFLOP/s" if gflops is not None else ""
+    return (f"{head}  解析 {record['parse_time']:.4f}s  求解 {record['solve_time']:.4f}s{gflops_text}"
+            f"  峰值内存 {peak_text}  相对残差 {record['relative_residual']:.2e}")
+
+
+def save_results(results, filename):
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+def load_results(filename):
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _index_results(results):
+    return {(r['solver'], r['n'], r['p'], r['q']): r for r in results['results'] if r.get('status') == 'ok'}
+
+
+def unmatched_cases(baseline, current):
+    # Successful cases present in only one of the two runs, as
+    # (solver, n, p, q) keys.  compare_results cannot see regressions there.
+    baseline_keys, current_keys = set(_index_results(baseline)), set(_index_results(current))
+    return sorted(baseline_keys - current_keys), sorted(current_keys - baseline_keys)
+
+
+def compare_results(baseline, current, threshold=0.2, min_time=0.01, metrics=COMPARED_METRICS):
+    # A metric regresses when it grows by more than `threshold` (relative)
+    # over the baseline.  Timings below `min_time` seconds are too noisy to
+    # compare and are ignored.  Only cases in both runs are compared; see
+    # unmatched_cases for the rest.
+    baseline_index = _index_results(baseline)
+    regressions = []
+    for key, record in _index_results(current).items():
+        reference = baseline_index.get(key)
+        if reference is None:
+            continue
+        for metric in metrics:
+            old, new = reference.get(metric), record.get(metric)
+            if old is None or new is None:
+                continue
+            if metric.endswith('_time') and old < min_time:
+                continue
+            if new > old * (1 + threshold):
+                regressions.append({
+                    'solver': key[0], 'n': key[1], 'p': key[2], 'q': key[3],
+                    'metric': metric, 'baseline': old, 'current': new,
+                    'change': (new - old) / old if old else float('inf')
+                })
+    return regressions
+
+
+def _parse_int_list(text):
+    return [int(value) for value in text.split(',') if value.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="线性方程组求解器基准测试")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="运行基准测试并保存JSON结果")
+    run_parser.add_argument('--sizes', type=_parse_int_list, default=DEFAULT_SIZES, help="阶数列表，逗号分隔")
+    run_parser.add_argument('--bandwidths', type=_parse_int_list, default=DEFAULT_BANDWIDTHS, help="带宽列表 (p=q)，逗号分隔")
+    run_parser.add_argument('--solvers', type=lambda s: s.split(','), default=None, help="求解器列表，逗号分隔")
+    run_parser.add_argument('--margin', type=float, default=1.0, help="对角占优裕量")
+    run_parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    run_parser.add_argument('--repeat', type=int, default=1, help="每个用例计时次数（取最小值）")
+    run_parser.add_argument('--dense-limit', type=int, default=DENSE_LIMIT, help="稠密求解器的最大阶数")
+    run_parser.add_argument('--no-memory', action='store_true', help="不测量峰值内存")
+    run_parser.add_argument('--data-dir', default=None, help="临时数据文件目录")
+    run_parser.add_argument('--output', '-o', default='benchmark_results.json', help="结果文件")
+
+    compare_parser = commands.add_parser('compare', help="比较两次基准测试结果")
+    compare_parser.add_argument('baseline', help="基线结果文件")
+    compare_parser.add_argument('current', help="当前结果文件")
+    compare_parser.add_argument('--threshold', type=float, default=0.2, help="允许的相对退化幅度")
+    compare_parser.add_argument('--min-time', type=float, default=0.01, help="忽略低于该值（秒）的计时")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        unknown = [name for name in (args.solvers or []) if name not in BENCHMARK_CASES]
+        if unknown:
+            parser.error(f"未知求解器: {', '.join(unknown)}（可选: {', '.join(BENCHMARK_CASES)}）")
+        results = run_benchmarks(args.sizes, args.bandwidths, args.solvers, args.margin, args.seed,
+                                 args.repeat, args.dense_limit, not args.no_memory, args.data_dir)
+        save_results(results, args.output)
+        print(f"结果已保存到 {args.output}")
+        return 0
+
+    baseline, current = load_results(args.baseline), load_results(args.current)
+    only_baseline, only_current = unmatched_cases(baseline, current)
+    for label, keys in (("仅在基线中", only_baseline), ("仅在当前结果中", only_current)):
+        if keys:
+            print(f"警告: {len(keys)} 个用例{label}，未参与比较:")
+            for solver, n, p, q in keys:
+                print(f"  {solver:<30} n={n:<8} p={p} q={q}")
+    if len(_index_results(current)) == len(only_current):
+        print("错误: 两次结果没有共同的成功用例，无法比较")
+        return 1
+
+    regressions = compare_results(baseline, current, args.threshold, args.min_time)
+    if not regressions:
+        print("未发现性能退化")
+        return 0
+    print(f"发现 {len(regressions)} 项性能退化:")
+    for r in regressions:
+        print(f"  {r['solver']:<30} n={r['n']:<8} p={r['p']} q={r['q']}  {r['metric']}: "
+              f"{r['baseline']:.4g} -> {r['current']:.4g} (+{r['change'] * 100:.1f}%)")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import argparse
+import struct
+import numpy as np
+from file_parser import FILE_ID, VERSION_UNCOMPRESSED, VERSION_COMPRESSED
+from banded_kernels import band_matvec
+
+def generate_band_system(n, p, q, margin=1.0, seed=None, solution=None, symmetric=False):
+    # Random strictly diagonally dominant band: off-diagonal entries are drawn
+    # from [-1, 1] and each diagonal entry exceeds its row's off-diagonal sum
+    # by `margin`.  With `solution` given, b is A @ solution instead of random.
+    # symmetric mirrors the upper band into the lower one (p must equal q);
+    # the positive diagonal then makes A positive definite.
+    if symmetric and p != q:
+        raise ValueError(f"A symmetric band needs p == q, got p={p}, q={q}")
+    rng = np.random.default_rng(seed)
+    bandwidth = p + q + 1
+    band = rng.uniform(-1.0, 1.0, (n, bandwidth)).astype(np.float32)
+
+    rows = np.arange(n)[:, None]
+    cols = rows - p + np.arange(bandwidth)
+    band[(cols < 0) | (cols >= n)] = 0.0
+    if symmetric:
+        for c in range(1, min(p, n - 1) + 1):
+            band[c:, p - c] = band[:n - c, p + c]
+    band[:, p] = 0.0
+    band[:, p] = np.abs(band).sum(axis=1) + margin
+
+    if solution is None:
+        b = rng.uniform(-1.0, 1.0, n).astype(np.float32)
+    else:
+        x = np.broadcast_to(np.asarray(solution, dtype=np.float64), (n,))
+        b = band_matvec(band, p, q, x).astype(np.float32)
+    return band, b
+
+
+def write_dat_file(filename, band, b, p, q, compressed=True, chunk_rows=1024):
+    n = band.shape[0]
+    version = VERSION_COMPRESSED if compressed else VERSION_UNCOMPRESSED
+
+    with open(filename, 'wb') as f:
+        f.write(struct.pack('iii', FILE_ID, version, 0))
+        f.write(struct.pack('iii', n, q, p))
+
+        if compressed:
+            f.write(np.ascontiguousarray(band, dtype=np.float32).tobytes())
+        else:
+            # Expand the band a chunk of rows at a time so the dense file never
+            # needs an n x n array in memory.
+            offsets = np.arange(p + q + 1)
+            for start in range(0, n, chunk_rows):
+                stop = min(start + chunk_rows, n)
+                dense = np.zeros((stop - start, n), dtype=np.float32)
+                rows = np.arange(start, stop)[:, None]
+                cols = rows - p + offsets
+                inside = (cols >= 0) & (cols < n)
+                dense[np.broadcast_to(rows - start, cols.shape)[inside], cols[inside]] = band[start:stop][inside]
+                f.write(dense.tobytes())
+
+        f.write(np.ascontiguousarray(b, dtype=np.float32).tobytes())
+
+
+def generate_dat_file(filename, n, p, q, margin=1.0, seed=None, compressed=True, solution=None, symmetric=False):
+    band, b = generate_band_system(n, p, q, margin, seed, solution, symmetric)
+    write_dat_file(filename, band, b, p, q, compressed)
+    return {
+        'filename': filename,
+        'version': hex(VERSION_COMPRESSED if compressed else VERSION_UNCOMPRESSED),
+        'n': n,
+        'q': q,
+        'p': p,
+        'margin': margin,
+        'seed': seed,
+        'symmetric': symmetric
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成严格对角占优带状线性方程组的.dat数据文件")
+    parser.add_argument("output", help="输出文件路径")
+    parser.add_argument("--n", type=int, required=True, help="方程组阶数")
+    parser.add_argument("--p", type=int, default=5, help="下带宽")
+    parser.add_argument("--q", type=int, default=5, help="上带宽")
+    parser.add_argument("--margin", type=float, default=1.0, help="对角占优裕量")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--solution", type=float, default=None, help="指定常数解，右端向量取 A·x")
+    parser.add_argument("--uncompressed", action="store_true", help="写出非压缩格式 (0x102)")
+    parser.add_argument("--symmetric", action="store_true", help="生成对称正定矩阵（要求 p = q）")
+    args = parser.parse_args()
+
+    info = generate_dat_file(args.output, args.n, args.p, args.q, args.margin, args.seed,
+                             compressed=not args.uncompressed, solution=args.solution, symmetric=args.symmetric)
+    print(f"已生成 {info['filename']}: 版本 {info['version']}, n={info['n']}, p={info['p']}, q={info['q']}")
@@ -0,0 +1,275 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from file_parser import LinearSystemParser
+from result_cache import file_hash
+
+CATALOG_FILENAME = '.dat_catalog.sqlite'
+SAMPLE_BYTES = 1 << 20
+SORT_COLUMNS = {
+    'name': 'f.name',
+    'n': 'f.n',
+    'bandwidth': 'f.p + f.q + 1',
+    'size': 'f.size',
+    'mtime': 'f.mtime_ns',
+    'last_solve_time': 's.wall_time'
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    file_id TEXT,
+    version TEXT,
+    n INTEGER,
+    p INTEGER,
+    q INTEGER,
+    content_hash TEXT,
+    error TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_directory ON files (directory);
+CREATE TABLE IF NOT EXISTS solves (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    content_hash TEXT,
+    engine TEXT,
+    status TEXT NOT NULL,
+    parse_time REAL,
+    solve_time REAL,
+    wall_time REAL,
+    relative_residual REAL,
+    output TEXT,
+    error TEXT,
+    solved_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS solves_hash ON solves (content_hash);
+CREATE INDEX IF NOT EXISTS solves_path ON solves (path);
+"""
+
+# Latest solve of each file's current content, joined onto the file rows.
+# A sampled hash cannot tell files apart that differ only in the middle, so
+# unless the one parameter (full_hash) is set the solve must also come from
+# the same path with the same size and mtime.
+_FILES_QUERY = """
+SELECT f.*, s.status AS last_status, s.engine AS last_engine, s.wall_time AS last_solve_time,
+       s.solved_at AS last_solved_at, s.output AS last_output
+FROM files f
+LEFT JOIN solves s ON s.id = (SELECT id FROM solves WHERE content_hash = f.content_hash
+                              AND (? OR (path = f.path AND size = f.size AND mtime_ns = f.mtime_ns))
+                              ORDER BY solved_at DESC, id DESC LIMIT 1)
+"""
+
+
+def sampled_hash(filename, size=None, sample_bytes=SAMPLE_BYTES):
+    # SHA-256 over the size and the first and last sample_bytes of the
+    # file: cheap on multi-GB files, but blind to changes in the middle, so
+    # it only identifies content for cost estimates.  Whether a file is
+    # solved also checks its path, size and mtime (see _FILES_QUERY).
+    size = os.path.getsize(filename) if size is None else size
+    digest = hashlib.sha256(str(size).encode())
+    with open(filename, 'rb') as f:
+        digest.update(f.read(sample_bytes))
+        if size > 2 * sample_bytes:
+            f.seek(size - sample_bytes)
+        digest.update(f.read(sample_bytes))
+    return digest.hexdigest()
+
+
+class FileCatalog:
+    def __init__(self, path=CATALOG_FILENAME, full_hash=False):
+        # full_hash hashes whole files, and a solve then counts for any path
+        # with the same content; by default only the head and tail are hashed
+        # (see sampled_hash), so indexing never reads a whole file.
+        self.path = path
+        self.full_hash = full_hash
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            self.connection.executescript(_SCHEMA)
+            # Catalogs created before solves recorded the file's stat.
+            columns = {row['name'] for row in self.connection.execute("PRAGMA table_info(solves)")}
+            for column in ('size', 'mtime_ns'):
+                if column not in columns:
+                    self.connection.execute(f"ALTER TABLE solves ADD COLUMN {column} INTEGER")
+
+    def _hash(self, path, size):
+        return file_hash(path) if self.full_hash else sampled_hash(path, size)
+
+    def _entry(self, path, stat):
+        entry = {
+            'path': path,
+            'directory': os.path.dirname(path),
+            'name': os.path.basename(path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'file_id': None, 'version': None, 'n': None, 'p': None, 'q': None,
+            'content_hash': None,
+            'error': None,
+            'indexed_at': time.time()
+        }
+        try:
+            info = LinearSystemParser.read_header_only(path)
+            entry.update(file_id=info['file_id'], version=info['version'], n=info['n'], p=info['p'], q=info['q'])
+            entry['content_hash'] = self._hash(path, stat.st_size)
+        except Exception as e:
+            entry['error'] = str(e)
+        return entry
+
+    def _store(self, entries):
+        if entries:
+            columns = list(entries[0])
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO files ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [tuple(entry[column] for column in columns) for entry in entries])
+
+    def refresh(self, directory):
+        # Brings the directory's rows up to date.  Only files whose size or
+        # mtime changed are opened (header and hash); vanished files are
+        # dropped, their solve history is kept.
+        start_time = time.time()
+        directory = os.path.abspath(directory)
+        with self.lock:
+            known = {row['path']: (row['size'], row['mtime_ns']) for row in self.connection.execute(
+                "SELECT path, size, mtime_ns FROM files WHERE directory = ?", (directory,))}
+            changed, seen = [], set()
+            with os.scandir(directory) as entries:
+                for item in entries:
+                    if not item.name.endswith('.dat') or not item.is_file():
+                        continue
+                    stat = item.stat()
+                    seen.add(item.path)
+                    if known.get(item.path) != (stat.st_size, stat.st_mtime_ns):
+                        changed.append(self._entry(item.path, stat))
+            removed = [path for path in known if path not in seen]
+            with self.connection:
+                self._store(changed)
+                self.connection.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+
+        added = sum(entry['path'] not in known for entry in changed)
+        return {
+            'directory': directory,
+            'files': len(seen),
+            'added': added,
+            'updated': len(changed) - added,
+            'removed': len(removed),
+            'unchanged': len(seen) - len(changed),
+            'refresh_time': time.time() - start_time
+        }
+
+    def entry(self, path):
+        # Current row for one file, re-indexed first if it changed on disk.
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self.lock:
+            row = self.connection.execute("SELECT size, mtime_ns FROM files WHERE path = ?", (path,)).fetchone()
+            if row is None or (row['size'], row['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+                with self.connection:
+                    self._store([self._entry(path, stat)])
+            row = self.connection.execute(_FILES_QUERY + " WHERE f.path = ?", (self.full_hash, path)).fetchone()
+        return dict(row)
+
+    def files(self, directory=None, name=None, version=None, min_n=None, max_n=None, solved=None,
+              sort='name', descending=False, limit=None):
+        # Filtered, sorted listing straight from the index; solved is None
+        # (all), True or False and refers to the file's current content.
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort column '{sort}', expected one of {tuple(SORT_COLUMNS)}")
+        conditions, parameters = [], [self.full_hash]
+        if directory is not None:
+            conditions.append("f.directory = ?")
+            parameters.append(os.path.abspath(directory))
+        if name:
+            conditions.append("f.name LIKE ?")
+            parameters.append(f"%{name}%")
+        if version is not None:
+            conditions.append("f.version = ?")
+            parameters.append(version)
+        if min_n is not None:
+            conditions.append("f.n >= ?")
+            parameters.append(min_n)
+        if max_n is not None:
+            conditions.append("f.n <= ?")
+            parameters.append(max_n)
+        if solved is not None:
+            conditions.append("COALESCE(s.status = 'ok', 0) = ?")
+            parameters.append(int(solved))
+
+        order = SORT_COLUMNS[sort]
+        query = _FILES_QUERY
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {order} IS NULL, {order} {'DESC' if descending else 'ASC'}, f.name"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(int(limit))
+        with self.lock:
+            return [dict(row) for row in self.connection.execute(query, parameters)]
+
+    def record_solve(self, result):
+        # Stores one batch_engine.solve_file result against the content the
+        # file has now.
+        path = os.path.abspath(result['path'])
+        try:
+            entry = self.entry(path)
+        except OSError:
+            entry = {'size': None, 'mtime_ns': None, 'content_hash': None}
+        stats = result.get('stats', {})
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO solves (path, size, mtime_ns, content_hash, engine, status, parse_time, solve_time, "
+                "wall_time, relative_residual, output, error, solved_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, entry['size'], entry['mtime_ns'], entry['content_hash'], result.get('engine'), result['status'], result.get('parse_time'),
+                 result.get('solve_time'), result.get('wall_time'), stats.get('relative_residual'),
+                 result.get('output'), result.get('error'), time.time()))
+
+    def history(self, path):
+        with self.lock:
+            return [dict(row) for row in self.connection.execute(
+                "SELECT * FROM solves WHERE path = ? ORDER BY solved_at DESC, id DESC", (os.path.abspath(path),))]
+
+    def last_solve(self, path):
+        # Latest successful solve of the file's current content, from any
+        # path that held the same (possibly sampled) hash.  Only good enough
+        # for cost estimates; is_solved uses the stricter match.
+        content = self.entry(path)['content_hash']
+        if content is None:
+            return None
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT * FROM solves WHERE content_hash = ? AND status = 'ok' ORDER BY solved_at DESC, id DESC LIMIT 1",
+                (content,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def estimate_cost(self, path):
+        # Measured wall time of the last successful solve, or None.
+        solve = self.last_solve(path)
+        return solve['wall_time'] if solve is not None else None
+
+    def is_solved(self, path, require_output=False):
+        # True when the latest solve of the current content succeeded (and,
+        # with require_output, its solution file is still there).  With a
+        # sampled hash that solve must be of this path at its current size
+        # and mtime.
+        entry = self.entry(path)
+        if entry['last_status'] != 'ok':
+            return False
+        return not require_output or (entry['last_output'] is not None and os.path.exists(entry['last_output']))
+
+    def clear_history(self, path=None):
+        with self.lock, self.connection:
+            if path is None:
+                self.connection.execute("DELETE FROM solves")
+            else:
+                self.connection.execute("DELETE FROM solves WHERE path = ?", (os.path.abspath(path),))
+
+    def close(self):
+        self.connection.close()
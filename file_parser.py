@@ -1,11 +1,31 @@
 import struct
 import numpy as np
-from banded_storage import BandedMatrix
+from banded_storage import BandedMatrix, SymmetricBandedMatrix
+from banded_kernels import is_symmetric_band
+from instrumentation import Instrumentation
+
+FILE_ID = 0x0C0A8708
+VERSION_UNCOMPRESSED = 0x102
+VERSION_COMPRESSED = 0x202
+HEADER_SIZE = 24
+PARSE_PHASES = ('header', 'matrix', 'rhs')
+SYMMETRIC_MODES = (False, True, 'auto')
 
 class LinearSystemParser:
-    def __init__(self, filename, use_banded_storage=False):
+    def __init__(self, filename, use_banded_storage=False, use_mmap=False, dtype=np.float64, instrumentation=None,
+                 chunk_rows=None, symmetric=False):
+        # symmetric (band storage only): True stores the matrix as a
+        # SymmetricBandedMatrix and rejects a non-symmetric one, 'auto' does
+        # so only when the matrix turns out to be symmetric.
+        if symmetric not in SYMMETRIC_MODES:
+            raise ValueError(f"Unknown symmetric mode {symmetric!r}, expected one of {SYMMETRIC_MODES}")
         self.filename = filename
+        self.symmetric = symmetric if use_banded_storage else False
         self.use_banded_storage = use_banded_storage
+        self.use_mmap = use_mmap
+        self.dtype = dtype
+        self.chunk_rows = chunk_rows
+        self.instrumentation = instrumentation or Instrumentation()
         self.file_id = None
         self.version = None
         self.n = None
@@ -16,56 +36,195 @@ class LinearSystemParser:
         
     def parse_file(self):
         with open(self.filename, 'rb') as f:
-            self.file_id, self.version, id1 = struct.unpack('iii', f.read(12))
-            
-            if self.file_id != 0x0C0A8708:
-                raise ValueError(f"Invalid file ID: {hex(self.file_id)}, expected 0x0C0A8708")
+            with self.instrumentation.phase('header'):
+                self._read_header(f)
             
-            if self.version not in [0x102, 0x202]:
-                raise ValueError(f"Unsupported version: {hex(self.version)}")
+            if self.version == VERSION_COMPRESSED and self.use_banded_storage and self.use_mmap:
+                self._map_compressed_matrix_banded()
+                return self.matrix, self.b
             
-            self.n, self.q, self.p = struct.unpack('iii', f.read(12))
+            with self.instrumentation.phase('matrix'):
+                if self.version == VERSION_UNCOMPRESSED:
+                    if self.use_banded_storage:
+                        self._read_uncompressed_matrix_banded(f)
+                        self.matrix = self._symmetric_storage(self.matrix)
+                    else:
+                        self._read_uncompressed_matrix(f)
+                elif self.version == VERSION_COMPRESSED:
+                    if self.use_banded_storage:
+                        self._read_compressed_matrix_banded(f)
+                    else:
+                        self._read_compressed_matrix(f)
             
-            if self.version == 0x102:
-                self._read_uncompressed_matrix(f)
-            elif self.version == 0x202:
-                if self.use_banded_storage:
-                    self._read_compressed_matrix_banded(f)
-                else:
-                    self._read_compressed_matrix(f)
-            
-            self._read_right_hand_side(f)
+            with self.instrumentation.phase('rhs'):
+                self._read_right_hand_side(f)
         
         return self.matrix, self.b
     
+    def map_arrays(self):
+        if self.version is None:
+            with open(self.filename, 'rb') as f:
+                self._read_header(f)
+        
+        if self.version != VERSION_COMPRESSED:
+            raise ValueError(f"Memory mapping requires a compressed (0x202) file, got {hex(self.version)}")
+        
+        elements_per_row = self.p + self.q + 1
+        band_elements = self.n * elements_per_row
+        payload = np.memmap(self.filename, dtype=np.float32, mode='r',
+                            offset=HEADER_SIZE, shape=(band_elements + self.n,))
+        band = payload[:band_elements].reshape(self.n, elements_per_row)
+        rhs = payload[band_elements:]
+        return band, rhs
+    
+    def _read_header(self, f):
+        self.file_id, self.version, id1 = struct.unpack('iii', f.read(12))
+        
+        if self.file_id != FILE_ID:
+            raise ValueError(f"Invalid file ID: {hex(self.file_id)}, expected 0x0C0A8708")
+        
+        if self.version not in [VERSION_UNCOMPRESSED, VERSION_COMPRESSED]:
+            raise ValueError(f"Unsupported version: {hex(self.version)}")
+        
+        self.n, self.q, self.p = struct.unpack('iii', f.read(12))
+    
+    def _read_floats(self, f, count):
+        data = np.frombuffer(f.read(4 * count), dtype=np.float32)
+        if data.size != count:
+            raise ValueError(f"Unexpected end of file: expected {count} values, got {data.size}")
+        return data
+    
+    def _read_into(self, f, out):
+        # Fills `out` (rows of float32 values on disk) in place.  A float32
+        # target is read straight into; otherwise the values go through one
+        # reusable chunk buffer, so no full-size float32 copy of the data is
+        # ever alive next to the converted array.
+        if out.dtype == np.float32 and out.flags.c_contiguous:
+            count = f.readinto(memoryview(out.reshape(-1)).cast('B')) // 4
+            if count != out.size:
+                raise ValueError(f"Unexpected end of file: expected {out.size} values, got {count}")
+            return out
+        
+        row_size = int(np.prod(out.shape[1:], dtype=np.int64))
+        chunk_rows = self.chunk_rows or max(1, (1 << 18) // max(row_size, 1))
+        buffer = np.empty((min(chunk_rows, len(out)),) + out.shape[1:], dtype=np.float32)
+        for start in range(0, len(out), chunk_rows):
+            stop = min(start + chunk_rows, len(out))
+            chunk = buffer[:stop - start]
+            count = f.readinto(memoryview(chunk.reshape(-1)).cast('B')) // 4
+            if count != chunk.size:
+                raise ValueError(f"Unexpected end of file: expected {out.size} values, "
+                                 f"got {start * row_size + count}")
+            out[start:stop] = chunk
+        return out
+    
     def _read_uncompressed_matrix(self, f):
-        total_elements = self.n * self.n
-        data = struct.unpack(f'{total_elements}f', f.read(4 * total_elements))
-        self.matrix = np.array(data).reshape(self.n, self.n)
+        self.matrix = self._read_into(f, np.empty((self.n, self.n), dtype=self.dtype))
     
-    def _read_compressed_matrix(self, f):
-        self.matrix = np.zeros((self.n, self.n))
-        elements_per_row = self.p + self.q + 1
+    def _read_uncompressed_matrix_banded(self, f):
+        # Reads the dense matrix a chunk of rows at a time and keeps only the
+        # band, widening it whenever a chunk reveals a larger bandwidth.  The
+        # storage grows geometrically and is trimmed to the detected p and q
+        # at the end, so memory stays O(chunk_rows * n + n * bandwidth).
+        n = self.n
+        chunk_rows = self.chunk_rows or max(1, (1 << 23) // max(n, 1))
+        p = q = 0
+        cap_p = cap_q = 0
+        band = np.zeros((n, 1), dtype=self.dtype)
         
-        for i in range(self.n):
-            row_data = struct.unpack(f'{elements_per_row}f', f.read(4 * elements_per_row))
+        for start in range(0, n, chunk_rows):
+            stop = min(start + chunk_rows, n)
+            chunk = self._read_floats(f, (stop - start) * n).reshape(stop - start, n)
+            rows, cols = np.nonzero(chunk)
+            if rows.size == 0:
+                continue
+            offsets = cols - rows - start
+            p = max(p, -int(offsets.min()))
+            q = max(q, int(offsets.max()))
             
-            for k in range(elements_per_row):
-                col = i - self.p + k
-                if 0 <= col < self.n:
-                    self.matrix[i, col] = row_data[k]
+            if p > cap_p or q > cap_q:
+                new_p = max(p, min(2 * cap_p, n - 1)) if p > cap_p else cap_p
+                new_q = max(q, min(2 * cap_q, n - 1)) if q > cap_q else cap_q
+                widened = np.zeros((n, new_p + new_q + 1), dtype=self.dtype)
+                widened[:, new_p - cap_p:new_p + cap_q + 1] = band
+                band, cap_p, cap_q = widened, new_p, new_q
+            band[rows + start, offsets + cap_p] = chunk[rows, cols]
+        
+        if (cap_p, cap_q) != (p, q):
+            band = np.ascontiguousarray(band[:, cap_p - p:cap_p + q + 1])
+        self.matrix = BandedMatrix(n, p, q, data=band)
     
-    def _read_compressed_matrix_banded(self, f):
-        self.matrix = BandedMatrix(self.n, self.p, self.q)
+    def _read_compressed_matrix(self, f):
+        self.matrix = np.zeros((self.n, self.n), dtype=self.dtype)
         elements_per_row = self.p + self.q + 1
+        band = self._read_floats(f, self.n * elements_per_row).reshape(self.n, elements_per_row)
         
-        for i in range(self.n):
-            row_data = struct.unpack(f'{elements_per_row}f', f.read(4 * elements_per_row))
-            self.matrix.data[i, :] = row_data
+        rows = np.arange(self.n)[:, None]
+        cols = rows - self.p + np.arange(elements_per_row)
+        inside = (cols >= 0) & (cols < self.n)
+        self.matrix[np.broadcast_to(rows, cols.shape)[inside], cols[inside]] = band[inside]
+    
+    def _read_compressed_matrix_banded(self, f):
+        if self.symmetric:
+            if self._read_compressed_matrix_symmetric(f):
+                return
+            self._not_symmetric()
+            f.seek(HEADER_SIZE)
+        self.matrix = BandedMatrix(self.n, self.p, self.q, dtype=self.dtype)
+        self._read_into(f, self.matrix.data)
+    
+    def _read_compressed_matrix_symmetric(self, f):
+        # Keeps only the upper half of each band row, which is all of
+        # SymmetricBandedMatrix, and checks each row's lower half against
+        # the rows already kept (one comparison per diagonal and chunk).
+        # Returns False at the first asymmetric entry; the file is then read
+        # again as a full band.
+        n, p = self.n, self.p
+        if p != self.q:
+            return False
+        width = 2 * p + 1
+        matrix = SymmetricBandedMatrix(n, p, dtype=self.dtype)
+        chunk_rows = self.chunk_rows or max(1, (1 << 18) // width)
+        buffer = np.empty((min(chunk_rows, n), width), dtype=np.float32)
+        for start in range(0, n, chunk_rows):
+            stop = min(start + chunk_rows, n)
+            chunk = buffer[:stop - start]
+            count = f.readinto(memoryview(chunk.reshape(-1)).cast('B')) // 4
+            if count != chunk.size:
+                raise ValueError(f"Unexpected end of file: expected {n * width} values, got {start * width + count}")
+            matrix.data[start:stop] = chunk[:, p:]
+            for c in range(1, p + 1):
+                lo = max(start, c)
+                if lo < stop and not np.array_equal(chunk[lo - start:, p - c], matrix.data[lo - c:stop - c, c]):
+                    return False
+        for c in range(1, min(p, n) + 1):
+            matrix.data[n - c:, c] = 0.0
+        self.matrix = matrix
+        return True
+    
+    def _not_symmetric(self):
+        if self.symmetric is True:
+            raise ValueError("Matrix is not symmetric")
+    
+    def _symmetric_storage(self, A):
+        if self.symmetric and is_symmetric_band(A.data, A.p, A.q):
+            return SymmetricBandedMatrix.from_banded(A, check=False, dtype=self.dtype)
+        self._not_symmetric()
+        return A
+    
+    def _map_compressed_matrix_banded(self):
+        band, rhs = self.map_arrays()
+        with self.instrumentation.phase('matrix'):
+            if self.symmetric:
+                self.matrix = self._symmetric_storage(BandedMatrix(self.n, self.p, self.q, data=band))
+            if not isinstance(self.matrix, SymmetricBandedMatrix):
+                self.matrix = BandedMatrix(self.n, self.p, self.q, dtype=self.dtype)
+                self.matrix.data[:] = band
+        with self.instrumentation.phase('rhs'):
+            self.b = rhs.astype(np.float64)
     
     def _read_right_hand_side(self, f):
-        data = struct.unpack(f'{self.n}f', f.read(4 * self.n))
-        self.b = np.array(data)
+        self.b = self._read_into(f, np.empty(self.n))
     
     @staticmethod
     def read_header_only(filename):
@@ -93,3 +252,23 @@ class LinearSystemParser:
             'p': self.p,
             'bandwidth': self.p + self.q + 1 if self.p is not None and self.q is not None else None
         }
+    
+    def get_stats(self):
+        return {
+            'parse_time': self.instrumentation.total_time(PARSE_PHASES),
+            'symmetric': isinstance(self.matrix, SymmetricBandedMatrix),
+            'phases': {name: entry for name, entry in self.instrumentation.summary().items() if name in PARSE_PHASES}
+        }
+
+
+def convert_to_compressed(source, target, chunk_rows=None):
+    # Rewrites a .dat file as 0x202, using the bandwidth found in the data
+    # (a banded 0x102 file never needs O(n^2) memory on the way).
+    parser = LinearSystemParser(source, use_banded_storage=True, chunk_rows=chunk_rows)
+    A, b = parser.parse_file()
+    with open(target, 'wb') as f:
+        f.write(struct.pack('iii', FILE_ID, VERSION_COMPRESSED, 0))
+        f.write(struct.pack('iii', A.n, A.q, A.p))
+        f.write(np.ascontiguousarray(A.data, dtype=np.float32).tobytes())
+        f.write(np.ascontiguousarray(b, dtype=np.float32).tobytes())
+    return {'n': A.n, 'p': A.p, 'q': A.q, 'header_p': parser.p, 'header_q': parser.q}
@@ -1,99 +1,266 @@
 import numpy as np
 import time
-from banded_storage import BandedMatrix
+from banded_storage import BandedMatrix, SymmetricBandedMatrix
+from banded_kernels import (band_matvec, factor_band_blocked, band_block_size, forward_substitute_band,
+                            back_substitute_band, narrow_band_blocks, eliminate_narrow_band,
+                            back_substitute_narrow_band, NARROW_BAND_MAX_BANDWIDTH, solve_tridiagonal_band, solve_pentadiagonal_band, verify_solution, symmetric_band_matvec,
+                            factor_symmetric_band, cholesky_to_ldlt, forward_substitute_symmetric,
+                            back_substitute_symmetric)
+from instrumentation import (Instrumentation, ProgressTracker, PROGRESS_INTERVAL, band_lu_flops, band_forward_flops,
+                             band_back_flops, band_matvec_flops, dense_lu_flops, dense_substitution_flops,
+                             band_symmetric_flops, band_symmetric_substitution_flops)
+
+def _working_array(x, overwrite):
+    # The float64 array a solver eliminates in.  With overwrite the input
+    # itself is used when it already is a writable float64 array, so the
+    # caller's data is destroyed but nothing is copied.
+    if overwrite:
+        x = np.asarray(x, dtype=np.float64)
+        if x.flags.writeable:
+            return x
+    return np.array(x, dtype=np.float64)
+
 
 class GaussianEliminationSolver:
-    def __init__(self, A, b):
-        self.A = A.astype(np.float64).copy()
-        self.b = b.astype(np.float64).copy()
+    def __init__(self, A, b, block_size=64, pivoting=False, overwrite=False, verify=False, instrumentation=None,
+                 progress=None, progress_interval=PROGRESS_INTERVAL):
+        self.A = _working_array(A, overwrite)
+        self.b = _working_array(b, overwrite)
+        # Verification needs the untouched system; in overwrite mode that
+        # means keeping a copy.
+        self.verify = verify
+        if verify:
+            self.A_original = A.copy() if overwrite else A
+            self.b_original = b.copy() if overwrite else b
+        self.verification = {}
+        self.instrumentation = instrumentation or Instrumentation()
         self.n = len(b)
+        self.block_size = max(1, block_size)
+        # Progress is reported per panel of block_size pivots.
+        self.progress = ProgressTracker(progress, self.n, progress_interval)
+        self.pivoting = pivoting
+        self.row_swaps = 0
         self.solution = None
         self.solve_time = 0
+        self.factor_time = 0
         
     def solve(self):
         start_time = time.time()
         
-        for k in range(self.n - 1):
-            for i in range(k + 1, self.n):
-                if abs(self.A[k, k]) < 1e-10:
-                    raise ValueError(f"Zero pivot encountered at position {k}")
+        with self.instrumentation.phase('factorization', dense_lu_flops(self.n)):
+            for k0 in range(0, self.n, self.block_size):
+                k1 = min(k0 + self.block_size, self.n)
+                self._factor_panel(k0, k1)
                 
-                factor = self.A[i, k] / self.A[k, k]
-                self.A[i, k:] -= factor * self.A[k, k:]
-                self.b[i] -= factor * self.b[k]
+                if k1 < self.n:
+                    L11 = self.A[k0:k1, k0:k1]
+                    U12 = self.A[k0:k1, k1:]
+                    for k in range(k1 - k0 - 1):
+                        U12[k + 1:] -= np.multiply.outer(L11[k + 1:, k], U12[k])
+                    self.A[k1:, k1:] -= self.A[k1:, k0:k1] @ U12
+                self.progress.advance(k1 - k0)
+        self.factor_time = time.time() - start_time
         
-        self.solution = np.zeros(self.n)
-        for i in range(self.n - 1, -1, -1):
-            if abs(self.A[i, i]) < 1e-10:
-                raise ValueError(f"Zero pivot encountered at position {i}")
-            
-            self.solution[i] = (self.b[i] - np.dot(self.A[i, i+1:], self.solution[i+1:])) / self.A[i, i]
+        with self.instrumentation.phase('forward_substitution', dense_substitution_flops(self.n)):
+            self._forward_substitute()
+        with self.instrumentation.phase('back_substitution', dense_substitution_flops(self.n)):
+            self._back_substitute()
+        self.solution = self.b
         
         self.solve_time = time.time() - start_time
+        if self.verify:
+            with self.instrumentation.phase('verification', 2 * self.n * self.n):
+                self.verification = verify_solution(lambda x: self.A_original @ x, self.solution, self.b_original)
         return self.solution
     
+    def _factor_panel(self, k0, k1):
+        # Unblocked right-looking LU on columns [k0, k1); the multipliers of L
+        # overwrite the eliminated entries.
+        A = self.A
+        for k in range(k0, k1):
+            if self.pivoting:
+                r = k + int(np.argmax(np.abs(A[k:, k])))
+                if r != k:
+                    A[[k, r]] = A[[r, k]]
+                    self.b[[k, r]] = self.b[[r, k]]
+                    self.row_swaps += 1
+            
+            if abs(A[k, k]) < 1e-10:
+                raise ValueError(f"Zero pivot encountered at position {k}")
+            
+            A[k + 1:, k] /= A[k, k]
+            A[k + 1:, k + 1:k1] -= np.multiply.outer(A[k + 1:, k], A[k, k + 1:k1])
+    
+    def _forward_substitute(self):
+        A, b = self.A, self.b
+        for k0 in range(0, self.n, self.block_size):
+            k1 = min(k0 + self.block_size, self.n)
+            for i in range(k0 + 1, k1):
+                b[i] -= A[i, k0:i] @ b[k0:i]
+            b[k1:] -= A[k1:, k0:k1] @ b[k0:k1]
+    
+    def _back_substitute(self):
+        A, b = self.A, self.b
+        for k1 in range(self.n, 0, -self.block_size):
+            k0 = max(k1 - self.block_size, 0)
+            for i in range(k1 - 1, k0 - 1, -1):
+                b[i] = (b[i] - A[i, i + 1:k1] @ b[i + 1:k1]) / A[i, i]
+            b[:k0] -= A[:k0, k0:k1] @ b[k0:k1]
+    
     def get_stats(self):
         return {
             'solve_time': self.solve_time,
-            'dimension': self.n
+            'factor_time': self.factor_time,
+            'dimension': self.n,
+            'block_size': self.block_size,
+            'pivoting': self.pivoting,
+            'row_swaps': self.row_swaps,
+            'phases': self.instrumentation.summary(),
+            **self.verification
         }
 
 
 class BandedGaussianSolver:
-    def __init__(self, A, b, p, q):
-        self.A = A.astype(np.float64).copy()
-        self.b = b.astype(np.float64).copy()
+    def __init__(self, A, b, p=None, q=None, verify=False, instrumentation=None, progress=None,
+                 progress_interval=PROGRESS_INTERVAL, overwrite=False, block_size=None):
+        # A is either a dense n x n matrix with bandwidths p and q, or a
+        # BandedMatrix, in which case elimination runs on the band storage
+        # and p and q come from A (blocked with panels of block_size pivots,
+        # see band_block_size).
+        self.banded = isinstance(A, BandedMatrix)
+        if self.banded:
+            if (p, q) != (None, None) and (p, q) != (A.p, A.q):
+                raise ValueError(f"Bandwidths p={p}, q={q} do not match the band storage (p={A.p}, q={A.q})")
+            p, q = A.p, A.q
+            self.A = BandedMatrix(A.n, p, q, data=_working_array(A.data, overwrite))
+        else:
+            if p is None or q is None:
+                raise ValueError("Dense input requires the bandwidths p and q")
+            self.A = _working_array(A, overwrite)
+        self.b = _working_array(b, overwrite)
         self.n = len(b)
         self.p = p
         self.q = q
+        self.block_size = band_block_size(p, q, block_size) if self.banded else 1
+        self.overwrite = overwrite
+        self.verify = verify
+        # In overwrite mode the input is factored in place, so verification
+        # needs a copy taken up front.
+        if verify:
+            original = A.data if self.banded else A
+            self.A_original = original.copy() if overwrite else original
+            self.b_original = b.copy() if overwrite else b
+        else:
+            self.A_original = self.b_original = None
+        self.verification = {}
+        self.instrumentation = instrumentation or Instrumentation()
+        total = 2 * self.n if self.banded else max(self.n - 1, 0) + self.n
+        self.progress = ProgressTracker(progress, total, progress_interval)
         self.solution = None
         self.solve_time = 0
         
     def solve(self):
         start_time = time.time()
+        n, p, q = self.n, self.p, self.q
         
-        for k in range(self.n - 1):
-            if abs(self.A[k, k]) < 1e-10:
-                raise ValueError(f"Zero pivot encountered at position {k}")
+        # Elimination updates b as it goes, so it also counts the forward
+        # substitution work.
+        with self.instrumentation.phase('factorization', band_lu_flops(n, p, q) + band_forward_flops(n, p)):
+            if self.banded:
+                self._eliminate_band()
+            else:
+                self._eliminate_dense()
+        
+        with self.instrumentation.phase('back_substitution', band_back_flops(n, q)):
+            if self.banded:
+                for start, stop in self.progress.steps(0, n, reverse=True):
+                    back_substitute_band(self.A.data, self.b, p, q, start, stop)
+                self.solution = self.b
+            else:
+                self._back_substitute_dense()
+        
+        self.solve_time = time.time() - start_time
+        if self.verify:
+            with self.instrumentation.phase('verification', band_matvec_flops(n, p, q)):
+                if self.banded:
+                    matvec = lambda x: band_matvec(self.A_original, p, q, x)
+                else:
+                    matvec = BandedMatrix.from_dense(self.A_original, p, q).matvec
+                self.verification = verify_solution(matvec, self.solution, self.b_original)
+        return self.solution
+    
+    def _eliminate_band(self):
+        # Rows [start, stop) of b can be eliminated as soon as the pivots
+        # before them are done, so b is updated chunk by chunk with the band.
+        data, b, p, q = self.A.data, self.b, self.p, self.q
+        for start, stop in self.progress.steps(0, self.n):
+            factor_band_blocked(data, p, q, self.block_size, start, stop)
+            forward_substitute_band(data, b, p, start, stop)
+    
+    def _eliminate_dense(self):
+        for k0, k1 in self.progress.steps(0, self.n - 1):
+            for k in range(k0, k1):
+                if abs(self.A[k, k]) < 1e-10:
+                    raise ValueError(f"Zero pivot encountered at position {k}")
             
-            i_max = min(k + self.p + 1, self.n)
-            for i in range(k + 1, i_max):
-                factor = self.A[i, k] / self.A[k, k]
+                i_max = min(k + self.p + 1, self.n)
+                for i in range(k + 1, i_max):
+                    factor = self.A[i, k] / self.A[k, k]
                 
-                j_max = min(min(i + self.q + 1, k + self.q + 1), self.n)
-                for j in range(k, j_max):
-                    self.A[i, j] -= factor * self.A[k, j]
+                    j_max = min(min(i + self.q + 1, k + self.q + 1), self.n)
+                    for j in range(k, j_max):
+                        self.A[i, j] -= factor * self.A[k, j]
                 
-                self.b[i] -= factor * self.b[k]
-        
+                    self.b[i] -= factor * self.b[k]
+    
+    def _back_substitute_dense(self):
         self.solution = np.zeros(self.n)
-        for i in range(self.n - 1, -1, -1):
-            if abs(self.A[i, i]) < 1e-10:
-                raise ValueError(f"Zero pivot encountered at position {i}")
+        for i0, i1 in self.progress.steps(0, self.n, reverse=True):
+            for i in range(i1 - 1, i0 - 1, -1):
+                if abs(self.A[i, i]) < 1e-10:
+                    raise ValueError(f"Zero pivot encountered at position {i}")
             
-            j_start = i + 1
-            j_end = min(i + self.q + 1, self.n)
+                j_start = i + 1
+                j_end = min(i + self.q + 1, self.n)
             
-            sum_val = 0
-            for j in range(j_start, j_end):
-                sum_val += self.A[i, j] * self.solution[j]
+                sum_val = 0
+                for j in range(j_start, j_end):
+                    sum_val += self.A[i, j] * self.solution[j]
             
-            self.solution[i] = (self.b[i] - sum_val) / self.A[i, i]
-        
-        self.solve_time = time.time() - start_time
-        return self.solution
+                self.solution[i] = (self.b[i] - sum_val) / self.A[i, i]
     
     def get_stats(self):
         return {
             'solve_time': self.solve_time,
             'dimension': self.n,
             'upper_bandwidth': self.q,
-            'lower_bandwidth': self.p
+            'lower_bandwidth': self.p,
+            'storage_format': 'banded' if self.banded else 'dense',
+            'block_size': self.block_size,
+            'overwrite': self.overwrite,
+            'phases': self.instrumentation.summary(),
+            **self.verification
         }
 
 
+PRECISIONS = ('double', 'mixed')
+
+
+def _working_band(A, overwrite):
+    # The float64 band a double-precision factorization runs in.  With
+    # overwrite it becomes A.data and is A's own band whenever that already is
+    # writable float64, so the caller's matrix is destroyed; without it A is
+    # left untouched and a copy is factored.
+    if overwrite:
+        A.data = _working_array(A.data, True)
+        return A.data
+    return np.array(A.data, dtype=np.float64)
+
+
 class EfficientBandedSolver:
-    def __init__(self, A, b):
+    def __init__(self, A, b, precision='double', tolerance=1e-12, max_refinements=10, verify=False,
+                 instrumentation=None, progress=None, progress_interval=PROGRESS_INTERVAL, overwrite=False,
+                 block_size=None):
         if isinstance(A, BandedMatrix):
             self.A = A
             self.n = A.n
@@ -101,48 +268,145 @@ class EfficientBandedSolver:
             self.q = A.q
         else:
             raise TypeError("A must be a BandedMatrix instance")
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {PRECISIONS}")
         
-        self.b = b.astype(np.float64).copy()
+        self.b = _working_array(b, overwrite)
+        self.block_size = band_block_size(self.p, self.q, block_size)
+        self.overwrite = overwrite
+        self.instrumentation = instrumentation or Instrumentation()
+        self.progress_callback = progress
+        self.progress_interval = progress_interval
+        # Narrow double-precision bands take the block tridiagonal path,
+        # which fuses the forward substitution into its elimination sweep.
+        # An explicit block_size asks for the band LU kernels instead.
+        self.narrow = (precision == 'double' and block_size is None
+                       and max(self.p, self.q) <= NARROW_BAND_MAX_BANDWIDTH)
+        self.progress = ProgressTracker(progress, (2 if self.narrow else 3) * self.n, progress_interval)
+        self.precision = precision
+        self.tolerance = tolerance
+        self.max_refinements = max_refinements
+        self.refinement_stats = {}
+        self.verify = verify
+        self.verification = {}
         self.solution = None
         self.solve_time = 0
+        self.factor_time = 0
         
     def solve(self):
         start_time = time.time()
-        b_work = self.b.copy()
+        # Verification reads A as it was; mixed precision and a copied working
+        # band leave A.data alone, so only an in-place factorization needs a
+        # copy taken up front.
+        original = self.A.data
         
-        for k in range(self.n - 1):
-            pivot = self.A.get(k, k)
-            if abs(pivot) < 1e-10:
-                raise ValueError(f"Zero pivot encountered at position {k}")
-            
-            i_max = min(k + self.p + 1, self.n)
-            for i in range(k + 1, i_max):
-                factor = self.A.get(i, k) / pivot
-                
-                j_max = min(min(i + self.q + 1, k + self.q + 1), self.n)
-                for j in range(k, j_max):
-                    old_val = self.A.get(i, j)
-                    new_val = old_val - factor * self.A.get(k, j)
-                    self.A.set(i, j, new_val)
-                
-                b_work[i] -= factor * b_work[k]
+        if self.precision == 'mixed':
+            lu = BandedLUFactorization(self.A, 'mixed', self.tolerance, self.max_refinements,
+                                       instrumentation=self.instrumentation, progress=self.progress_callback,
+                                       progress_interval=self.progress_interval, overwrite=self.overwrite,
+                                       block_size=self.block_size)
+            self.solution = lu.solve(self.b)
+            stats = lu.get_stats()
+            self.factor_time = stats['factor_time']
+            self.refinement_stats = {key: stats[key] for key in
+                                     ('refinement_steps', 'converged', 'residual_norm', 'relative_residual')}
+        elif self.narrow:
+            n, p, q = self.n, self.p, self.q
+            # The block kernels only read A and b, so nothing is copied.
+            bounds = narrow_band_blocks(n, p, q)
+            factor_start = time.time()
+            with self.instrumentation.phase('factorization', band_lu_flops(n, p, q) + band_forward_flops(n, p)):
+                couplings = eliminate_narrow_band(original, self.b, p, q, bounds, self.progress)
+            self.factor_time = time.time() - factor_start
+            with self.instrumentation.phase('back_substitution', band_back_flops(n, q)):
+                self.solution = back_substitute_narrow_band(couplings, q, bounds, self.progress)
+        else:
+            n, p, q = self.n, self.p, self.q
+            data = _working_band(self.A, self.overwrite)
+            if self.verify and data is original:
+                original = original.copy()
+            # self.b is already private (or overwritable), so only the
+            # residual check needs it kept intact.
+            b_work = self.b.copy() if self.verify else self.b
+            factor_start = time.time()
+            with self.instrumentation.phase('factorization', band_lu_flops(n, p, q)):
+                for start, stop in self.progress.steps(0, n):
+                    factor_band_blocked(data, p, q, self.block_size, start, stop)
+            self.factor_time = time.time() - factor_start
+            with self.instrumentation.phase('forward_substitution', band_forward_flops(n, p)):
+                for start, stop in self.progress.steps(0, n):
+                    forward_substitute_band(data, b_work, p, start, stop)
+            with self.instrumentation.phase('back_substitution', band_back_flops(n, q)):
+                for start, stop in self.progress.steps(0, n, reverse=True):
+                    back_substitute_band(data, b_work, p, q, start, stop)
+                self.solution = b_work
         
-        self.solution = np.zeros(self.n)
-        for i in range(self.n - 1, -1, -1):
-            pivot = self.A.get(i, i)
-            if abs(pivot) < 1e-10:
-                raise ValueError(f"Zero pivot encountered at position {i}")
-            
-            j_start = i + 1
-            j_end = min(i + self.q + 1, self.n)
-            
-            sum_val = 0
-            for j in range(j_start, j_end):
-                sum_val += self.A.get(i, j) * self.solution[j]
-            
-            self.solution[i] = (b_work[i] - sum_val) / pivot
+        self.solve_time = time.time() - start_time
+        if self.verify:
+            with self.instrumentation.phase('verification', band_matvec_flops(self.n, self.p, self.q)):
+                self.verification = verify_solution(lambda x: band_matvec(original, self.p, self.q, x),
+                                                    self.solution, self.b)
+        return self.solution
+    
+    def get_stats(self):
+        stats = {
+            'solve_time': self.solve_time,
+            'factor_time': self.factor_time,
+            'dimension': self.n,
+            'upper_bandwidth': self.q,
+            'lower_bandwidth': self.p,
+            'storage_format': 'banded',
+            'precision': self.precision,
+            'algorithm': 'block_tridiagonal' if self.narrow else 'band_lu',
+            'block_size': self.block_size,
+            'overwrite': self.overwrite,
+            'phases': self.instrumentation.summary()
+        }
+        stats.update(self.refinement_stats)
+        stats.update(self.verification)
+        return stats
+
+
+class TridiagonalSolver:
+    bandwidths = (1, 1)
+    algorithm = 'thomas'
+    
+    def __init__(self, A, b, verify=False, instrumentation=None, progress=None, progress_interval=PROGRESS_INTERVAL,
+                 overwrite=False):
+        if not isinstance(A, BandedMatrix):
+            raise TypeError("A must be a BandedMatrix instance")
+        if (A.p, A.q) != self.bandwidths:
+            raise ValueError(f"{type(self).__name__} requires p = q = {self.bandwidths[0]}, got p={A.p}, q={A.q}")
         
+        self.A = A
+        self.n = A.n
+        self.p = A.p
+        self.q = A.q
+        # The kernels only read A and b, so nothing is ever copied and
+        # overwrite has nothing to save here.
+        self.b = np.asarray(b, dtype=np.float64)
+        self.verify = verify
+        self.verification = {}
+        self.instrumentation = instrumentation or Instrumentation()
+        # The fused kernels report after each chunk of rows in both sweeps.
+        self.progress = ProgressTracker(progress, 2 * self.n, progress_interval)
+        self.solution = None
+        self.solve_time = 0
+    
+    def _kernel(self, data, b):
+        return solve_tridiagonal_band(data, b, self.progress)
+    
+    def solve(self):
+        start_time = time.time()
+        # The kernel fuses elimination with both substitutions.
+        n, p, q = self.n, self.p, self.q
+        flops = band_lu_flops(n, p, q) + band_forward_flops(n, p) + band_back_flops(n, q)
+        with self.instrumentation.phase(self.algorithm, flops):
+            self.solution = self._kernel(self.A.data, self.b)
         self.solve_time = time.time() - start_time
+        if self.verify:
+            with self.instrumentation.phase('verification', band_matvec_flops(n, p, q)):
+                self.verification = verify_solution(self.A.matvec, self.solution, self.b)
         return self.solution
     
     def get_stats(self):
@@ -151,5 +415,350 @@ class EfficientBandedSolver:
             'dimension': self.n,
             'upper_bandwidth': self.q,
             'lower_bandwidth': self.p,
-            'storage_format': 'banded'
+            'storage_format': 'banded',
+            'algorithm': self.algorithm,
+            'phases': self.instrumentation.summary(),
+            **self.verification
         }
+
+
+class PentadiagonalSolver(TridiagonalSolver):
+    bandwidths = (2, 2)
+    algorithm = 'pentadiagonal'
+    
+    def _kernel(self, data, b):
+        return solve_pentadiagonal_band(data, b, self.progress)
+
+
+FAST_PATH_OPTIONS = ('verify', 'instrumentation', 'progress', 'progress_interval', 'overwrite')
+
+
+def create_banded_solver(A, b, **options):
+    # The tri/pentadiagonal fast paths only take FAST_PATH_OPTIONS.  Options
+    # of the general LU (precision, block_size, ...) send every bandwidth to
+    # EfficientBandedSolver, so whether a call works never depends on p and q.
+    if isinstance(A, SymmetricBandedMatrix):
+        return SymmetricBandedSolver(A, b, **options)
+    if not set(options) <= set(FAST_PATH_OPTIONS):
+        return EfficientBandedSolver(A, b, **options)
+    if (A.p, A.q) == TridiagonalSolver.bandwidths:
+        return TridiagonalSolver(A, b, **options)
+    if (A.p, A.q) == PentadiagonalSolver.bandwidths:
+        return PentadiagonalSolver(A, b, **options)
+    return EfficientBandedSolver(A, b, **options)
+
+
+def solve_banded_batch(bands, b):
+    bands = np.asarray(bands, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    if bands.ndim != 3 or b.shape != bands.shape[:2]:
+        raise ValueError(f"Expected bands of shape (batch, n, w) and b of shape (batch, n), got {bands.shape} and {b.shape}")
+    
+    if bands.shape[2] == 3:
+        return solve_tridiagonal_band(bands, b)
+    if bands.shape[2] == 5:
+        return solve_pentadiagonal_band(bands, b)
+    raise ValueError(f"Batched solve supports tridiagonal (w=3) and pentadiagonal (w=5) bands, got w={bands.shape[2]}")
+
+
+class BandedLUFactorization:
+    def __init__(self, A, precision='double', tolerance=1e-12, max_refinements=10, verify=False,
+                 instrumentation=None, progress=None, progress_interval=PROGRESS_INTERVAL, overwrite=False,
+                 block_size=None):
+        if isinstance(A, BandedMatrix):
+            self.A = A
+            self.n = A.n
+            self.p = A.p
+            self.q = A.q
+        else:
+            raise TypeError("A must be a BandedMatrix instance")
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {PRECISIONS}")
+        
+        # In mixed precision the factors live in a separate float32 band and
+        # A keeps the original entries for the float64 residuals.
+        self.precision = precision
+        self.tolerance = tolerance
+        self.max_refinements = max_refinements
+        self.block_size = band_block_size(self.p, self.q, block_size)
+        self.verify = verify
+        self.overwrite = overwrite
+        self.instrumentation = instrumentation or Instrumentation()
+        self.progress_callback = progress
+        self.progress_interval = progress_interval
+        self.original = None
+        self.verification = {}
+        self.factors = None
+        self.factored = False
+        self.factor_time = 0
+        self.solve_time = 0
+        self.total_solve_time = 0
+        self.solve_count = 0
+        self.rhs_count = 0
+        self.refinement_steps = 0
+        self.converged = None
+        self.residual_norm = None
+        self.relative_residual = None
+        
+    def factor(self, progress=None):
+        start_time = time.time()
+        if self.precision == 'mixed':
+            # Refinement takes its residuals from the unfactored entries, so
+            # the factors always get their own float32 band, even from float32
+            # input.  Parsing with dtype=np.float32 (load_planned_system) keeps
+            # A at that size too; from a float64 band, mixed mode only adds a
+            # conversion to the double-precision work.
+            self.factors = self.A.data.astype(np.float32)
+            self.original = self.A.data
+        else:
+            original = self.A.data
+            self.factors = _working_band(self.A, self.overwrite)
+            if self.verify:
+                self.original = original.copy() if self.factors is original else original
+        progress = progress or ProgressTracker(self.progress_callback, self.n, self.progress_interval)
+        with self.instrumentation.phase('factorization', band_lu_flops(self.n, self.p, self.q)):
+            for start, stop in progress.steps(0, self.n):
+                factor_band_blocked(self.factors, self.p, self.q, self.block_size, start, stop)
+        self.factored = True
+        self.factor_time = time.time() - start_time
+        return self
+    
+    def _substitute(self, rhs, progress=None):
+        # Refinement sweeps pass no tracker; their count is not known up front.
+        progress = progress or ProgressTracker()
+        k = 1 if rhs.ndim == 1 else rhs.shape[1]
+        with self.instrumentation.phase('forward_substitution', band_forward_flops(self.n, self.p) * k):
+            for start, stop in progress.steps(0, self.n):
+                forward_substitute_band(self.factors, rhs, self.p, start, stop)
+        with self.instrumentation.phase('back_substitution', band_back_flops(self.n, self.q) * k):
+            for start, stop in progress.steps(0, self.n, reverse=True):
+                back_substitute_band(self.factors, rhs, self.p, self.q, start, stop)
+        return rhs
+    
+    def _refine(self, x, b):
+        b_norm = np.linalg.norm(b, axis=0)
+        b_norm = np.where(b_norm == 0, 1.0, b_norm)
+        
+        for step in range(self.max_refinements + 1):
+            residual = b - band_matvec(self.original, self.p, self.q, x)
+            relative = float(np.max(np.linalg.norm(residual, axis=0) / b_norm))
+            if relative <= self.tolerance or step == self.max_refinements:
+                break
+            x += self._substitute(residual)
+        
+        self.refinement_steps = step
+        self.converged = relative <= self.tolerance
+        self.residual_norm = float(np.linalg.norm(residual))
+        self.relative_residual = relative
+        return x
+    
+    def solve(self, b):
+        # One tracker covers the factorization (when not done yet) and both
+        # substitutions.
+        progress = ProgressTracker(self.progress_callback, (2 if self.factored else 3) * self.n, self.progress_interval)
+        if not self.factored:
+            self.factor(progress)
+        
+        # With overwrite the substitutions run in the caller's b.
+        b_work = _working_array(b, self.overwrite)
+        if b_work.ndim not in (1, 2) or b_work.shape[0] != self.n:
+            raise ValueError(f"Right-hand side must have shape ({self.n},) or ({self.n}, k), got {b_work.shape}")
+        
+        start_time = time.time()
+        if self.precision == 'mixed':
+            x = self._refine(self._substitute(b_work.copy(), progress), b_work)
+        else:
+            x = self._substitute(b_work.copy() if self.verify else b_work, progress)
+        self.solve_time = time.time() - start_time
+        if self.verify:
+            k = 1 if b_work.ndim == 1 else b_work.shape[1]
+            with self.instrumentation.phase('verification', band_matvec_flops(self.n, self.p, self.q) * k):
+                self.verification = verify_solution(lambda y: band_matvec(self.original, self.p, self.q, y), x, b_work)
+        
+        self.total_solve_time += self.solve_time
+        self.solve_count += 1
+        self.rhs_count += 1 if b_work.ndim == 1 else b_work.shape[1]
+        return x
+    
+    def get_stats(self):
+        stats = {
+            'factor_time': self.factor_time,
+            'solve_time': self.solve_time,
+            'total_solve_time': self.total_solve_time,
+            'solve_count': self.solve_count,
+            'rhs_count': self.rhs_count,
+            'time_per_rhs': self.total_solve_time / self.rhs_count if self.rhs_count else 0,
+            'dimension': self.n,
+            'upper_bandwidth': self.q,
+            'lower_bandwidth': self.p,
+            'storage_format': 'banded',
+            'precision': self.precision,
+            'block_size': self.block_size,
+            'phases': self.instrumentation.summary()
+        }
+        if self.precision == 'mixed':
+            stats.update({
+                'refinement_steps': self.refinement_steps,
+                'converged': self.converged,
+                'residual_norm': self.residual_norm,
+                'relative_residual': self.relative_residual
+            })
+        stats.update(self.verification)
+        return stats
+
+
+SYMMETRIC_METHODS = ('auto', 'cholesky', 'ldlt')
+
+
+class SymmetricBandedFactorization:
+    def __init__(self, A, method='auto', verify=False, instrumentation=None, progress=None,
+                 progress_interval=PROGRESS_INTERVAL, overwrite=False):
+        # A symmetric BandedMatrix is converted to lower-band storage, which
+        # copies it, so that copy is factored in place; a SymmetricBandedMatrix
+        # is only factored in place with overwrite.
+        self.converted = not isinstance(A, SymmetricBandedMatrix)
+        if isinstance(A, SymmetricBandedMatrix):
+            self.A = A
+        elif isinstance(A, BandedMatrix):
+            self.A = SymmetricBandedMatrix.from_banded(A)
+        else:
+            raise TypeError("A must be a SymmetricBandedMatrix or a symmetric BandedMatrix instance")
+        if method not in SYMMETRIC_METHODS:
+            raise ValueError(f"Unknown method '{method}', expected one of {SYMMETRIC_METHODS}")
+        self.n = self.A.n
+        self.p = self.A.p
+        self.q = self.A.q
+        
+        # 'auto' starts with Cholesky and switches to LDL^T at the first
+        # pivot that is not positive.
+        self.method = method
+        self.verify = verify
+        self.overwrite = overwrite
+        self.instrumentation = instrumentation or Instrumentation()
+        self.progress_callback = progress
+        self.progress_interval = progress_interval
+        self.original = None
+        self.verification = {}
+        self.factors = None
+        self.factored = False
+        self.cholesky = None
+        self.switch_pivot = None
+        self.factor_time = 0
+        self.solve_time = 0
+        self.total_solve_time = 0
+        self.solve_count = 0
+        self.rhs_count = 0
+    
+    def factor(self, progress=None):
+        start_time = time.time()
+        n, p = self.n, self.p
+        original = self.A.data
+        self.factors = _working_band(self.A, self.overwrite or self.converted)
+        if self.verify:
+            self.original = original.copy() if self.factors is original else original
+        progress = progress or ProgressTracker(self.progress_callback, n, self.progress_interval)
+        cholesky = self.method != 'ldlt'
+        with self.instrumentation.phase('factorization', band_symmetric_flops(n, p)):
+            for start, stop in progress.steps(0, n):
+                if cholesky:
+                    failed = factor_symmetric_band(self.factors, p, start, stop, cholesky=True)
+                    if failed == stop:
+                        continue
+                    if self.method == 'cholesky':
+                        raise ValueError(f"Matrix is not positive definite (pivot {failed})")
+                    cholesky_to_ldlt(self.factors, failed)
+                    cholesky = False
+                    self.switch_pivot = failed
+                    start = failed
+                factor_symmetric_band(self.factors, p, start, stop)
+        self.cholesky = cholesky
+        self.factored = True
+        self.factor_time = time.time() - start_time
+        return self
+    
+    def _substitute(self, rhs, progress=None):
+        progress = progress or ProgressTracker()
+        k = 1 if rhs.ndim == 1 else rhs.shape[1]
+        flops = band_symmetric_substitution_flops(self.n, self.p) * k
+        with self.instrumentation.phase('forward_substitution', flops):
+            for start, stop in progress.steps(0, self.n):
+                forward_substitute_symmetric(self.factors, rhs, self.p, start, stop, self.cholesky)
+        with self.instrumentation.phase('back_substitution', flops):
+            for start, stop in progress.steps(0, self.n, reverse=True):
+                back_substitute_symmetric(self.factors, rhs, self.p, start, stop, self.cholesky)
+        return rhs
+    
+    def solve(self, b):
+        progress = ProgressTracker(self.progress_callback, (2 if self.factored else 3) * self.n, self.progress_interval)
+        if not self.factored:
+            self.factor(progress)
+        
+        b_work = _working_array(b, self.overwrite)
+        if b_work.ndim not in (1, 2) or b_work.shape[0] != self.n:
+            raise ValueError(f"Right-hand side must have shape ({self.n},) or ({self.n}, k), got {b_work.shape}")
+        
+        start_time = time.time()
+        x = self._substitute(b_work.copy() if self.verify else b_work, progress)
+        self.solve_time = time.time() - start_time
+        if self.verify:
+            k = 1 if b_work.ndim == 1 else b_work.shape[1]
+            with self.instrumentation.phase('verification', band_matvec_flops(self.n, self.p, self.q) * k):
+                self.verification = verify_solution(lambda y: symmetric_band_matvec(self.original, self.p, y),
+                                                    x, b_work)
+        
+        self.total_solve_time += self.solve_time
+        self.solve_count += 1
+        self.rhs_count += 1 if b_work.ndim == 1 else b_work.shape[1]
+        return x
+    
+    def get_stats(self):
+        stats = {
+            'factor_time': self.factor_time,
+            'solve_time': self.solve_time,
+            'total_solve_time': self.total_solve_time,
+            'solve_count': self.solve_count,
+            'rhs_count': self.rhs_count,
+            'time_per_rhs': self.total_solve_time / self.rhs_count if self.rhs_count else 0,
+            'dimension': self.n,
+            'upper_bandwidth': self.q,
+            'lower_bandwidth': self.p,
+            'storage_format': 'symmetric_banded',
+            'method': self.method,
+            'phases': self.instrumentation.summary()
+        }
+        if self.factored:
+            stats.update({
+                'algorithm': 'cholesky' if self.cholesky else 'ldlt',
+                'positive_definite': self.cholesky or bool(np.all(self.factors[:, 0] > 0)),
+                'switch_pivot': self.switch_pivot,
+                'band_bytes': self.factors.nbytes
+            })
+        stats.update(self.verification)
+        return stats
+
+
+class SymmetricBandedSolver:
+    def __init__(self, A, b, method='auto', verify=False, instrumentation=None, progress=None,
+                 progress_interval=PROGRESS_INTERVAL, overwrite=False):
+        self.factorization = SymmetricBandedFactorization(A, method, verify, instrumentation, progress,
+                                                          progress_interval, overwrite)
+        self.A = self.factorization.A
+        self.n = self.A.n
+        self.p = self.A.p
+        self.q = self.A.q
+        self.b = b
+        self.overwrite = overwrite
+        self.solution = None
+        self.solve_time = 0
+    
+    def solve(self):
+        start_time = time.time()
+        self.solution = self.factorization.solve(self.b)
+        self.solve_time = time.time() - start_time
+        return self.solution
+    
+    def get_stats(self):
+        stats = self.factorization.get_stats()
+        stats['solve_time'] = self.solve_time
+        stats['overwrite'] = self.overwrite
+        return stats
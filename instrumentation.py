@@ -0,0 +1,164 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+def band_lu_flops(n, p, q):
+    # Each pivot divides up to p multipliers and updates a p x q block.
+    return n * p * (2 * q + 1)
+
+
+def band_forward_flops(n, p):
+    return 2 * n * p
+
+
+def band_back_flops(n, q):
+    return n * (2 * q + 1)
+
+
+def band_symmetric_flops(n, p):
+    # Cholesky / LDL^T: each pivot scales p entries and updates the lower
+    # triangle of a p x p block, about half of band_lu_flops(n, p, p).
+    return n * p * (p + 2)
+
+
+def band_symmetric_substitution_flops(n, p):
+    return n * (2 * p + 1)
+
+
+def band_matvec_flops(n, p, q):
+    return 2 * n * (p + q + 1)
+
+
+def dense_lu_flops(n):
+    return 2 * n ** 3 // 3
+
+
+def dense_substitution_flops(n):
+    return n * n
+
+
+class JsonLogSink:
+    # Callback that appends each finished phase as one JSON line.
+    def __init__(self, target):
+        self.target = target
+
+    def __call__(self, event):
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        if hasattr(self.target, 'write'):
+            self.target.write(line)
+            self.target.flush()
+        else:
+            with open(self.target, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+class Instrumentation:
+    def __init__(self, track_memory=False, callbacks=None, context=None):
+        self.track_memory = track_memory
+        self.callbacks = list(callbacks or [])
+        self.context = dict(context or {})
+        self.phases = {}
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+        return callback
+
+    @contextmanager
+    def phase(self, name, flops=None):
+        # Phases are not nested: each one resets the tracemalloc peak when it
+        # starts.  Repeated phases (chunks, several right-hand sides)
+        # accumulate into one entry.
+        started_tracing = False
+        if self.track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+            base_memory = tracemalloc.get_traced_memory()[0]
+
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start_time
+            peak = None
+            if self.track_memory:
+                peak = tracemalloc.get_traced_memory()[1] - base_memory
+                if started_tracing:
+                    tracemalloc.stop()
+            self.record(name, elapsed, flops, peak)
+
+    def record(self, name, elapsed, flops=None, peak=None):
+        entry = self.phases.setdefault(name, {'time': 0.0, 'calls': 0, 'flops': None, 'peak_memory_bytes': None})
+        entry['time'] += elapsed
+        entry['calls'] += 1
+        if flops is not None:
+            entry['flops'] = (entry['flops'] or 0) + flops
+        if peak is not None:
+            entry['peak_memory_bytes'] = max(entry['peak_memory_bytes'] or 0, peak)
+
+        event = {
+            'phase': name,
+            'time': elapsed,
+            'flops': flops,
+            'gflops': flops / elapsed / 1e9 if flops and elapsed > 0 else None,
+            'peak_memory_bytes': peak,
+            'timestamp': time.time(),
+            **self.context
+        }
+        for callback in self.callbacks:
+            callback(event)
+
+    def summary(self):
+        phases = {}
+        for name, entry in self.phases.items():
+            phases[name] = {
+                **entry,
+                'gflops': entry['flops'] / entry['time'] / 1e9 if entry['flops'] and entry['time'] > 0 else None
+            }
+        return phases
+
+    def total_time(self, names=None):
+        return sum(entry['time'] for name, entry in self.phases.items() if names is None or name in names)
+
+    def reset(self):
+        self.phases = {}
+
+
+PROGRESS_INTERVAL = 4096
+
+
+class SolveCancelled(Exception):
+    pass
+
+
+class ProgressTracker:
+    # Reports (done, total) work units to a callback every `interval` rows.
+    # A callback that returns False cancels the solve by raising
+    # SolveCancelled from inside the solver loop.
+    def __init__(self, callback=None, total=0, interval=PROGRESS_INTERVAL):
+        self.callback = callback
+        self.total = total
+        self.interval = max(1, interval)
+        self.done = 0
+
+    def steps(self, start, stop, reverse=False):
+        # Splits [start, stop) into interval-sized ranges, reporting after
+        # each one.  Without a callback the whole range is one step, so the
+        # solvers pay nothing for it.
+        if self.callback is None:
+            if start < stop:
+                yield start, stop
+            self.done += max(0, stop - start)
+            return
+        bounds = list(range(start, stop, self.interval)) + [stop]
+        ranges = list(zip(bounds[:-1], bounds[1:]))
+        for lo, hi in reversed(ranges) if reverse else ranges:
+            yield lo, hi
+            self.advance(hi - lo)
+
+    def advance(self, units):
+        self.done += units
+        if self.callback is not None and self.callback(min(self.done, self.total), self.total) is False:
+            raise SolveCancelled(f"Solve cancelled after {self.done} of {self.total} rows")
@@ -0,0 +1,151 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import SolveCancelled
+
+JOB_STATES = ('pending', 'running', 'done', 'failed', 'cancelled')
+# Finished jobs keep their results (full solutions) until they are cleared,
+# so only this many are retained; the earliest finished go first.
+MAX_FINISHED_JOBS = 16
+
+
+class Job:
+    def __init__(self, job_id, name, key=None):
+        self.id = job_id
+        self.name = name
+        self.key = key
+        self.status = 'pending'
+        self.done = 0
+        self.total = 0
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.cancel_requested = False
+
+    def update(self, done, total):
+        # Progress callback handed to the solver; returning False makes the
+        # solver raise SolveCancelled at its next report.
+        self.done = done
+        self.total = total
+        return not self.cancel_requested
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def snapshot(self):
+        elapsed = self.elapsed()
+        fraction = self.done / self.total if self.total else (1.0 if self.status == 'done' else 0.0)
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = (self.total - self.done) / rate if rate > 0 and self.status == 'running' else None
+        return {
+            'id': self.id,
+            'name': self.name,
+            'key': self.key,
+            'status': self.status,
+            'done': self.done,
+            'total': self.total,
+            'percent': 100.0 * fraction,
+            'rows_per_second': rate,
+            'elapsed': elapsed,
+            'eta': remaining,
+            'error': self.error
+        }
+
+
+class JobManager:
+    def __init__(self, max_workers=2, max_finished=MAX_FINISHED_JOBS):
+        self.max_workers = max(1, max_workers)
+        self.max_finished = max(0, max_finished)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='solve-job')
+        self.jobs = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def submit(self, name, fn, *args, key=None, **kwargs):
+        # fn is called with an extra `progress` keyword bound to the job.  A
+        # key identifies the work: submitting a key that is still pending or
+        # running returns the existing job instead of starting it again.
+        with self.lock:
+            if key is not None:
+                for job in self.jobs.values():
+                    if job.key == key and job.status in ('pending', 'running'):
+                        return job.id
+            job = Job(next(self.ids), name, key)
+            self.jobs[job.id] = job
+        self.executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_requested:
+            job.status = 'cancelled'
+            job.finished = time.time()
+            self._prune()
+            return
+        job.status = 'running'
+        job.started = time.time()
+        try:
+            job.result = fn(*args, progress=job.update, **kwargs)
+            job.status = 'done'
+            job.done = job.total
+        except SolveCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished = time.time()
+            self._prune()
+
+    def _prune(self):
+        with self.lock:
+            finished = sorted((job for job in self.jobs.values() if job.status not in ('pending', 'running')),
+                              key=lambda job: job.finished or float('inf'))
+            for job in finished[:max(0, len(finished) - self.max_finished)]:
+                del self.jobs[job.id]
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.status not in ('pending', 'running'):
+            return False
+        job.cancel_requested = True
+        return True
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def find(self, key):
+        # Latest job submitted under key, whatever its state.
+        with self.lock:
+            matches = [job for job in self.jobs.values() if job.key == key]
+        return matches[-1] if matches else None
+
+    def result(self, job_id):
+        job = self.jobs.get(job_id)
+        return job.result if job is not None and job.status == 'done' else None
+
+    def snapshot(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return [job.snapshot() for job in jobs]
+
+    def active(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return sum(job.status in ('pending', 'running') for job in jobs)
+
+    def clear_finished(self):
+        with self.lock:
+            for job_id in [job_id for job_id, job in self.jobs.items()
+                           if job.status not in ('pending', 'running')]:
+                del self.jobs[job_id]
+
+    def shutdown(self, cancel=True):
+        if cancel:
+            for job_id in list(self.jobs):
+                self.cancel(job_id)
+        self.executor.shutdown(wait=True)
@@ -1,6 +1,80 @@
-def main():
-    print("Hello from repl-nix-workspace!")
+import argparse
+import json
+import os
+import sys
+from batch_engine import BatchEngine, collect_dat_files
+from file_catalog import FileCatalog
+from solver_planner import SOLVER_REGISTRY
+from solution_writer import SOLUTION_FORMATS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量求解.dat线性方程组文件")
+    parser.add_argument("paths", nargs='+', help=".dat文件或包含.dat文件的目录")
+    parser.add_argument("--workers", "-j", type=int, default=None, help="并行进程数（默认CPU核数）")
+    parser.add_argument("--verify", action="store_true", help="求解后计算残差")
+    parser.add_argument("--track-memory", action="store_true", help="记录各阶段内存峰值")
+    parser.add_argument("--log", default=None, help="各阶段JSON日志文件")
+    parser.add_argument("--engine", choices=list(SOLVER_REGISTRY), default=None, help="指定求解引擎（默认自动选择）")
+    parser.add_argument("--memory-limit", type=float, default=None, help="内存上限(MB)，默认取可用内存")
+    parser.add_argument("--solution-dir", default=None, help="解向量输出目录（每个文件一个）")
+    parser.add_argument("--solution-format", choices=SOLUTION_FORMATS, default='npy', help="解向量文件格式（默认npy）")
+    parser.add_argument("--catalog", default=None, help="文件索引数据库（SQLite），记录文件头与历史求解耗时")
+    parser.add_argument("--skip-solved", action="store_true", help="跳过索引中已成功求解的文件（需 --catalog）")
+    parser.add_argument("--output", "-o", default=None, help="结果JSON文件")
+    args = parser.parse_args(argv)
+    if args.skip_solved and not args.catalog:
+        parser.error("--skip-solved 需要同时指定 --catalog")
+
+    files = collect_dat_files(args.paths)
+    if not files:
+        print("未找到.dat文件")
+        return 1
+
+    catalog = None
+    if args.catalog:
+        catalog = FileCatalog(args.catalog)
+        for path in args.paths:
+            if os.path.isdir(path):
+                summary = catalog.refresh(path)
+                print(f"索引 {summary['directory']}: {summary['files']} 个文件，新增 {summary['added']}，"
+                      f"更新 {summary['updated']}，移除 {summary['removed']}，耗时 {summary['refresh_time']:.3f} 秒")
+
+    memory_limit = int(args.memory_limit * 1024 * 1024) if args.memory_limit else None
+    engine = BatchEngine(args.workers, verify=args.verify, track_memory=args.track_memory, log_path=args.log,
+                         engine=args.engine, memory_limit=memory_limit, output_dir=args.solution_dir,
+                         output_format=args.solution_format, catalog=catalog, skip_solved=args.skip_solved)
+    print(f"共 {len(files)} 个文件，使用 {min(engine.max_workers, len(files))} 个进程")
+
+    results = []
+    for result in engine.run(files):
+        results.append(result)
+        prefix = f"[{engine.completed}/{engine.jobs}] {result['filename']}"
+        if result['status'] == 'ok':
+            info = result['info']
+            line = (f"{prefix}: n={info['n']}, 引擎 {result['engine']}, 解析 {result['parse_time']:.4f}s, "
+                    f"求解 {result['solve_time']:.4f}s, 解的范围 [{result['solution_min']:.4f}, {result['solution_max']:.4f}]")
+            if 'relative_residual' in result['stats']:
+                line += f", 相对残差 {result['stats']['relative_residual']:.2e}"
+            if 'output' in result:
+                line += f", 解已写入 {result['output']}"
+            print(line)
+        else:
+            print(f"{prefix}: ❌ {result['error']}")
+
+    stats = engine.get_stats()
+    if stats['skipped']:
+        print(f"跳过 {stats['skipped']} 个已求解文件")
+    print(f"完成: {stats['completed'] - stats['failed']}/{stats['jobs']} 成功，总耗时 {stats['total_time']:.4f} 秒")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'stats': stats, 'results': results, 'skipped': engine.skipped}, f, indent=2, ensure_ascii=False,
+                      default=str)
+        print(f"结果已保存到 {os.path.abspath(args.output)}")
+
+    return 1 if stats['failed'] else 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
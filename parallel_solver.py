@@ -0,0 +1,190 @@
+import numpy as np
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from banded_storage import BandedMatrix
+from banded_kernels import (band_matvec, band_block_size, factor_band_blocked, forward_substitute_band,
+                            back_substitute_band, verify_solution)
+from instrumentation import Instrumentation, ProgressTracker, band_lu_flops, band_matvec_flops
+
+def _solve_partition(data, rhs, p, q, row_offset, block_size=1):
+    factor_band_blocked(data, p, q, block_size, row_offset=row_offset)
+    forward_substitute_band(data, rhs, p)
+    back_substitute_band(data, rhs, p, q)
+    return rhs
+
+
+def _add_to_band(data, p, row0, col0, block):
+    rows = row0 + np.arange(block.shape[0])[:, None]
+    cols = col0 + np.arange(block.shape[1])[None, :]
+    data[rows, cols - rows + p] += block
+
+
+class ParallelBandedSolver:
+    def __init__(self, A, b, num_blocks=None, max_workers=None, use_processes=True, verify=False,
+                 instrumentation=None, progress=None, overwrite=False, block_size=None):
+        if isinstance(A, BandedMatrix):
+            self.A = A
+            self.n = A.n
+            self.p = A.p
+            self.q = A.q
+        else:
+            raise TypeError("A must be a BandedMatrix instance")
+
+        # b is only read; partitions copy their slice of it into the spike
+        # right-hand sides.
+        self.b = np.asarray(b, dtype=np.float64)
+        self.overwrite = overwrite
+        self.block_size = band_block_size(self.p, self.q, block_size)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.use_processes = use_processes
+        self.verify = verify
+        self.verification = {}
+        self.instrumentation = instrumentation or Instrumentation()
+        # Partitions run in the workers, so progress moves one partition at
+        # a time.
+        self.progress = ProgressTracker(progress, self.n)
+
+        # Each partition needs at least p + q rows so that the top q and the
+        # bottom p rows it contributes to the reduced system do not overlap.
+        min_rows = max(2 * (self.p + self.q), 1)
+        requested = num_blocks or self.max_workers
+        self.num_blocks = max(1, min(requested, self.n // min_rows))
+
+        self.solution = None
+        self.solve_time = 0
+        self.partition_time = 0
+        self.reduced_time = 0
+        self.finish_time = 0
+        self.reduced_size = 0
+
+    def _partition_rows(self):
+        bounds = np.linspace(0, self.n, self.num_blocks + 1).astype(int)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def _partition_rhs(self, start, stop):
+        # Columns: [f_j | B_j padded to q columns | C_j padded to p columns],
+        # where B_j couples to the first q unknowns of the next partition and
+        # C_j to the last p unknowns of the previous one.
+        p, q = self.p, self.q
+        data = self.A.data
+        rhs = np.zeros((stop - start, 1 + q + p))
+        rhs[:, 0] = self.b[start:stop]
+
+        if stop < self.n:
+            for a in range(q):
+                i = stop - q + a
+                cols = np.arange(min(a + 1, self.n - stop))
+                rhs[i - start, 1 + cols] = data[i, stop + cols - i + p]
+        if start > 0:
+            for a in range(p):
+                i = start + a
+                cols = np.arange(a, p)
+                rhs[a, 1 + q + cols] = data[i, cols - a]
+        return rhs
+
+    def solve(self):
+        start_time = time.time()
+        p, q = self.p, self.q
+        partitions = self._partition_rows()
+
+        use_processes = self.use_processes and self.num_blocks > 1
+        # Threads can factor the partitions in place when the band may be
+        # overwritten; process workers always get their own copy.
+        in_place = self.overwrite and not use_processes and self.A.data.dtype == np.float64 \
+            and self.A.data.flags.writeable
+        original = self.A.data.copy() if in_place and self.verify else self.A.data
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with executor_class(max_workers=min(self.max_workers, self.num_blocks)) as executor:
+            futures = [
+                executor.submit(_solve_partition,
+                                self.A.data[start:stop] if in_place else self.A.data[start:stop].astype(np.float64),
+                                self._partition_rhs(start, stop), p, q, start, self.block_size)
+                for start, stop in partitions
+            ]
+            spikes = []
+            for future, (start, stop) in zip(futures, partitions):
+                spikes.append(future.result())
+                self.progress.advance(stop - start)
+        self.partition_time = time.time() - start_time
+        # Partitions are factored in the workers, so only their wall time is
+        # recorded here.
+        self.instrumentation.record('partition', self.partition_time, band_lu_flops(self.n, p, q))
+
+        reduced_start = time.time()
+        with self.instrumentation.phase('reduced_system'):
+            coupling = self._solve_reduced_system(spikes)
+        self.reduced_time = time.time() - reduced_start
+
+        finish_start = time.time()
+        self.solution = np.zeros(self.n)
+
+        def finish(j):
+            start, stop = partitions[j]
+            g, V, W = spikes[j][:, 0], spikes[j][:, 1:1 + q], spikes[j][:, 1 + q:]
+            x = g.copy()
+            if j + 1 < self.num_blocks:
+                x -= V @ coupling[j + 1][0]
+            if j > 0:
+                x -= W @ coupling[j - 1][1]
+            self.solution[start:stop] = x
+
+        with self.instrumentation.phase('finish'), \
+                ThreadPoolExecutor(max_workers=min(self.max_workers, self.num_blocks)) as executor:
+            list(executor.map(finish, range(self.num_blocks)))
+        self.finish_time = time.time() - finish_start
+
+        self.solve_time = time.time() - start_time
+        if self.verify:
+            with self.instrumentation.phase('verification', band_matvec_flops(self.n, p, q)):
+                self.verification = verify_solution(lambda x: band_matvec(original, p, q, x), self.solution, self.b)
+        return self.solution
+
+    def _solve_reduced_system(self, spikes):
+        # Unknowns per partition j: its first q entries (T_j) followed by its
+        # last p entries (B_j).  The reduced matrix is itself banded.
+        p, q = self.p, self.q
+        m = p + q
+        size = self.num_blocks * m
+        self.reduced_size = size
+        if m == 0:
+            return [(np.zeros(0), np.zeros(0))] * self.num_blocks
+
+        reduced = BandedMatrix(size, 2 * p + q, p + 2 * q)
+        rhs = np.zeros(size)
+        for j, spike in enumerate(spikes):
+            g, V, W = spike[:, 0], spike[:, 1:1 + q], spike[:, 1 + q:]
+            top, bottom = j * m, j * m + q
+            reduced.data[top:top + m, reduced.p] = 1.0
+            rhs[top:top + q] = g[:q]
+            rhs[bottom:bottom + p] = g[len(g) - p:]
+            if j + 1 < self.num_blocks:
+                _add_to_band(reduced.data, reduced.p, top, (j + 1) * m, V[:q])
+                _add_to_band(reduced.data, reduced.p, bottom, (j + 1) * m, V[len(V) - p:])
+            if j > 0:
+                _add_to_band(reduced.data, reduced.p, top, (j - 1) * m + q, W[:q])
+                _add_to_band(reduced.data, reduced.p, bottom, (j - 1) * m + q, W[len(W) - p:])
+
+        factor_band_blocked(reduced.data, reduced.p, reduced.q, band_block_size(reduced.p, reduced.q))
+        forward_substitute_band(reduced.data, rhs, reduced.p)
+        back_substitute_band(reduced.data, rhs, reduced.p, reduced.q)
+        return [(rhs[j * m:j * m + q], rhs[j * m + q:(j + 1) * m]) for j in range(self.num_blocks)]
+
+    def get_stats(self):
+        return {
+            'solve_time': self.solve_time,
+            'partition_time': self.partition_time,
+            'reduced_time': self.reduced_time,
+            'finish_time': self.finish_time,
+            'dimension': self.n,
+            'upper_bandwidth': self.q,
+            'lower_bandwidth': self.p,
+            'storage_format': 'banded',
+            'num_blocks': self.num_blocks,
+            'block_size': self.block_size,
+            'overwrite': self.overwrite,
+            'workers': min(self.max_workers, self.num_blocks),
+            'reduced_size': self.reduced_size,
+            'phases': self.instrumentation.summary(),
+            **self.verification
+        }
@@ -0,0 +1,147 @@
+import queue
+import threading
+import time
+import numpy as np
+from file_parser import LinearSystemParser, HEADER_SIZE
+from banded_storage import BandedMatrix
+from banded_kernels import (band_block_size, factor_band_blocked, forward_substitute_band, back_substitute_band,
+                            verify_solution)
+from instrumentation import Instrumentation, ProgressTracker, PROGRESS_INTERVAL, band_lu_flops, band_forward_flops, band_back_flops, band_matvec_flops
+
+class PipelinedBandedSolver:
+    def __init__(self, filename, chunk_rows=8192, queue_depth=4, verify=False, instrumentation=None, progress=None,
+                 progress_interval=PROGRESS_INTERVAL, block_size=None):
+        info = LinearSystemParser.read_header_only(filename)
+        if info['version'] != '0x202':
+            raise ValueError(f"Pipelined solve requires a compressed (0x202) file, got {info['version']}")
+
+        self.filename = filename
+        self.n = info['n']
+        self.p = info['p']
+        self.q = info['q']
+        self.bandwidth = info['bandwidth']
+        self.chunk_rows = max(1, chunk_rows)
+        self.queue_depth = max(1, queue_depth)
+        self.block_size = band_block_size(self.p, self.q, block_size)
+        self.verify = verify
+        self.verification = {}
+        self.instrumentation = instrumentation or Instrumentation()
+        self.progress = ProgressTracker(progress, 3 * self.n, progress_interval)
+        self.solution = None
+        self.solve_time = 0
+        self.read_time = 0
+        self.factor_time = 0
+        self.wait_time = 0
+
+    @staticmethod
+    def _put(chunks, stopped, item):
+        # Blocking put that gives up once the consumer has stopped (after an
+        # error or a cancellation), so the reader never hangs on a full queue.
+        while not stopped.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _reader(self, chunks, stopped):
+        # Producer: band rows in chunks, then the RHS from the end of the
+        # file.  Errors are handed to the consumer instead of being lost in
+        # the thread.
+        try:
+            with open(self.filename, 'rb') as f:
+                f.seek(HEADER_SIZE)
+                for start in range(0, self.n, self.chunk_rows):
+                    stop = min(start + self.chunk_rows, self.n)
+                    read_start = time.perf_counter()
+                    count = (stop - start) * self.bandwidth
+                    raw = np.frombuffer(f.read(4 * count), dtype=np.float32)
+                    if raw.size != count:
+                        raise ValueError(f"Unexpected end of file: expected {count} values, got {raw.size}")
+                    self.read_time += time.perf_counter() - read_start
+                    if not self._put(chunks, stopped, ('band', start, stop, raw.reshape(stop - start, self.bandwidth))):
+                        return
+
+                read_start = time.perf_counter()
+                rhs = np.frombuffer(f.read(4 * self.n), dtype=np.float32)
+                if rhs.size != self.n:
+                    raise ValueError(f"Unexpected end of file: expected {self.n} values, got {rhs.size}")
+                self.read_time += time.perf_counter() - read_start
+                self._put(chunks, stopped, ('rhs', 0, self.n, rhs))
+        except Exception as e:
+            self._put(chunks, stopped, ('error', 0, 0, e))
+
+    def solve(self):
+        start_time = time.time()
+        n, p, q = self.n, self.p, self.q
+        lag = max(p, q)
+        data = np.empty((n, self.bandwidth))
+        chunks = queue.Queue(maxsize=self.queue_depth)
+        self.read_time = self.factor_time = self.wait_time = 0
+
+        stopped = threading.Event()
+        reader = threading.Thread(target=self._reader, args=(chunks, stopped), daemon=True)
+        reader.start()
+        try:
+            # Pivot k only touches rows up to k + max(p, q), so every pivot
+            # whose trailing block is already loaded can be factored while
+            # the reader fetches the next chunk.
+            factored = 0
+            while True:
+                wait_start = time.perf_counter()
+                kind, start, stop, payload = chunks.get()
+                self.wait_time += time.perf_counter() - wait_start
+                if kind == 'error':
+                    raise payload
+                if kind == 'rhs':
+                    b = payload.astype(np.float64)
+                    break
+
+                data[start:stop] = payload
+                ready = n if stop == n else max(factored, stop - lag)
+                factor_start = time.perf_counter()
+                with self.instrumentation.phase('factorization', band_lu_flops(ready - factored, p, q)):
+                    factor_band_blocked(data[:stop], p, q, self.block_size, factored, ready)
+                self.factor_time += time.perf_counter() - factor_start
+                self.progress.advance(ready - factored)
+                factored = ready
+        finally:
+            stopped.set()
+            reader.join()
+        self.instrumentation.record('matrix', self.read_time)
+
+        with self.instrumentation.phase('forward_substitution', band_forward_flops(n, p)):
+            for start, stop in self.progress.steps(0, n):
+                forward_substitute_band(data, b, p, start, stop)
+        with self.instrumentation.phase('back_substitution', band_back_flops(n, q)):
+            for start, stop in self.progress.steps(0, n, reverse=True):
+                back_substitute_band(data, b, p, q, start, stop)
+            self.solution = b
+
+        self.solve_time = time.time() - start_time
+        if self.verify:
+            # The band now holds the factors, so the check reads the original
+            # band back through a memory map.
+            band, rhs = LinearSystemParser(self.filename).map_arrays()
+            with self.instrumentation.phase('verification', band_matvec_flops(n, p, q)):
+                self.verification = verify_solution(lambda x: BandedMatrix(n, p, q, data=band).matvec(x),
+                                                    self.solution, rhs)
+        return self.solution
+
+    def get_stats(self):
+        return {
+            'solve_time': self.solve_time,
+            'factor_time': self.factor_time,
+            'read_time': self.read_time,
+            'wait_time': self.wait_time,
+            'dimension': self.n,
+            'upper_bandwidth': self.q,
+            'lower_bandwidth': self.p,
+            'storage_format': 'pipelined',
+            'chunk_rows': self.chunk_rows,
+            'queue_depth': self.queue_depth,
+            'block_size': self.block_size,
+            'phases': self.instrumentation.summary(),
+            **self.verification
+        }
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+import numpy as np
+from banded_storage import BandedMatrix
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(filename, chunk_size=1 << 22):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def estimate_nbytes(obj, seen=None):
+    # Arrays shared between cached objects (a factorization aliasing its
+    # matrix, for instance) are counted once.
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes if obj.base is None or id(obj.base) not in seen else 0
+    if isinstance(obj, BandedMatrix):
+        return estimate_nbytes(obj.data, seen)
+    if isinstance(obj, (bytes, bytearray, str)):
+        return len(obj)
+    if isinstance(obj, dict):
+        return sum(estimate_nbytes(value, seen) for value in obj.values())
+    if isinstance(obj, (list, tuple, set)):
+        return sum(estimate_nbytes(value, seen) for value in obj)
+    if hasattr(obj, '__dict__'):
+        return estimate_nbytes(vars(obj), seen)
+    return 0
+
+
+class ResultCache:
+    def __init__(self, max_bytes=1 << 30, disk_dir=None, disk_max_bytes=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        if disk_dir is not None:
+            os.makedirs(disk_dir, exist_ok=True)
+
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(digest, kind, *options):
+        return f"{digest}-{kind}" + (f"-{content_hash(repr(options).encode())[:16]}" if options else "")
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+
+        value = self._load_from_disk(key)
+        with self.lock:
+            if value is None:
+                self.misses += 1
+                return default
+            self.disk_hits += 1
+            self._store(key, value, estimate_nbytes(value))
+        return value
+
+    def put(self, key, value):
+        size = estimate_nbytes(value)
+        with self.lock:
+            self._store(key, value, size)
+        self._save_to_disk(key, value)
+        return value
+
+    def _store(self, key, value, size):
+        if key in self.entries:
+            self.current_bytes -= self.entries.pop(key)[1]
+        # Values larger than the whole budget only live on disk.
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (value, size)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+            self.evictions += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def _load_from_disk(self, key):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        os.utime(path)
+        return value
+
+    def _save_to_disk(self, key, value):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+        if self.disk_max_bytes is not None:
+            self._trim_disk()
+
+    def _trim_disk(self):
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith('.pkl'):
+                path = os.path.join(self.disk_dir, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def disk_bytes(self):
+        if self.disk_dir is None:
+            return 0
+        return sum(os.path.getsize(os.path.join(self.disk_dir, name))
+                   for name in os.listdir(self.disk_dir) if name.endswith('.pkl'))
+
+    def clear(self, disk=False):
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+        if disk and self.disk_dir is not None:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+    def get_stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'memory_bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'disk_bytes': self.disk_bytes(),
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0
+        }
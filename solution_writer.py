@@ -0,0 +1,98 @@
+import io
+import os
+import struct
+import numpy as np
+from file_parser import FILE_ID, HEADER_SIZE
+
+SOLUTION_VERSION = 0x301
+SOLUTION_FORMATS = ('npy', 'sol', 'csv', 'txt')
+TEXT_FORMATS = ('csv', 'txt')
+MIME_TYPES = {
+    'npy': 'application/octet-stream',
+    'sol': 'application/octet-stream',
+    'csv': 'text/csv',
+    'txt': 'text/plain'
+}
+
+
+def solution_format(filename, fmt=None):
+    fmt = fmt or os.path.splitext(filename)[1].lstrip('.').lower()
+    if fmt not in SOLUTION_FORMATS:
+        raise ValueError(f"Unknown solution format '{fmt}', expected one of {SOLUTION_FORMATS}")
+    return fmt
+
+
+def _binary_header(solution, fmt):
+    if fmt == 'npy':
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, np.lib.format.header_data_from_array_1_0(solution))
+        return header.getvalue()
+    # Same 24-byte layout as the .dat input files: id, version, 0, then n and
+    # two unused fields where the bandwidths would be.
+    return struct.pack('iii', FILE_ID, SOLUTION_VERSION, 0) + struct.pack('iii', len(solution), 0, 0)
+
+
+def iter_solution_bytes(solution, fmt='npy', chunk_rows=1 << 16):
+    # Yields the encoded solution piece by piece, so neither the writer nor a
+    # download ever holds more than one chunk of text.
+    fmt = solution_format('', fmt)
+    solution = np.ascontiguousarray(solution, dtype=np.float64).reshape(-1)
+    chunk_rows = max(1, chunk_rows)
+
+    if fmt in TEXT_FORMATS:
+        if fmt == 'csv':
+            yield b"solution\n"
+        for start in range(0, len(solution), chunk_rows):
+            chunk = io.BytesIO()
+            np.savetxt(chunk, solution[start:start + chunk_rows], fmt='%.17g')
+            yield chunk.getvalue()
+    else:
+        yield _binary_header(solution, fmt)
+        for start in range(0, len(solution), chunk_rows):
+            yield memoryview(solution[start:start + chunk_rows]).cast('B')
+
+
+def solution_bytes(solution, fmt='npy'):
+    return b''.join(iter_solution_bytes(solution, fmt))
+
+
+def write_solution(solution, target, fmt=None, chunk_rows=1 << 16):
+    # target is a path (format taken from its extension unless fmt is given)
+    # or a binary stream.  Returns the number of bytes written.
+    if hasattr(target, 'write'):
+        written = 0
+        for chunk in iter_solution_bytes(solution, fmt or 'npy', chunk_rows):
+            written += target.write(chunk)
+        return written
+
+    fmt = solution_format(target, fmt)
+    temp_path = f"{target}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        written = write_solution(solution, f, fmt, chunk_rows)
+    os.replace(temp_path, target)
+    return written
+
+
+def read_solution(filename, fmt=None, use_mmap=False):
+    fmt = solution_format(filename, fmt)
+    if fmt == 'npy':
+        return np.load(filename, mmap_mode='r' if use_mmap else None)
+    if fmt in TEXT_FORMATS:
+        return np.loadtxt(filename, skiprows=1 if fmt == 'csv' else 0, ndmin=1)
+
+    with open(filename, 'rb') as f:
+        file_id, version, _ = struct.unpack('iii', f.read(12))
+        n, _, _ = struct.unpack('iii', f.read(12))
+    if file_id != FILE_ID or version != SOLUTION_VERSION:
+        raise ValueError(f"Not a solution file: id {hex(file_id)}, version {hex(version)}")
+    if use_mmap:
+        return np.memmap(filename, dtype=np.float64, mode='r', offset=HEADER_SIZE, shape=(n,))
+    solution = np.fromfile(filename, dtype=np.float64, count=n, offset=HEADER_SIZE)
+    if solution.size != n:
+        raise ValueError(f"Unexpected end of file: expected {n} values, got {solution.size}")
+    return solution
+
+
+def solution_path(output_dir, filename, fmt='npy'):
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return os.path.join(output_dir, f"{stem}.{solution_format('', fmt)}")
@@ -0,0 +1,336 @@
+import os
+import time
+import numpy as np
+from file_parser import LinearSystemParser, HEADER_SIZE
+from banded_storage import BandedMatrix, SymmetricBandedMatrix
+from gaussian_solver import (GaussianEliminationSolver, BandedGaussianSolver, EfficientBandedSolver,
+                             TridiagonalSolver, PentadiagonalSolver, SymmetricBandedSolver)
+from streaming_solver import StreamingBandedSolver
+from parallel_solver import ParallelBandedSolver
+from pipelined_solver import PipelinedBandedSolver
+
+class SolverEngine:
+    # Estimated time is dot(coefficients, terms(n, p, q, workers)) in seconds;
+    # memory(n, p, q) is the solver's resident bytes on top of the parsed
+    # system.  `storage` is what the engine needs from the parser: 'banded',
+    # 'symmetric' (lower band only, symmetric matrices), 'dense' or 'file'
+    # (the engine reads the file itself).
+    def __init__(self, name, storage, factory, terms, coefficients, memory, applies=None, versions=('0x102', '0x202')):
+        self.name = name
+        self.storage = storage
+        self.factory = factory
+        self.terms = terms
+        self.coefficients = tuple(coefficients)
+        self.memory = memory
+        self.applies = applies or (lambda n, p, q: True)
+        self.versions = versions
+
+    def estimate_time(self, n, p, q, workers=1):
+        return float(np.dot(self.coefficients, self.terms(n, p, q, workers)))
+
+
+SOLVER_REGISTRY = {}
+
+
+def register_solver(engine):
+    SOLVER_REGISTRY[engine.name] = engine
+    return engine
+
+
+register_solver(SolverEngine(
+    'tridiagonal', 'banded',
+    lambda filename, A, b, p, q, **options: TridiagonalSolver(A, b, **options),
+    lambda n, p, q, workers: (n,), (9e-7,),
+    lambda n, p, q: 120 * n,
+    applies=lambda n, p, q: (p, q) == TridiagonalSolver.bandwidths))
+
+register_solver(SolverEngine(
+    'pentadiagonal', 'banded',
+    lambda filename, A, b, p, q, **options: PentadiagonalSolver(A, b, **options),
+    lambda n, p, q, workers: (n,), (1.5e-6,),
+    lambda n, p, q: 200 * n,
+    applies=lambda n, p, q: (p, q) == PentadiagonalSolver.bandwidths))
+
+register_solver(SolverEngine(
+    'banded_lu', 'banded',
+    lambda filename, A, b, p, q, **options: EfficientBandedSolver(A, b, **options),
+    lambda n, p, q, workers: (n, n * p * (q + 1)), (8e-6, 1e-9),
+    lambda n, p, q: 16 * n))
+
+register_solver(SolverEngine(
+    'symmetric_band', 'symmetric',
+    lambda filename, A, b, p, q, **options: SymmetricBandedSolver(A, b, **options),
+    lambda n, p, q, workers: (n, n * p * (p + 2)), (7.5e-6, 1e-9),
+    lambda n, p, q: 16 * n))
+
+register_solver(SolverEngine(
+    'parallel_spike', 'banded',
+    lambda filename, A, b, p, q, **options: ParallelBandedSolver(A, b, **options),
+    lambda n, p, q, workers: (n / workers, n * p * (q + 1) * (p + q + 1) / workers, 1), (1.5e-5, 4e-9, 0.3),
+    lambda n, p, q: 8 * n * (p + q + 1) * 2 + 8 * n * (p + q + 1),
+    applies=lambda n, p, q: n >= 4 * (p + q) and (os.cpu_count() or 1) > 1))
+
+register_solver(SolverEngine(
+    'streaming', 'file',
+    # File-storage engines never hold the parsed system, so there is nothing
+    # for overwrite to save.
+    lambda filename, A, b, p, q, overwrite=False, **options: StreamingBandedSolver(filename, **options),
+    lambda n, p, q, workers: (n, n * p * (q + 1)), (1.2e-5, 3e-9),
+    lambda n, p, q: 8 * (8192 + 2 * max(p, q)) * (p + q + 1) + 8 * n,
+    versions=('0x202',)))
+
+register_solver(SolverEngine(
+    'pipelined', 'file',
+    lambda filename, A, b, p, q, overwrite=False, **options: PipelinedBandedSolver(filename, **options),
+    lambda n, p, q, workers: (n, n * p * (q + 1), 1), (8e-6, 1e-9, 2e-3),
+    lambda n, p, q: 8 * n * (p + q + 1) + 4 * 6 * 8192 * (p + q + 1) + 16 * n,
+    versions=('0x202',)))
+
+register_solver(SolverEngine(
+    'banded_dense', 'dense',
+    lambda filename, A, b, p, q, **options: BandedGaussianSolver(A, b, p, q, **options),
+    lambda n, p, q, workers: (n * n, n * p * (q + 1)), (3.5e-9, 5e-7),
+    lambda n, p, q: 8 * n * n))
+
+register_solver(SolverEngine(
+    'dense_lu', 'dense',
+    lambda filename, A, b, p, q, **options: GaussianEliminationSolver(A, b, **options),
+    lambda n, p, q, workers: (n ** 3 / 3, n * n, n), (1e-10, 7e-8, 1.5e-5),
+    lambda n, p, q: 8 * n * n))
+
+
+def available_memory():
+    try:
+        return int(os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE'))
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def detect_structure(filename, info=None, chunk_rows=1024):
+    # Returns (p, q, symmetric): the smallest bandwidths covering every
+    # nonzero entry and whether the matrix is exactly symmetric, from one
+    # chunked pass over a memory map, so the dense matrix is never resident.
+    # Compressed files can only shrink the header bandwidth (outer diagonals
+    # that are all zero); each row chunk of the band is scanned once, and the
+    # diagonal pairs are compared on the rows of that chunk.  In uncompressed
+    # files every nonzero is compared with its mirror entry, which lies
+    # within the bandwidth of the chunk and so is read from pages the scan
+    # has just touched.
+    info = info or LinearSystemParser.read_header_only(filename)
+    n, p, q = info['n'], info['p'], info['q']
+    if n == 0:
+        return 0, 0, False
+
+    symmetric = True
+    if info['version'] == '0x202':
+        band, _ = LinearSystemParser(filename).map_arrays()
+        used = np.zeros(band.shape[1], dtype=bool)
+        for start in range(0, n, chunk_rows):
+            stop = min(start + chunk_rows, n)
+            used |= np.any(band[start:stop] != 0, axis=0)
+            for c in range(1, min(p, q) + 1):
+                if not symmetric or start >= n - c:
+                    break
+                hi = min(stop, n - c)
+                symmetric = np.array_equal(band[start:hi, p + c], band[start + c:hi + c, p - c])
+        used = np.flatnonzero(used)
+        if used.size == 0:
+            return 0, 0, symmetric
+        lower, upper = max(0, p - int(used[0])), max(0, int(used[-1]) - p)
+        return lower, upper, symmetric and lower == upper
+
+    matrix = np.memmap(filename, dtype=np.float32, mode='r', offset=HEADER_SIZE, shape=(n, n))
+    lower = upper = 0
+    for start in range(0, n, chunk_rows):
+        block = np.asarray(matrix[start:start + chunk_rows])
+        rows, cols = np.nonzero(block)
+        if rows.size:
+            offsets = cols - rows - start
+            lower = max(lower, -int(offsets.min()))
+            upper = max(upper, int(offsets.max()))
+            if symmetric:
+                symmetric = np.array_equal(block[rows, cols], matrix[cols, rows + start])
+    return lower, upper, symmetric and lower == upper
+
+
+def _parse_memory(version, storage, n, p, q):
+    # Peak bytes of LinearSystemParser for the requested storage.
+    w = p + q + 1
+    if storage == 'file':
+        return 0
+    if storage == 'symmetric':
+        # The lower band plus one float32 chunk; 0x102 files are read as a
+        # full band first.
+        lower = 8 * n * (p + 1) + 12 * n
+        return lower + (4 * (1 << 18) if version == '0x202' else _parse_memory(version, 'banded', n, p, q))
+    if version == '0x202':
+        return 12 * n * w + 12 * n if storage == 'banded' else 8 * n * n + 4 * n * w + 12 * n
+    if storage == 'banded':
+        # A row chunk of at most 8M floats with its nonzero mask, plus the
+        # band, which may be up to twice as wide while it grows.
+        chunk = min(n * n, max(n, 1 << 23))
+        return 5 * chunk + 16 * n * w + 12 * n
+    return 12 * n * n + 12 * n
+
+
+def _parse_time(version, storage, n, p, q):
+    w = p + q + 1
+    if storage == 'file':
+        return 0.0
+    if storage == 'symmetric':
+        return _parse_time(version, 'banded', n, p, q)
+    if version == '0x202':
+        return 2e-9 * n * w if storage == 'banded' else 2e-9 * n * w + 1.5e-9 * n * n
+    return 3e-9 * n * n
+
+
+class SolverPlanner:
+    def __init__(self, memory_limit=None, workers=None, registry=None, detect=True):
+        self.memory_limit = memory_limit if memory_limit is not None else available_memory()
+        self.workers = workers or os.cpu_count() or 1
+        self.registry = registry if registry is not None else SOLVER_REGISTRY
+        self.detect = detect
+
+    def plan(self, info, engine=None, detected=None, symmetric=False):
+        version = info['version']
+        n = info['n']
+        p, q = detected if detected is not None else (info['p'], info['q'])
+
+        candidates = []
+        for spec in self.registry.values():
+            entry = {'engine': spec.name, 'storage': spec.storage}
+            if version not in spec.versions:
+                entry.update(feasible=False, reason=f"does not read {version} files")
+            elif spec.storage == 'symmetric' and not symmetric:
+                entry.update(feasible=False, reason="matrix is not symmetric")
+            elif not spec.applies(n, p, q):
+                entry.update(feasible=False, reason=f"not applicable to p={p}, q={q}")
+            else:
+                time_estimate = _parse_time(version, spec.storage, n, p, q) + spec.estimate_time(n, p, q, self.workers)
+                memory_estimate = _parse_memory(version, spec.storage, n, p, q) + spec.memory(n, p, q)
+                fits = self.memory_limit is None or memory_estimate <= self.memory_limit
+                entry.update(feasible=fits, estimated_time=time_estimate, estimated_memory=memory_estimate,
+                             reason=None if fits else "exceeds memory limit")
+            candidates.append(entry)
+
+        feasible = [c for c in candidates if c['feasible']]
+        if engine is not None:
+            if engine not in self.registry:
+                raise ValueError(f"Unknown solver engine '{engine}', expected one of {list(self.registry)}")
+            chosen = next(c for c in candidates if c['engine'] == engine)
+            if 'estimated_time' not in chosen:
+                raise ValueError(f"Solver engine '{engine}' cannot be used: {chosen['reason']}")
+            explanation = f"'{engine}' selected by user override"
+            if not chosen['feasible']:
+                explanation += f" ({chosen['reason']})"
+        elif feasible:
+            chosen = min(feasible, key=lambda c: c['estimated_time'])
+            runner_up = sorted(feasible, key=lambda c: c['estimated_time'])[1:2]
+            explanation = (f"'{chosen['engine']}' has the lowest estimated time "
+                           f"({chosen['estimated_time']:.3g} s, {chosen['estimated_memory'] / 2 ** 20:.1f} MB)")
+            if runner_up:
+                explanation += f"; next best '{runner_up[0]['engine']}' at {runner_up[0]['estimated_time']:.3g} s"
+        else:
+            raise ValueError("No solver engine fits within the memory limit")
+
+        return {
+            'engine': chosen['engine'],
+            'storage': chosen['storage'],
+            'version': version,
+            'n': n,
+            'p': p,
+            'q': q,
+            'header_p': info['p'],
+            'header_q': info['q'],
+            'bandwidth_detected': detected is not None,
+            'symmetric': symmetric,
+            'estimated_time': chosen['estimated_time'],
+            'estimated_memory': chosen['estimated_memory'],
+            'memory_limit': self.memory_limit,
+            'overridden': engine is not None,
+            'explanation': explanation,
+            'candidates': candidates
+        }
+
+    def plan_file(self, filename, engine=None):
+        info = LinearSystemParser.read_header_only(filename)
+        detected = None
+        symmetric = False
+        if self.detect:
+            start_time = time.time()
+            p, q, symmetric = detect_structure(filename, info)
+            detected = (p, q)
+        plan = self.plan(info, engine, detected, symmetric)
+        if self.detect:
+            plan['detect_time'] = time.time() - start_time
+        return plan
+
+
+def load_planned_system(filename, plan, instrumentation=None, dtype=np.float64):
+    # Parses the file into the storage the plan asks for and narrows the band
+    # to the detected bandwidth.  Narrowing is a view of the parsed band, so
+    # the system is never held twice; only widening allocates a new band.
+    # dtype=np.float32 keeps the file's own precision, which is what
+    # precision='mixed' solves want.
+    if plan['storage'] == 'file':
+        return None, None, None
+
+    p, q = plan['p'], plan['q']
+    symmetric = plan['storage'] == 'symmetric'
+    banded = plan['storage'] == 'banded'
+    parser = LinearSystemParser(filename, use_banded_storage=banded or symmetric, dtype=dtype,
+                                instrumentation=instrumentation, symmetric=symmetric)
+    A, b = parser.parse_file()
+
+    if symmetric and p < A.p:
+        A = SymmetricBandedMatrix(A.n, p, data=A.data[:, :p + 1])
+    elif banded and p <= A.p and q <= A.q and (A.p, A.q) != (p, q):
+        A = BandedMatrix(A.n, p, q, data=A.data[:, A.p - p:A.p + q + 1])
+    elif banded and (A.p, A.q) != (p, q):
+        data = np.zeros((A.n, p + q + 1), dtype=A.data.dtype)
+        lo, hi = max(p - A.p, 0), min(p + A.q, p + q) + 1
+        data[:, lo:hi] = A.data[:, A.p - p + lo:A.p - p + hi]
+        A = BandedMatrix(A.n, p, q, data=data)
+    return A, b, parser
+
+
+def create_planned_solver(filename, A, b, plan, registry=None, **options):
+    registry = registry if registry is not None else SOLVER_REGISTRY
+    return registry[plan['engine']].factory(filename, A, b, plan['p'], plan['q'], **options)
+
+
+def calibrate(engines=None, sizes=(2000, 20000), dense_sizes=(200, 500, 1000), bandwidths=((1, 1), (2, 2), (5, 5), (20, 10)),
+              seed=0, workers=None, registry=None):
+    # Least-squares fit of each engine's coefficients to timed solves of
+    # generated systems; dense engines run on the smaller dense_sizes.
+    from data_generator import generate_band_system
+    registry = registry if registry is not None else SOLVER_REGISTRY
+    workers = workers or os.cpu_count() or 1
+    fitted = {}
+
+    for spec in registry.values():
+        if engines is not None and spec.name not in engines or spec.storage == 'file':
+            continue
+        rows, timings = [], []
+        for n in (dense_sizes if spec.storage == 'dense' else sizes):
+            for p, q in bandwidths:
+                if not spec.applies(n, p, q):
+                    continue
+                if spec.storage == 'symmetric' and p != q:
+                    continue
+                band, b = generate_band_system(n, p, q, seed=seed, symmetric=spec.storage == 'symmetric')
+                A = BandedMatrix(n, p, q, data=band.astype(np.float64))
+                if spec.storage == 'dense':
+                    A = A.to_dense()
+                elif spec.storage == 'symmetric':
+                    A = SymmetricBandedMatrix.from_banded(A)
+                solver = spec.factory(None, A, b.astype(np.float64), p, q)
+                start_time = time.perf_counter()
+                solver.solve()
+                timings.append(time.perf_counter() - start_time)
+                rows.append(spec.terms(n, p, q, workers))
+        if len(rows) >= len(spec.coefficients):
+            coefficients, *_ = np.linalg.lstsq(np.array(rows, dtype=float), np.array(timings), rcond=None)
+            spec.coefficients = tuple(float(max(c, 0.0)) for c in coefficients)
+            fitted[spec.name] = spec.coefficients
+    return fitted
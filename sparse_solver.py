@@ -0,0 +1,222 @@
+import time
+import numpy as np
+from banded_storage import BandedMatrix
+from banded_kernels import verify_solution
+from gaussian_solver import create_banded_solver
+from instrumentation import Instrumentation, band_lu_flops, dense_lu_flops
+
+
+def csr_to_coo(indptr, indices, values):
+    indptr = np.asarray(indptr)
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    return rows, np.asarray(indices), np.asarray(values)
+
+
+def coo_bandwidth(rows, cols):
+    # (p, q) of the pattern: the farthest entry below and above the diagonal.
+    if len(rows) == 0:
+        return 0, 0
+    offsets = np.asarray(cols, dtype=np.int64) - np.asarray(rows, dtype=np.int64)
+    return max(0, -int(offsets.min())), max(0, int(offsets.max()))
+
+
+def _adjacency(rows, cols, n):
+    # CSR structure of the symmetrized pattern A + A^T without the diagonal.
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    off = rows != cols
+    keys = np.unique(np.concatenate([rows[off] * n + cols[off], cols[off] * n + rows[off]]))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // n, minlength=n), out=indptr[1:])
+    return indptr, keys % n
+
+
+def _neighbours(indptr, indices, frontier):
+    # All neighbours of the frontier nodes, with the frontier position each
+    # one was reached from, in frontier order.
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = int(counts.sum())
+    parents = np.repeat(np.arange(len(frontier)), counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return indices[np.repeat(starts, counts) + offsets], parents
+
+
+def _level_structure(indptr, indices, root, mask):
+    # Breadth-first levels from root, restricted to nodes where mask is True.
+    seen = ~mask
+    seen[root] = True
+    levels = [np.array([root])]
+    while True:
+        nodes, _ = _neighbours(indptr, indices, levels[-1])
+        nodes = np.unique(nodes[~seen[nodes]])
+        if nodes.size == 0:
+            return levels
+        seen[nodes] = True
+        levels.append(nodes)
+
+
+def _pseudo_peripheral_node(indptr, indices, degree, start, mask, max_sweeps=8):
+    # George-Liu heuristic: jump to a minimum-degree node of the deepest level
+    # while that makes the level structure deeper.
+    node = start
+    depth = len(_level_structure(indptr, indices, node, mask))
+    for _ in range(max_sweeps):
+        last = _level_structure(indptr, indices, node, mask)[-1]
+        candidate = int(last[np.argmin(degree[last])])
+        candidate_depth = len(_level_structure(indptr, indices, candidate, mask))
+        if candidate_depth <= depth:
+            break
+        node, depth = candidate, candidate_depth
+    return node
+
+
+def reverse_cuthill_mckee(rows, cols, n):
+    # Permutation perm (new index -> old index) of the symmetrized pattern.
+    # Each component is numbered breadth-first from a pseudo-peripheral node,
+    # children in order of their parent's number and then by degree, and the
+    # whole order is reversed.  One Python step per BFS level.
+    indptr, indices = _adjacency(rows, cols, n)
+    degree = np.diff(indptr)
+    visited = np.zeros(n, dtype=bool)
+    order = []
+
+    for start in np.argsort(degree, kind='stable'):
+        if visited[start]:
+            continue
+        root = _pseudo_peripheral_node(indptr, indices, degree, start, ~visited)
+        visited[root] = True
+        frontier = np.array([root])
+        while frontier.size:
+            order.append(frontier)
+            nodes, parents = _neighbours(indptr, indices, frontier)
+            fresh = ~visited[nodes]
+            nodes, parents = nodes[fresh], parents[fresh]
+            if nodes.size == 0:
+                break
+            ranked = np.lexsort((degree[nodes], parents))
+            nodes = nodes[ranked]
+            _, first = np.unique(nodes, return_index=True)
+            frontier = nodes[np.sort(first)]
+            visited[frontier] = True
+
+    perm = np.concatenate(order) if order else np.zeros(0, dtype=np.int64)
+    return perm[::-1].copy()
+
+
+def pack_banded(rows, cols, values, n, perm=None):
+    # Packs the (optionally symmetrically permuted) COO matrix into band
+    # storage; duplicate entries are summed.
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    if perm is not None:
+        inverse = np.empty(n, dtype=np.int64)
+        inverse[perm] = np.arange(n)
+        rows, cols = inverse[rows], inverse[cols]
+    p, q = coo_bandwidth(rows, cols)
+    A = BandedMatrix(n, p, q)
+    np.add.at(A.data, (rows, cols - rows + p), values)
+    return A
+
+
+class SparseBandedSolver:
+    def __init__(self, rows, cols, values, b, n=None, reorder=True, verify=False, instrumentation=None,
+                 **solver_options):
+        # A is given as COO triplets; from_csr and from_sparse build the
+        # same input from other layouts.
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.cols = np.asarray(cols, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.b = np.asarray(b, dtype=np.float64)
+        self.n = len(self.b) if n is None else n
+        if not (len(self.rows) == len(self.cols) == len(self.values)):
+            raise ValueError(f"COO arrays differ in length: {len(self.rows)}, {len(self.cols)}, {len(self.values)}")
+        if self.b.shape != (self.n,):
+            raise ValueError(f"Right-hand side must have shape ({self.n},), got {self.b.shape}")
+        if len(self.rows) and (min(self.rows.min(), self.cols.min()) < 0 or
+                               max(self.rows.max(), self.cols.max()) >= self.n):
+            raise ValueError(f"COO indices out of range for n={self.n}")
+
+        self.reorder = reorder
+        self.verify = verify
+        self.verification = {}
+        self.instrumentation = instrumentation or Instrumentation()
+        self.solver_options = solver_options
+        self.permutation = None
+        self.bandwidth_before = coo_bandwidth(self.rows, self.cols)
+        self.bandwidth_after = None
+        self.solver_stats = {}
+        self.solution = None
+        self.solve_time = 0
+        self.reorder_time = 0
+
+    @classmethod
+    def from_csr(cls, indptr, indices, values, b, **options):
+        rows, cols, values = csr_to_coo(indptr, indices, values)
+        return cls(rows, cols, values, b, n=len(indptr) - 1, **options)
+
+    @classmethod
+    def from_sparse(cls, matrix, b, **options):
+        # Any object with a tocoo() method, e.g. a scipy.sparse matrix.
+        coo = matrix.tocoo()
+        return cls(coo.row, coo.col, coo.data, b, n=coo.shape[0], **options)
+
+    def solve(self):
+        start_time = time.time()
+        n = self.n
+
+        with self.instrumentation.phase('reordering'):
+            reorder_start = time.time()
+            self.permutation = reverse_cuthill_mckee(self.rows, self.cols, n) if self.reorder else None
+            self.reorder_time = time.time() - reorder_start
+        with self.instrumentation.phase('packing'):
+            A = pack_banded(self.rows, self.cols, self.values, n, self.permutation)
+        self.bandwidth_after = (A.p, A.q)
+
+        b = self.b[self.permutation] if self.reorder else self.b.copy()
+        solver = create_banded_solver(A, b, instrumentation=self.instrumentation, overwrite=True,
+                                      **self.solver_options)
+        y = solver.solve()
+        self.solver_stats = solver.get_stats()
+
+        if self.reorder:
+            self.solution = np.empty(n)
+            self.solution[self.permutation] = y
+        else:
+            self.solution = y
+        self.solve_time = time.time() - start_time
+
+        if self.verify:
+            with self.instrumentation.phase('verification', 2 * len(self.values)):
+                self.verification = verify_solution(self.matvec, self.solution, self.b)
+        return self.solution
+
+    def matvec(self, x):
+        y = np.zeros(self.n)
+        np.add.at(y, self.rows, self.values * x[self.cols])
+        return y
+
+    def get_stats(self):
+        n = self.n
+        p0, q0 = self.bandwidth_before
+        stats = {
+            'solve_time': self.solve_time,
+            'reorder_time': self.reorder_time,
+            'dimension': n,
+            'nnz': len(self.values),
+            'storage_format': 'sparse_banded',
+            'reordering': 'rcm' if self.reorder else None,
+            'bandwidth_before': {'p': p0, 'q': q0, 'total': p0 + q0 + 1},
+            'dense_flops': dense_lu_flops(n),
+            'band_flops_before': band_lu_flops(n, p0, q0),
+            'phases': self.instrumentation.summary(),
+            **self.verification
+        }
+        if self.bandwidth_after is not None:
+            p, q = self.bandwidth_after
+            stats['bandwidth_after'] = {'p': p, 'q': q, 'total': p + q + 1}
+            stats['band_flops_after'] = band_lu_flops(n, p, q)
+            stats['band_memory_bytes'] = 8 * n * (p + q + 1)
+            stats['solver'] = {key: self.solver_stats[key] for key in ('storage_format', 'algorithm', 'factor_time')
+                               if key in self.solver_stats}
+        return stats
@@ -0,0 +1,153 @@
+import numpy as np
+import tempfile
+import time
+from file_parser import LinearSystemParser, HEADER_SIZE
+from banded_kernels import (band_matvec, band_block_size, factor_band_blocked, forward_substitute_band,
+                            back_substitute_band, verify_solution)
+from instrumentation import Instrumentation, ProgressTracker, band_lu_flops, band_forward_flops, band_back_flops, band_matvec_flops
+
+class StreamingBandedSolver:
+    def __init__(self, filename, chunk_rows=8192, temp_dir=None, solution_path=None, verify=False, instrumentation=None,
+                 progress=None, block_size=None):
+        info = LinearSystemParser.read_header_only(filename)
+        if info['version'] != '0x202':
+            raise ValueError(f"Streaming solve requires a compressed (0x202) file, got {info['version']}")
+
+        self.filename = filename
+        self.n = info['n']
+        self.p = info['p']
+        self.q = info['q']
+        self.bandwidth = info['bandwidth']
+        self.chunk_rows = max(chunk_rows, max(self.p, self.q) + 1)
+        self.block_size = band_block_size(self.p, self.q, block_size)
+        self.temp_dir = temp_dir
+        self.solution_path = solution_path
+        self.verify = verify
+        self.verification = {}
+        self.instrumentation = instrumentation or Instrumentation()
+        # Progress is reported once per chunk, for the elimination and again
+        # for the back substitution.
+        self.progress = ProgressTracker(progress, 2 * self.n)
+        self.solution = None
+        self.solve_time = 0
+        self.window_bytes = 0
+        self.spill_bytes = 0
+
+    def solve(self):
+        start_time = time.time()
+
+        with tempfile.TemporaryFile(dir=self.temp_dir) as spill_file:
+            spill = np.memmap(spill_file, dtype=np.float64, mode='w+', shape=(self.n, self.q + 2))
+            self.spill_bytes = spill.nbytes
+
+            with open(self.filename, 'rb') as f:
+                self._eliminate(f, spill)
+            self.solution = self._back_substitute(spill)
+            del spill
+
+        self.solve_time = time.time() - start_time
+        if self.verify:
+            # The band is read back through a memory map, so the check does
+            # not need the matrix resident either.
+            band, rhs = LinearSystemParser(self.filename).map_arrays()
+            with self.instrumentation.phase('verification', band_matvec_flops(self.n, self.p, self.q)):
+                self.verification = verify_solution(lambda x: band_matvec(band, self.p, self.q, x), self.solution, rhs)
+        return self.solution
+
+    def _read_rows(self, f, start, stop, band_out, b_out):
+        count = stop - start
+        with self.instrumentation.phase('matrix'):
+            f.seek(HEADER_SIZE + 4 * self.bandwidth * start)
+            band_out[:count] = np.fromfile(f, dtype=np.float32, count=count * self.bandwidth).reshape(count, self.bandwidth)
+        with self.instrumentation.phase('rhs'):
+            f.seek(HEADER_SIZE + 4 * self.bandwidth * self.n + 4 * start)
+            b_out[:count] = np.fromfile(f, dtype=np.float32, count=count)
+
+    def _eliminate(self, f, spill):
+        # The window holds `history` finished rows needed by the forward
+        # substitution, the chunk of rows being pivoted, and `lag` rows that
+        # still receive updates from the chunk's pivots.
+        n, p, q = self.n, self.p, self.q
+        history = p
+        lag = max(p, q)
+        capacity = history + self.chunk_rows + lag
+        window = np.zeros((capacity, self.bandwidth))
+        b_window = np.zeros(capacity)
+        self.window_bytes = window.nbytes + b_window.nbytes
+
+        base = 0
+        loaded = 0
+        start = 0
+        while start < n:
+            end = min(n, base + capacity)
+            self._read_rows(f, base + loaded, end, window[loaded:], b_window[loaded:])
+            loaded = end - base
+            stop = n if end == n else end - lag
+
+            rows = window[:loaded]
+            with self.instrumentation.phase('factorization', band_lu_flops(stop - start, p, q)):
+                factor_band_blocked(rows, p, q, self.block_size, start - base, stop - base, row_offset=base)
+            with self.instrumentation.phase('forward_substitution', band_forward_flops(stop - start, p)):
+                forward_substitute_band(rows, b_window[:loaded], p, start - base, stop - base)
+
+            with self.instrumentation.phase('spill'):
+                spill[start:stop, :q + 1] = rows[start - base:stop - base, p:]
+                spill[start:stop, q + 1] = b_window[start - base:stop - base]
+            self.progress.advance(stop - start)
+            if stop == n:
+                break
+
+            keep_from = stop - history - base
+            kept = loaded - keep_from
+            window[:kept] = window[keep_from:loaded]
+            b_window[:kept] = b_window[keep_from:loaded]
+            base += keep_from
+            loaded = kept
+            start = stop
+
+        spill.flush()
+
+    def _back_substitute(self, spill):
+        n, q = self.n, self.q
+        if self.solution_path is not None:
+            solution = np.lib.format.open_memmap(self.solution_path, mode='w+', dtype=np.float64, shape=(n,))
+        else:
+            solution = np.zeros(n)
+
+        upper = np.zeros((self.chunk_rows + q, q + 1))
+        x = np.zeros(self.chunk_rows + q)
+        self.window_bytes = max(self.window_bytes, upper.nbytes + x.nbytes)
+
+        hi = n
+        while hi > 0:
+            lo = max(0, hi - self.chunk_rows)
+            top = min(n, hi + q)
+            count = top - lo
+
+            upper[:count] = spill[lo:top, :q + 1]
+            x[:hi - lo] = spill[lo:hi, q + 1]
+            x[hi - lo:count] = solution[hi:top]
+            with self.instrumentation.phase('back_substitution', band_back_flops(hi - lo, q)):
+                back_substitute_band(upper[:count], x[:count], 0, q, 0, hi - lo)
+            solution[lo:hi] = x[:hi - lo]
+            self.progress.advance(hi - lo)
+            hi = lo
+
+        if isinstance(solution, np.memmap):
+            solution.flush()
+        return solution
+
+    def get_stats(self):
+        return {
+            'solve_time': self.solve_time,
+            'dimension': self.n,
+            'upper_bandwidth': self.q,
+            'lower_bandwidth': self.p,
+            'storage_format': 'streaming',
+            'chunk_rows': self.chunk_rows,
+            'block_size': self.block_size,
+            'window_bytes': self.window_bytes,
+            'spill_bytes': self.spill_bytes,
+            'phases': self.instrumentation.summary(),
+            **self.verification
+        }
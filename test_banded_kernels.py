@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from banded_kernels import (DEFAULT_BLOCK_SIZE, back_substitute_band, factor_band, factor_band_blocked,
+                            forward_substitute_band)
+from banded_storage import BandedMatrix
+from data_generator import generate_band_system
+
+
+def _system(n, p, q, seed=0):
+    band, b = generate_band_system(n, p, q, seed=seed)
+    return band.astype(np.float64), b.astype(np.float64)
+
+
+def _lu_solve(factors, b, p, q):
+    y = forward_substitute_band(factors, b.copy(), p)
+    return back_substitute_band(factors, y, p, q)
+
+
+# (n, p, q): p != q, bandwidths around DEFAULT_BLOCK_SIZE and 64, n not a
+# multiple of the block size, and n smaller than one block.
+CASES = [
+    (100, 3, 9),
+    (100, 9, 3),
+    (96, 16, 16),
+    (101, 15, 17),
+    (101, 17, 15),
+    (203, 20, 33),
+    (300, 64, 64),
+    (301, 63, 65),
+    (317, 70, 66),
+    (10, 20, 20),
+    (13, 12, 5),
+    (1, 0, 0),
+]
+
+
+@pytest.mark.parametrize("n, p, q", CASES)
+def test_blocked_matches_unblocked(n, p, q):
+    band, _ = _system(n, p, q)
+    blocked = band.copy()
+    factor_band_blocked(blocked, p, q, DEFAULT_BLOCK_SIZE)
+    unblocked = band.copy()
+    factor_band(unblocked, p, q)
+    np.testing.assert_allclose(blocked, unblocked, rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize("n, p, q", CASES)
+def test_blocked_solve_matches_numpy(n, p, q):
+    band, b = _system(n, p, q, seed=1)
+    dense = BandedMatrix(n, p, q, band).to_dense()
+    factors = band.copy()
+    factor_band_blocked(factors, p, q, DEFAULT_BLOCK_SIZE)
+    np.testing.assert_allclose(_lu_solve(factors, b, p, q), np.linalg.solve(dense, b), rtol=1e-10, atol=1e-12)
+
+
+@pytest.mark.parametrize("block_size", [2, 5, DEFAULT_BLOCK_SIZE, 64])
+def test_block_sizes_and_windows(block_size):
+    # Factoring in uneven [start, stop) windows gives the same factors as
+    # one call.
+    n, p, q = 211, 40, 27
+    band, _ = _system(n, p, q, seed=2)
+    expected = band.copy()
+    factor_band(expected, p, q)
+    windowed = band.copy()
+    for start, stop in [(0, 37), (37, 38), (38, 150), (150, n)]:
+        factor_band_blocked(windowed, p, q, block_size, start, stop)
+    np.testing.assert_allclose(windowed, expected, rtol=1e-12, atol=1e-12)
+
+
+def test_blocked_zero_pivot():
+    n, p, q = 50, 20, 20
+    band, _ = _system(n, p, q)
+    band[30, p] = 0.0
+    band[30, :p] = 0.0
+    with pytest.raises(ValueError, match="Zero pivot encountered at position 30"):
+        factor_band_blocked(band, p, q, DEFAULT_BLOCK_SIZE)
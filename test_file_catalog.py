@@ -0,0 +1,191 @@
+import os
+import shutil
+
+import pytest
+
+from data_generator import generate_dat_file
+from file_catalog import SAMPLE_BYTES, FileCatalog, sampled_hash
+from result_cache import file_hash
+
+
+def _write(path, n, p=2, q=2, compressed=True, seed=0):
+    generate_dat_file(str(path), n, p, q, seed=seed, compressed=compressed)
+    return str(path)
+
+
+def _flip_byte(path, offset):
+    # Changes one byte in place and moves the mtime on, so the change is
+    # visible even on filesystems with coarse timestamps.
+    stat = os.stat(path)
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        value = f.read(1)
+        f.seek(offset)
+        f.write(bytes([value[0] ^ 0xFF]))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def _touch(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def _solve_result(path, wall_time=1.5, status='ok', output=None):
+    return {'path': path, 'status': status, 'engine': 'banded_lu', 'parse_time': 0.1, 'solve_time': 1.0,
+            'wall_time': wall_time, 'stats': {'relative_residual': 1e-15}, 'output': output}
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = FileCatalog(str(tmp_path / "catalog.sqlite"))
+    yield catalog
+    catalog.close()
+
+
+def test_sampled_hash_sees_head_tail_and_size_only(tmp_path):
+    path = str(tmp_path / "data.bin")
+    with open(path, 'wb') as f:
+        f.write(bytes(range(256)) * 16)
+    original = sampled_hash(path, sample_bytes=64)
+    full = file_hash(path)
+
+    _flip_byte(path, 2048)
+    assert sampled_hash(path, sample_bytes=64) == original
+    assert file_hash(path) != full
+
+    _flip_byte(path, 10)
+    assert sampled_hash(path, sample_bytes=64) != original
+    _flip_byte(path, 10)
+    _flip_byte(path, 4096 - 10)
+    assert sampled_hash(path, sample_bytes=64) != original
+    _flip_byte(path, 4096 - 10)
+
+    with open(path, 'ab') as f:
+        f.write(b'\0')
+    assert sampled_hash(path, sample_bytes=64) != original
+
+
+def test_small_files_are_hashed_whole(tmp_path):
+    path = _write(tmp_path / "small.dat", 50)
+    before = sampled_hash(path)
+    _flip_byte(path, os.path.getsize(path) // 2)
+    assert sampled_hash(path) != before
+
+
+def test_refresh_tracks_added_modified_and_deleted(tmp_path, catalog):
+    directory = tmp_path / "data"
+    directory.mkdir()
+    a = _write(directory / "a.dat", 100)
+    b = _write(directory / "b.dat", 200, compressed=False)
+    (directory / "notes.txt").write_text("ignored")
+    with open(directory / "broken.dat", 'wb') as f:
+        f.write(b'\x01\x02')
+
+    stats = catalog.refresh(str(directory))
+    assert (stats['files'], stats['added'], stats['updated'], stats['removed']) == (3, 3, 0, 0)
+    assert catalog.entry(a)['n'] == 100
+    assert catalog.entry(b)['version'] == '0x102'
+    assert catalog.entry(str(directory / "broken.dat"))['error'] is not None
+
+    stats = catalog.refresh(str(directory))
+    assert (stats['added'], stats['updated'], stats['unchanged']) == (0, 0, 3)
+
+    _write(directory / "a.dat", 150, seed=1)
+    _touch(a)
+    os.remove(b)
+    stats = catalog.refresh(str(directory))
+    assert (stats['files'], stats['updated'], stats['removed'], stats['unchanged']) == (2, 1, 1, 1)
+    assert catalog.entry(a)['n'] == 150
+    assert [row['name'] for row in catalog.files(str(directory))] == ['a.dat', 'broken.dat']
+
+
+def test_entry_reindexes_changed_file_without_refresh(tmp_path, catalog):
+    path = _write(tmp_path / "a.dat", 100)
+    first = catalog.entry(path)
+    assert first['n'] == 100 and first['content_hash'] is not None
+
+    _write(tmp_path / "a.dat", 120, seed=3)
+    _touch(path)
+    second = catalog.entry(path)
+    assert second['n'] == 120
+    assert second['content_hash'] != first['content_hash']
+
+
+def test_files_filters_and_sorting(tmp_path, catalog):
+    _write(tmp_path / "small.dat", 50)
+    _write(tmp_path / "medium.dat", 300, compressed=False)
+    large = _write(tmp_path / "large.dat", 1000, p=4, q=4)
+    catalog.refresh(str(tmp_path))
+    catalog.record_solve(_solve_result(large))
+
+    def names(**filters):
+        return [row['name'] for row in catalog.files(str(tmp_path), **filters)]
+
+    assert names() == ['large.dat', 'medium.dat', 'small.dat']
+    assert names(name='med') == ['medium.dat']
+    assert names(version='0x102') == ['medium.dat']
+    assert names(min_n=100, max_n=500) == ['medium.dat']
+    assert names(solved=True) == ['large.dat']
+    assert names(solved=False) == ['medium.dat', 'small.dat']
+    assert names(sort='n', descending=True) == ['large.dat', 'medium.dat', 'small.dat']
+    assert names(sort='bandwidth', descending=True, limit=1) == ['large.dat']
+    assert catalog.files(str(tmp_path / "elsewhere")) == []
+    with pytest.raises(ValueError, match="Unknown sort column"):
+        catalog.files(sort='colour')
+
+
+def test_solve_lookups(tmp_path, catalog):
+    path = _write(tmp_path / "a.dat", 100)
+    output = tmp_path / "a_solution.txt"
+    assert not catalog.is_solved(path)
+    assert catalog.last_solve(path) is None
+    assert catalog.estimate_cost(path) is None
+
+    catalog.record_solve(_solve_result(path, wall_time=2.0, status='failed'))
+    assert not catalog.is_solved(path)
+    assert catalog.estimate_cost(path) is None
+
+    catalog.record_solve(_solve_result(path, wall_time=3.0, output=str(output)))
+    assert catalog.is_solved(path)
+    assert not catalog.is_solved(path, require_output=True)
+    output.write_text("x")
+    assert catalog.is_solved(path, require_output=True)
+    assert catalog.estimate_cost(path) == 3.0
+    assert catalog.last_solve(path)['engine'] == 'banded_lu'
+    assert [row['status'] for row in catalog.history(path)] == ['ok', 'failed']
+
+    catalog.clear_history(path)
+    assert catalog.history(path) == []
+    assert not catalog.is_solved(path)
+
+
+def test_sampled_hash_change_in_middle(tmp_path, catalog):
+    # A file larger than two samples can change where the sampled hash does
+    # not look.  The solve then no longer counts for is_solved (the stat
+    # changed), while the hash still carries the cost estimate.
+    path = _write(tmp_path / "big.dat", 100000, p=3, q=3)
+    assert os.path.getsize(path) > 2 * SAMPLE_BYTES
+    before = catalog.entry(path)['content_hash']
+    catalog.record_solve(_solve_result(path, wall_time=4.0))
+    assert catalog.is_solved(path)
+
+    _flip_byte(path, os.path.getsize(path) // 2)
+    assert catalog.entry(path)['content_hash'] == before
+    assert not catalog.is_solved(path)
+    assert catalog.estimate_cost(path) == 4.0
+
+
+def test_full_hash_matches_content_across_paths(tmp_path):
+    catalog = FileCatalog(str(tmp_path / "catalog.sqlite"), full_hash=True)
+    try:
+        path = _write(tmp_path / "a.dat", 200)
+        copy = str(tmp_path / "copy.dat")
+        shutil.copyfile(path, copy)
+        catalog.record_solve(_solve_result(path))
+        assert catalog.is_solved(copy)
+
+        _flip_byte(copy, os.path.getsize(copy) // 2)
+        assert not catalog.is_solved(copy)
+        assert catalog.is_solved(path)
+    finally:
+        catalog.close()
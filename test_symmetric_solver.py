@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from banded_storage import BandedMatrix, SymmetricBandedMatrix
+from data_generator import generate_band_system, generate_dat_file
+from file_parser import LinearSystemParser
+from gaussian_solver import SymmetricBandedFactorization, SymmetricBandedSolver
+
+
+def _symmetric(n, p, seed=0, indefinite=False):
+    band, b = generate_band_system(n, p, p, seed=seed, symmetric=True)
+    band, b = band.astype(np.float64), b.astype(np.float64)
+    if indefinite:
+        # Negating a diagonally dominant row's diagonal keeps elimination
+        # without pivoting stable but makes A indefinite.
+        band[n // 3::3, p] *= -1.0
+    A = BandedMatrix(n, p, p, band)
+    return A, b, A.to_dense()
+
+
+@pytest.mark.parametrize("n, p", [(1, 0), (50, 1), (200, 4), (97, 20), (30, 40)])
+def test_spd_uses_cholesky(n, p):
+    A, b, dense = _symmetric(n, p)
+    solver = SymmetricBandedSolver(SymmetricBandedMatrix.from_banded(A), b, verify=True)
+    np.testing.assert_allclose(solver.solve(), np.linalg.solve(dense, b), rtol=1e-10, atol=1e-12)
+    stats = solver.get_stats()
+    assert stats['algorithm'] == 'cholesky'
+    assert stats['positive_definite']
+    assert stats['switch_pivot'] is None
+
+
+@pytest.mark.parametrize("n, p", [(50, 1), (200, 4), (97, 20)])
+def test_indefinite_switches_to_ldlt(n, p):
+    A, b, dense = _symmetric(n, p, seed=1, indefinite=True)
+    solver = SymmetricBandedSolver(A, b)
+    np.testing.assert_allclose(solver.solve(), np.linalg.solve(dense, b), rtol=1e-10, atol=1e-12)
+    stats = solver.get_stats()
+    assert stats['algorithm'] == 'ldlt'
+    assert not stats['positive_definite']
+    assert stats['switch_pivot'] == n // 3
+
+
+def test_ldlt_method_and_multiple_rhs():
+    n, p = 120, 6
+    A, _, dense = _symmetric(n, p, seed=2, indefinite=True)
+    B = np.random.default_rng(3).uniform(-1.0, 1.0, (n, 4))
+    factorization = SymmetricBandedFactorization(A, method='ldlt').factor()
+    np.testing.assert_allclose(factorization.solve(B), np.linalg.solve(dense, B), rtol=1e-10, atol=1e-12)
+    assert factorization.get_stats()['rhs_count'] == 4
+
+
+def test_cholesky_method_rejects_indefinite():
+    A, b, _ = _symmetric(60, 3, indefinite=True)
+    with pytest.raises(ValueError, match="not positive definite"):
+        SymmetricBandedSolver(A, b, method='cholesky').solve()
+
+
+def test_rejects_non_symmetric():
+    A, b, _ = _symmetric(40, 3)
+    A.data[10, 2] += 1.0
+    with pytest.raises(ValueError, match="Matrix is not symmetric"):
+        SymmetricBandedMatrix.from_banded(A)
+    with pytest.raises(ValueError, match="Matrix is not symmetric"):
+        SymmetricBandedSolver(A, b)
+
+
+@pytest.mark.parametrize("compressed", [True, False])
+def test_parser_symmetric_modes(tmp_path, compressed):
+    symmetric = str(tmp_path / "symmetric.dat")
+    general = str(tmp_path / "general.dat")
+    generate_dat_file(symmetric, 80, 3, 3, seed=4, compressed=compressed, symmetric=True)
+    generate_dat_file(general, 80, 3, 3, seed=4, compressed=compressed)
+
+    A, b = LinearSystemParser(symmetric, use_banded_storage=True, symmetric=True).parse_file()
+    assert isinstance(A, SymmetricBandedMatrix)
+    x = SymmetricBandedSolver(A, b).solve()
+    np.testing.assert_allclose(x, np.linalg.solve(A.to_dense(), b), rtol=1e-10, atol=1e-12)
+
+    with pytest.raises(ValueError, match="Matrix is not symmetric"):
+        LinearSystemParser(general, use_banded_storage=True, symmetric=True).parse_file()
+    A, _ = LinearSystemParser(general, use_banded_storage=True, symmetric='auto').parse_file()
+    assert not isinstance(A, SymmetricBandedMatrix)